@@ -0,0 +1,261 @@
+"""
+Module: InventoryMS.cache
+
+Versioned caching on top of Django's cache framework.
+
+Every model that uses ``VersionedManager`` gets a version counter stored in
+the cache. The counter is bumped after any save, delete or bulk operation on
+that model commits. Cache keys embed the versions of the models a value was
+computed from, so a write makes every dependent entry unreachable and cached
+values never need a TTL to stay fresh.
+
+With the local-memory backend the counters live in each process; point
+``CACHE_BACKEND`` at a shared backend (Redis, Memcached or the database
+cache) so that a write in one worker invalidates all of them. Without
+DEBUG a process-local backend fails the deploy checks (see
+``check_shared_cache``).
+
+``single_flight`` protects expensive dashboard widgets from stampedes: one
+caller recomputes under a lease held in the cache while the others keep
+serving the previous value.
+"""
+
+import hashlib
+import math
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+
+from monitoring.instrumentation import record_cache
+
+_MISSING = object()
+
+# Backends whose entries only the process that wrote them can see.
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared():
+    """
+    Returns whether every process sees the same default cache, which model
+    versions and single_flight leases rely on to work across processes.
+    """
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Refuses a process-local cache outside DEBUG: the web workers, the task
+    worker and the scheduler would each see their own versions and leases.
+    """
+    if settings.DEBUG or cache_is_shared():
+        return []
+    return [checks.Error(
+        'The default cache is local to each process.',
+        hint='Set CACHE_BACKEND to a shared backend, such as '
+             'django.core.cache.backends.db.DatabaseCache after '
+             '"manage.py createcachetable".',
+        id='InventoryMS.E001',
+    )]
+
+
+def _hashed(parts):
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False)
+    return digest.hexdigest()
+
+
+def _version_key(model):
+    return f'model-version:{model._meta.label_lower}'
+
+
+def _seed_version():
+    # Counters start from the clock so a counter that was evicted never
+    # restarts below a version an existing entry was keyed with.
+    return time.time_ns() // 1000
+
+
+def model_versions(*models_):
+    """
+    Returns the current version of each model, in order.
+    """
+    keys = [_version_key(model) for model in models_]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            version = _seed_version()
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+        versions.append(version)
+    return versions
+
+
+def bump_version(model):
+    """
+    Increments a model's version, invalidating every key built from it.
+    """
+    key = _version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _seed_version(), timeout=None)
+
+
+def bump_on_commit(model):
+    """
+    Bumps a model's version once the current transaction commits, so no
+    reader can cache pre-commit data under the new version.
+    """
+    transaction.on_commit(lambda: bump_version(model))
+
+
+def versioned_key(name, models_, *parts):
+    """
+    Builds a cache key for ``name`` that changes whenever any of
+    ``models_`` is written to. Extra ``parts`` (such as a search term) are
+    hashed so the key is always safe for every cache backend.
+    """
+    versions = '.'.join(str(v) for v in model_versions(*models_))
+    key = f'{name}:{versions}'
+    if parts:
+        key = f'{key}:{_hashed(parts)}'
+    return key
+
+
+def cached(name, models_, compute, *parts, timeout=None):
+    """
+    Returns the cached result of ``compute()`` for the current versions of
+    ``models_``, computing and storing it on a miss.
+
+    ``timeout`` defaults to the backend's TIMEOUT; it only bounds how long
+    unreachable entries occupy memory, not how fresh values are.
+    """
+    key = versioned_key(name, models_, *parts)
+    value = cache.get(key, _MISSING)
+    record_cache(value is not _MISSING)
+    if value is _MISSING:
+        value = compute()
+        if timeout is None:
+            cache.set(key, value)
+        else:
+            cache.set(key, value, timeout)
+    return value
+
+
+def single_flight(name, compute, *parts, models_=(), ttl=300, lease=60,
+                  wait=5.0, beta=1.0, stale_ttl=86400):
+    """
+    Returns the result of ``compute()`` for ``name`` and ``parts``, making
+    sure only one caller across all processes recomputes it at a time.
+    The lease is held in the default cache, so this needs a shared backend
+    (see ``cache_is_shared``); a process-local one only dedupes callers
+    within each process.
+
+    An entry is fresh while the versions of ``models_`` are unchanged and
+    it is younger than ``ttl`` seconds. Refreshes start early with a
+    probability that grows as expiry nears and with how long the last
+    computation took (probabilistic early expiration, ``beta`` scales it).
+
+    The caller that wins the ``lease`` recomputes. Everyone else returns
+    the stale value if there is one, or polls for up to ``wait`` seconds for
+    the leaseholder's result before computing it themselves. Stale values
+    are kept for ``stale_ttl`` seconds after expiry.
+    """
+    key = f'single-flight:{name}:{_hashed(parts)}'
+    versions = model_versions(*models_)
+    entry = cache.get(key)
+    if entry is not None:
+        value, entry_versions, delta, expires_at = entry
+        early = delta * beta * math.log(1.0 - random.random())
+        if entry_versions == versions and time.time() - early < expires_at:
+            record_cache(True)
+            return value
+    record_cache(False)
+
+    lease_key = f'{key}:lease'
+    token = uuid.uuid4().hex
+    if cache.add(lease_key, token, lease):
+        try:
+            return _compute_and_store(
+                key, compute, versions, ttl, stale_ttl
+            )
+        finally:
+            if cache.get(lease_key) == token:
+                cache.delete(lease_key)
+
+    if entry is not None:
+        return entry[0]
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return _compute_and_store(key, compute, versions, ttl, stale_ttl)
+
+
+def _compute_and_store(key, compute, versions, ttl, stale_ttl):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    cache.set(
+        key, (value, versions, delta, time.time() + ttl), ttl + stale_ttl
+    )
+    return value
+
+
+class VersionedQuerySet(models.QuerySet):
+    """
+    QuerySet whose bulk writes bump the model version, since they bypass
+    the save and delete signals.
+    """
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        if rows:
+            bump_on_commit(self.model)
+        return rows
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        if created:
+            bump_on_commit(self.model)
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        if rows:
+            bump_on_commit(self.model)
+        return rows
+
+    bulk_update.alters_data = True
+
+
+class VersionedManager(models.Manager.from_queryset(VersionedQuerySet)):
+    """
+    Default manager for models whose version keys cached values.
+    """
+
+    def contribute_to_class(self, cls, name):
+        super().contribute_to_class(cls, name)
+        if not cls._meta.abstract:
+            uid = f'bump-version:{cls._meta.label_lower}'
+            post_save.connect(_bump_sender, sender=cls, dispatch_uid=uid)
+            post_delete.connect(_bump_sender, sender=cls, dispatch_uid=uid)
+
+
+def _bump_sender(sender, **kwargs):
+    bump_on_commit(sender)
@@ -1,7 +1,8 @@
 import os
+import tempfile
 from pathlib import Path
 import dj_database_url
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -10,13 +11,22 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.1/howto/deployment/checklist/
 
+# Every setting below that differs between development and production is
+# read from the environment (or a .env file), with development defaults.
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-g_n2+2bznu6e@1wel!i(&-4tp86_7lop5395ww+i4x%9*7^old'
+SECRET_KEY = config(
+    'SECRET_KEY',
+    default='django-insecure-g_n2+2bznu6e@1wel!i(&-4tp86_7lop5395ww+i4x%9*7^old'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DEBUG also makes Django keep every SQL query of a request in memory.
+DEBUG = config('DEBUG', default=True, cast=bool)
+
+ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='*', cast=Csv())
 
-ALLOWED_HOSTS = ['*']
+CSRF_TRUSTED_ORIGINS = config('CSRF_TRUSTED_ORIGINS', default='', cast=Csv())
 
 
 # Application definition
@@ -42,23 +52,33 @@ INSTALLED_APPS = [
     'transactions.apps.TransactionsConfig',
     'invoice.apps.InvoiceConfig',
     'bills.apps.BillsConfig',
+    'monitoring.apps.MonitoringConfig',
+    'tasks.apps.TasksConfig',
+    'live.apps.LiveConfig',
+    'outbox.apps.OutboxConfig',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'monitoring.middleware.RequestMetricsMiddleware',
+    'monitoring.middleware.PerformanceMiddleware',
+    'monitoring.nplusone.NPlusOneMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'monitoring.middleware.TraceCaptureMiddleware',
 ]
 
 ROOT_URLCONF = 'InventoryMS.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # The standard backend, timing renders for the Server-Timing header.
+        'BACKEND': 'monitoring.template_backend.DjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -76,18 +96,212 @@ WSGI_APPLICATION = 'InventoryMS.wsgi.application'
 
 
 # Database
-# https://docs.djangoproject.com/en/4.1/ref/settings/#databases
-
+# https://docs.djangoproject.com/en/5.1/ref/databases/#persistent-connections
+# DATABASE_URL selects the database; without it the app falls back to a
+# local SQLite file. Connections are kept open for DB_CONN_MAX_AGE seconds
+# (0 closes them after every request, "None" never expires them) and
+# checked before reuse, so a restarted database server costs one error-free
+# reconnect instead of a failed request.
 
 DATABASES = {
+    'default': dj_database_url.config(
+        default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
+        conn_max_age=config(
+            'DB_CONN_MAX_AGE', default=60,
+            cast=lambda v: None if v == 'None' else int(v)
+        ),
+        conn_health_checks=config(
+            'DB_CONN_HEALTH_CHECKS', default=True, cast=bool
+        ),
+    )
+}
+
+# https://docs.djangoproject.com/en/5.1/ref/databases/#connection-pool
+# On PostgreSQL, DB_POOL=True switches from one persistent connection per
+# worker thread to psycopg's connection pool (requires psycopg[pool]).
+# Threads borrow a connection per request and wait up to DB_POOL_TIMEOUT
+# seconds when all DB_POOL_MAX_SIZE connections are checked out. Pooling
+# replaces persistent connections, so CONN_MAX_AGE must be 0.
+
+if (
+    config('DB_POOL', default=False, cast=bool)
+    and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'
+):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+    }
+
+# SQLite performance mode
+# https://docs.djangoproject.com/en/5.1/ref/databases/#sqlite-notes
+# On by default for the SQLite fallback; SQLITE_PERFORMANCE_MODE=False
+# restores SQLite's defaults. PRAGMAS are applied to every new connection by
+# InventoryMS.sqlite.apply_pragmas: WAL journaling, NORMAL sync (durable
+# up to the last checkpoint under WAL), a busy timeout in milliseconds, a
+# memory-mapped I/O window in bytes and a page cache in KiB (negative).
+# Atomic blocks start with BEGIN IMMEDIATE so writers queue for the lock
+# instead of failing with "database is locked".
+
+if (
+    DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3'
+    and config('SQLITE_PERFORMANCE_MODE', default=True, cast=bool)
+):
+    DATABASES['default'].setdefault('OPTIONS', {})['transaction_mode'] = (
+        'IMMEDIATE'
+    )
+    DATABASES['default']['PRAGMAS'] = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=20000, cast=int),
+        'mmap_size': config('SQLITE_MMAP_SIZE', default=268435456, cast=int),
+        'cache_size': config('SQLITE_CACHE_SIZE', default=-64000, cast=int),
+    }
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Model versions and single_flight leases must be seen by every web
+# worker, task worker and scheduler, so without DEBUG the default is the
+# database cache (run `manage.py createcachetable` once, as the Dockerfile
+# does). Local memory is the DEBUG default, for a single runserver process.
+# Set CACHE_BACKEND/CACHE_LOCATION for another shared backend, e.g.
+# django.core.cache.backends.redis.RedisCache with a redis:// URL.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'BACKEND': config(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache' if DEBUG
+            else 'django.core.cache.backends.db.DatabaseCache'
+        ),
+        'LOCATION': config('CACHE_LOCATION', default='inventoryms_cache'),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=86400, cast=int),
     }
 }
 
-
-DATABASES['default'] = dj_database_url.config()
+# Background tasks
+# Functions decorated with tasks.registry.task are queued in the database
+# with .delay() and run by "python manage.py runworker". TASKS_ALWAYS_EAGER
+# runs them immediately in the calling process instead. Finished tasks are
+# kept for TASKS_RESULT_TTL seconds. Each worker also checks for due
+# periodic jobs (tasks.scheduler.periodic) every TASKS_SCHEDULER_INTERVAL
+# seconds.
+
+TASKS_ALWAYS_EAGER = config('TASKS_ALWAYS_EAGER', default=False, cast=bool)
+TASKS_WORKER_THREADS = config('TASKS_WORKER_THREADS', default=4, cast=int)
+TASKS_POLL_INTERVAL = config('TASKS_POLL_INTERVAL', default=1.0, cast=float)
+TASKS_RESULT_TTL = config('TASKS_RESULT_TTL', default=7 * 24 * 3600, cast=int)
+TASKS_SCHEDULER_INTERVAL = config(
+    'TASKS_SCHEDULER_INTERVAL', default=30, cast=int
+)
+
+# Live updates
+# Stock changes and sales are pushed to open pages through /live/stream/
+# (Server-Sent Events, served under ASGI only). LIVE_BROKER is "database"
+# to relay events between processes through the LiveEvent table, polled
+# every LIVE_POLL_INTERVAL seconds, or "local" for a single process.
+# Events are kept for LIVE_EVENT_TTL seconds.
+
+LIVE_BROKER = config('LIVE_BROKER', default='database')
+LIVE_POLL_INTERVAL = config('LIVE_POLL_INTERVAL', default=1.0, cast=float)
+LIVE_EVENT_TTL = config('LIVE_EVENT_TTL', default=3600, cast=int)
+
+# Change feed
+# Changes to sales, sale lines, purchases, items, categories and customers
+# are written to an outbox in the same transaction and served at
+# /events/feed/. Consumers authenticate with EVENTS_FEED_TOKEN (superusers
+# only when unset). Superseded events are compacted after EVENTS_COMPACT_AFTER
+# seconds and all events deleted after EVENTS_RETENTION seconds.
+
+EVENTS_FEED_TOKEN = config('EVENTS_FEED_TOKEN', default='')
+EVENTS_COMPACT_AFTER = config(
+    'EVENTS_COMPACT_AFTER', default=7 * 24 * 3600, cast=int
+)
+EVENTS_RETENTION = config('EVENTS_RETENTION', default=90 * 24 * 3600, cast=int)
+
+# Sharded stock
+# Items flagged in the admin keep their stock in STOCK_SLOTS rows so that
+# concurrent checkouts of them do not wait on one row lock (store.stock).
+
+STOCK_SLOTS = config('STOCK_SLOTS', default=8, cast=int)
+
+# Performance instrumentation
+# With PERFORMANCE_MONITORING on (by default only with DEBUG),
+# monitoring.middleware.PerformanceMiddleware records the time each request
+# spends in the database, cache and templates, and adds it as a
+# Server-Timing header to responses (to staff only, unless DEBUG). Queries
+# slower than SLOW_QUERY_MS are logged with their EXPLAIN plan.
+# PROFILE_SAMPLE_RATE (0 to 1) is the share of requests profiled with
+# PROFILER ("cprofile" writes .prof files for pstats/snakeviz,
+# "pyinstrument" writes HTML and needs the pyinstrument package) into
+# PROFILE_DIR.
+
+PERFORMANCE_MONITORING = config('PERFORMANCE_MONITORING', default=DEBUG, cast=bool)
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=100, cast=float)
+PROFILE_SAMPLE_RATE = config('PROFILE_SAMPLE_RATE', default=0.0, cast=float)
+PROFILER = config('PROFILER', default='cprofile')
+PROFILE_DIR = config('PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
+
+# N+1 query detection
+# monitoring.nplusone.NPlusOneMiddleware reports query shapes repeated
+# NPLUSONE_THRESHOLD times from one template line or line of code, with the
+# relation being loaded. On by default with DEBUG; NPLUSONE_RAISE turns the
+# log warning into an exception so that tests fail.
+
+NPLUSONE_DETECTION = config('NPLUSONE_DETECTION', default=DEBUG, cast=bool)
+NPLUSONE_THRESHOLD = config('NPLUSONE_THRESHOLD', default=3, cast=int)
+NPLUSONE_RAISE = config('NPLUSONE_RAISE', default=False, cast=bool)
+
+# Request capture
+# With TRACE_CAPTURE on, monitoring.middleware.TraceCaptureMiddleware appends
+# a sanitized trace of every request to TRACE_FILE (JSON lines, see
+# monitoring.traces) for the replay_traces command.
+
+TRACE_CAPTURE = config('TRACE_CAPTURE', default=False, cast=bool)
+TRACE_FILE = config('TRACE_FILE', default=str(BASE_DIR / 'traces' / 'requests.jsonl'))
+
+# Metrics
+# /metrics serves Prometheus metrics to scrapers sending
+# "Authorization: Bearer <METRICS_TOKEN>" (or to superusers when no token is
+# set). Every process (gunicorn workers, task workers and the scheduler)
+# writes its values to METRICS_DIR every METRICS_FLUSH_INTERVAL seconds and
+# a scrape adds them up, so all of them must share the directory. Without
+# DEBUG it defaults to a directory under the system temp dir; with DEBUG
+# (a single runserver process) values stay in memory unless it is set.
+
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_DIR = config(
+    'METRICS_DIR',
+    default='' if DEBUG
+    else os.path.join(tempfile.gettempdir(), 'inventoryms-metrics')
+)
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=float)
+
+# Logging
+# https://docs.djangoproject.com/en/5.1/topics/logging/
+# Everything goes to the console (gunicorn's error log). Set LOG_LEVEL=DEBUG
+# to see a timing line for every request.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'default': {
+            'format': '%(asctime)s %(levelname)s [%(name)s] %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'default',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': config('LOG_LEVEL', default='INFO'),
+    },
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -133,6 +347,17 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR,'static')
 MEDIA_ROOT = os.path.join(BASE_DIR, 'static/images')
 MEDIA_URL = '/images/'
 
+# WhiteNoise serves the collected static files from the app server, with
+# gzip/brotli variants built by collectstatic.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedStaticFilesStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
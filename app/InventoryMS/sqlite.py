@@ -0,0 +1,24 @@
+"""
+Module: InventoryMS.sqlite
+
+Applies the PRAGMAS configured for an SQLite database to every new
+connection, so concurrent tills do not run into ``database is locked``.
+
+WAL journaling lets readers proceed while a sale is being written, and
+``busy_timeout`` makes a writer wait for the lock instead of failing at
+once. Waiting only helps when transactions take the write lock up front:
+a deferred transaction that read first and then tries to write cannot
+wait, because the writer ahead of it may have changed what it read. That
+is why the settings also switch atomic blocks to ``BEGIN IMMEDIATE``.
+"""
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """
+    ``connection_created`` receiver running the database's PRAGMAS.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get('PRAGMAS') or {}
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
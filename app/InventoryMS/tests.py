@@ -0,0 +1,170 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from store.models import Category
+from .cache import (
+    _compute_and_store, _hashed, _version_key, bump_on_commit, bump_version,
+    cache_is_shared, cached, check_shared_cache, model_versions,
+    single_flight, versioned_key,
+)
+
+LOCMEM = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+}}
+DATABASE_CACHE = {'default': {
+    'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+    'LOCATION': 'inventoryms_cache',
+}}
+
+
+class VersionedCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def assertBumps(self, write):
+        key = versioned_key('categories', [Category])
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        self.assertNotEqual(versioned_key('categories', [Category]), key)
+
+    def test_saves_and_deletes_bump_the_version(self):
+        category = Category(name='Dairy')
+        self.assertBumps(category.save)
+        category.name = 'Milk'
+        self.assertBumps(category.save)
+        self.assertBumps(category.delete)
+
+    def test_bulk_writes_bump_the_version(self):
+        self.assertBumps(lambda: Category.objects.bulk_create(
+            [Category(name='Dairy', slug='dairy')]
+        ))
+        category = Category.objects.get()
+        category.name = 'Milk'
+        self.assertBumps(
+            lambda: Category.objects.bulk_update([category], ['name'])
+        )
+        self.assertBumps(lambda: Category.objects.update(name='Cheese'))
+
+    def test_writes_to_no_rows_keep_the_version(self):
+        key = versioned_key('categories', [Category])
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.filter(name='Missing').update(name='Other')
+        self.assertEqual(versioned_key('categories', [Category]), key)
+
+    def test_rolled_back_writes_keep_the_version(self):
+        key = versioned_key('categories', [Category])
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    bump_on_commit(Category)
+                    raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(versioned_key('categories', [Category]), key)
+
+    def test_evicted_versions_are_reseeded(self):
+        [version] = model_versions(Category)
+        cache.delete(_version_key(Category))
+        bump_version(Category)
+        [reseeded] = model_versions(Category)
+        self.assertIsNotNone(cache.get(_version_key(Category)))
+        self.assertGreater(reseeded, version)
+
+    def test_cached_recomputes_after_a_write(self):
+        compute = mock.Mock(side_effect=['first', 'second'])
+        self.assertEqual(cached('names', [Category], compute), 'first')
+        self.assertEqual(cached('names', [Category], compute), 'first')
+        bump_version(Category)
+        self.assertEqual(cached('names', [Category], compute), 'second')
+        self.assertEqual(compute.call_count, 2)
+
+    def test_parts_key_separate_entries(self):
+        self.assertNotEqual(versioned_key('search', [Category], 'rice'),
+                            versioned_key('search', [Category], 'salt'))
+
+
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.key = f"single-flight:stats:{_hashed(('all',))}"
+        self.lease_key = f'{self.key}:lease'
+
+    def flight(self, compute, **options):
+        return single_flight('stats', compute, 'all', models_=[Category],
+                             **options)
+
+    def test_cold_miss_computes_once(self):
+        compute = mock.Mock(return_value='stats')
+        self.assertEqual(self.flight(compute), 'stats')
+        self.assertEqual(self.flight(compute), 'stats')
+        self.assertEqual(compute.call_count, 1)
+        self.assertIsNone(cache.get(self.lease_key))
+
+    def test_version_bump_forces_a_recompute(self):
+        compute = mock.Mock(side_effect=['old', 'new'])
+        self.flight(compute)
+        bump_version(Category)
+        self.assertEqual(self.flight(compute), 'new')
+        self.assertEqual(compute.call_count, 2)
+
+    def test_callers_outside_the_lease_serve_the_stale_value(self):
+        self.flight(lambda: 'old')
+        bump_version(Category)
+        cache.add(self.lease_key, 'someone else')
+        compute = mock.Mock(return_value='new')
+        self.assertEqual(self.flight(compute), 'old')
+        compute.assert_not_called()
+
+    def test_callers_without_a_value_wait_for_the_leaseholder(self):
+        cache.add(self.lease_key, 'someone else')
+        versions = model_versions(Category)
+
+        def leaseholder_finishes(seconds):
+            _compute_and_store(self.key, lambda: 'theirs', versions, 300, 60)
+
+        compute = mock.Mock(return_value='mine')
+        with mock.patch('InventoryMS.cache.time.sleep',
+                        side_effect=leaseholder_finishes):
+            self.assertEqual(self.flight(compute), 'theirs')
+        compute.assert_not_called()
+
+    def test_callers_compute_themselves_after_waiting(self):
+        cache.add(self.lease_key, 'someone else')
+        self.assertEqual(self.flight(lambda: 'mine', wait=0.1), 'mine')
+
+    def test_refreshes_start_early_near_expiry(self):
+        # Computed in 10 seconds and expiring in one.
+        cache.set(self.key, ('old', model_versions(Category), 10.0,
+                             time.time() + 1))
+        with mock.patch('InventoryMS.cache.random.random',
+                        return_value=0.0):
+            self.assertEqual(self.flight(lambda: 'new'), 'old')
+        with mock.patch('InventoryMS.cache.random.random',
+                        return_value=0.99):
+            self.assertEqual(self.flight(lambda: 'new'), 'new')
+
+    def test_failed_computes_release_the_lease(self):
+        with self.assertRaises(ZeroDivisionError):
+            self.flight(lambda: 1 / 0)
+        self.assertIsNone(cache.get(self.lease_key))
+        self.assertEqual(self.flight(lambda: 'stats'), 'stats')
+
+
+class SharedCacheCheckTests(TestCase):
+    @override_settings(DEBUG=False, CACHES=LOCMEM)
+    def test_process_local_cache_fails_without_debug(self):
+        self.assertFalse(cache_is_shared())
+        [error] = check_shared_cache(None)
+        self.assertEqual(error.id, 'InventoryMS.E001')
+
+    @override_settings(DEBUG=True, CACHES=LOCMEM)
+    def test_process_local_cache_is_allowed_with_debug(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(DEBUG=False, CACHES=DATABASE_CACHE)
+    def test_shared_cache_passes(self):
+        self.assertTrue(cache_is_shared())
+        self.assertEqual(check_shared_cache(None), [])
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from monitoring.views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('store.urls')),
@@ -8,5 +10,9 @@ urlpatterns = [
     path('transactions/', include('transactions.urls')),
     path('accounts/', include('accounts.urls')),
     path('invoice/', include('invoice.urls')),
-    path('bills/', include('bills.urls'))
+    path('bills/', include('bills.urls')),
+    path('monitoring/', include('monitoring.urls')),
+    path('live/', include('live.urls')),
+    path('events/', include('outbox.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
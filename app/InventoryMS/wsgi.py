@@ -13,4 +13,7 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'InventoryMS.settings')
 
-app = get_wsgi_application()
+application = get_wsgi_application()
+
+# Vercel looks for ``app``.
+app = application
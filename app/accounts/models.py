@@ -6,6 +6,8 @@ from imagekit.models import ProcessedImageField
 from imagekit.processors import ResizeToFill
 from phonenumber_field.modelfields import PhoneNumberField
 
+from InventoryMS.cache import VersionedManager
+
 
 # Define choices for profile status and roles
 STATUS_CHOICES = [
@@ -107,6 +109,8 @@ class Vendor(models.Model):
         max_length=50, blank=True, null=True, verbose_name='Address'
     )
 
+    objects = VersionedManager()
+
     def __str__(self):
         """
         Returns a string representation of the vendor.
@@ -127,6 +131,8 @@ class Customer(models.Model):
     phone = models.CharField(max_length=30, blank=True, null=True)
     loyalty_points = models.IntegerField(default=0)
 
+    objects = VersionedManager()
+
     class Meta:
         db_table = 'Customers'
 
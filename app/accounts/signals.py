@@ -1,9 +1,13 @@
+import logging
+
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 from django.contrib.auth.models import User
 from .models import Profile
 
+logger = logging.getLogger(__name__)
+
 
 @receiver(post_save, sender=User)
 def handle_user_profile(sender, instance, created, **kwargs):
@@ -12,7 +16,7 @@ def handle_user_profile(sender, instance, created, **kwargs):
     """
     if created:
         Profile.objects.create(user=instance)
-        print('Profile created!')
+        logger.debug('Profile created for %s', instance)
     else:
         instance.profile.save()
-        print('Profile updated!')
+        logger.debug('Profile updated for %s', instance)
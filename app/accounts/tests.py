@@ -1 +1,23 @@
-# tests
\ No newline at end of file
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from store.tests import QueryBudgetTestCase
+from .models import Profile
+
+
+class AccountsQueryBudgetTests(QueryBudgetTestCase):
+    def create_staff(self, count):
+        start = User.objects.count()
+        users = User.objects.bulk_create(
+            User(username=f'staff{start + i}') for i in range(count)
+        )
+        # Profile slugs come from the email, so give each row its own.
+        Profile.objects.bulk_create(
+            Profile(user=user, email=f'{user.username}@example.com')
+            for user in users
+        )
+
+    def test_profile_list(self):
+        self.assertQueryBudget(
+            reverse('profile_list'), 5, self.create_staff
+        )
@@ -19,9 +19,9 @@ from django.views.generic import (
 
 # Third-party packages
 from django_tables2 import SingleTableView
-from django_tables2.export.views import ExportMixin
 
 # Local app imports
+from monitoring.mixins import TimedExportMixin
 from .models import Profile, Customer, Vendor
 from .forms import (
     CreateUserForm, UserUpdateForm,
@@ -89,7 +89,7 @@ def profile_update(request):
     )
 
 
-class ProfileListView(LoginRequiredMixin, ExportMixin, SingleTableView):
+class ProfileListView(LoginRequiredMixin, TimedExportMixin, SingleTableView):
     """
     Display a list of profiles in a table format.
     Requires user to be logged in
@@ -97,6 +97,7 @@ class ProfileListView(LoginRequiredMixin, ExportMixin, SingleTableView):
     Pagination is applied with 10 profiles per page.
     """
     model = Profile
+    queryset = Profile.objects.select_related('user')
     template_name = 'accounts/stafflist.html'
     context_object_name = 'profiles'
     table_class = ProfileTable
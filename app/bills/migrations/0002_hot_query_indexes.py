@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-19 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bills', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(condition=models.Q(('status', False)), fields=['date'], name='bill_unpaid_date_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from autoslug import AutoSlugField
 
+from InventoryMS.cache import VersionedManager
+
 
 class Bill(models.Model):
     """Model representing a bill with various details and payment status."""
@@ -53,5 +55,16 @@ class Bill(models.Model):
         help_text='Payment status of the bill'
     )
 
+    objects = VersionedManager()
+
     def __str__(self):
         return self.institution_name
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['date'],
+                name='bill_unpaid_date_idx',
+                condition=models.Q(status=False),
+            ),
+        ]
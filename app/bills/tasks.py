@@ -0,0 +1,27 @@
+"""
+Module: bills.tasks
+
+Background tasks and periodic jobs of the bills app, run by
+``manage.py runworker``.
+"""
+
+from tasks.registry import task
+from tasks.scheduler import periodic
+
+
+@task(unique=True, retry_delay=300)
+def pending_bills_alert():
+    """
+    Emails the list of pending bills, at most once an hour.
+    """
+    # Imported here so that loading tasks does not load the views.
+    from .views import send_email_alert
+    send_email_alert()
+
+
+@periodic('0 8 * * *')
+def pending_bills_digest():
+    """
+    Queues the morning pending-bills email, which retries on mail errors.
+    """
+    pending_bills_alert.delay()
@@ -13,32 +13,43 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 
 # Third-party packages
 from django_tables2 import SingleTableView
-from django_tables2.export.views import ExportMixin
 
 # Local app imports
+from monitoring.mixins import TimedExportMixin
 from .models import Bill
 from .tables import BillTable
 from accounts.models import Profile
 
 
 # SMTP Email Service
+import logging
 import time
 import smtplib
 from django.http import HttpResponse
-from django.db.models.signals import post_migrate
-from django.dispatch import receiver
 from django.core.mail import send_mail
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
 from .models import Bill
+from monitoring.metrics import Counter, Histogram
+from tasks.models import Throttle
 import time
 
-# Store the last email timestamp in memory
-LAST_EMAIL_TIMESTAMP = None
+logger = logging.getLogger(__name__)
+
+ALERT_EMAILS = Counter(
+    'inventory_alert_emails_total',
+    'Alert email checks, by alert and result.',
+    ['alert', 'result'],
+)
+ALERT_EMAIL_SECONDS = Histogram(
+    'inventory_alert_email_seconds',
+    'Time spent checking for and sending an alert email, in seconds.',
+    ['alert'],
+)
 
 
-class BillListView(LoginRequiredMixin, ExportMixin, SingleTableView):
+class BillListView(LoginRequiredMixin, TimedExportMixin, SingleTableView):
     """View for listing bills."""
     model = Bill
     table_class = BillTable
@@ -47,16 +58,6 @@ class BillListView(LoginRequiredMixin, ExportMixin, SingleTableView):
     paginate_by = 10
     SingleTableView.table_pagination = False
 
-    def get_context_data(self, **kwargs):
-        # Call the base method to get the context data
-        context = super().get_context_data(**kwargs)
-
-        # Send email alert when this view is accessed
-        send_email_alert()
-
-        # Add any additional context here if needed
-        return context
-
 
 class BillCreateView(LoginRequiredMixin, CreateView):
     """View for creating a new bill."""
@@ -116,21 +117,22 @@ class BillDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return reverse('bill_list')
 
 
+@ALERT_EMAIL_SECONDS.time(alert='pending_bills')
 def send_email_alert():
-    global LAST_EMAIL_TIMESTAMP  # Use global to access and update the timestamp
-
-    current_time = time.time()
-    
-    # If email was sent less than 60 minutes ago, skip sending email
-    if LAST_EMAIL_TIMESTAMP and current_time - LAST_EMAIL_TIMESTAMP < 3600:
-        print("Email was sent less than 60 minutes ago. Skipping notification.")
+    # If email was sent less than 60 minutes ago by any process, skip
+    # sending email
+    if not Throttle.acquire('pending_bills_alert', 3600):
+        logger.debug("Email was sent less than 60 minutes ago. Skipping notification.")
+        ALERT_EMAILS.inc(alert='pending_bills', result='throttled')
         return
 
     # Find pending bills
     pending_bills = Bill.objects.filter(status=False)
 
     if not pending_bills.exists():
-        print("No pending bills found.")
+        logger.debug("No pending bills found.")
+        ALERT_EMAILS.inc(alert='pending_bills', result='nothing_to_send')
+        Throttle.release('pending_bills_alert')
         return
 
     # Email configuration
@@ -183,6 +185,7 @@ def send_email_alert():
     </html>
     """
 
+    sent = False
     try:
         # Create SMTP connection
         with smtplib.SMTP(smtp_server, smtp_port) as server:
@@ -207,18 +210,16 @@ def send_email_alert():
 
             # Send the email
             server.sendmail(sender_email, recipient_email, msg.as_string())
-            print("Email sent successfully.")
-
-            # Update the in-memory timestamp
-            LAST_EMAIL_TIMESTAMP = current_time
+            logger.info("Email sent successfully.")
+            ALERT_EMAILS.inc(alert='pending_bills', result='sent')
+            sent = True
 
     except smtplib.SMTPException as e:
-        print(f"Error sending email: {e}")
-
-# Receiver function to handle post_migrate signal
-@receiver(post_migrate)
-def bill_pending_alert_on_migrate(sender, **kwargs):
-    """
-    Sends an alert email about pending bills after migrations are completed.
-    """
-    send_email_alert()
\ No newline at end of file
+        logger.error("Error sending email: %s", e)
+        ALERT_EMAILS.inc(alert='pending_bills', result='failed')
+        # Fail the task so that it is retried.
+        raise
+    finally:
+        if not sent:
+            # Let the next attempt send it.
+            Throttle.release('pending_bills_alert')
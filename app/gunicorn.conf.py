@@ -0,0 +1,119 @@
+"""
+Gunicorn configuration for production serving.
+
+Usage:
+    gunicorn InventoryMS.wsgi:application -c gunicorn.conf.py
+
+Every setting can be overridden through an environment variable. Set
+GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker and serve
+InventoryMS.asgi:application to run under ASGI instead.
+
+Send SIGHUP to the master for a graceful reload: new workers start before
+the old ones finish their in-flight requests. The app is preloaded in the
+master, so code changes need a full restart (or SIGUSR2 to start a new
+master).
+"""
+
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'InventoryMS.settings')
+
+# Workers share metrics through files in this directory (see
+# monitoring.metrics); it is emptied when the server starts. Set before
+# the settings are first read below, so that they pick it up even with
+# DEBUG on.
+os.environ.setdefault(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'inventoryms-metrics')
+)
+
+from django.conf import settings  # noqa: E402
+
+from InventoryMS.cache import cache_is_shared  # noqa: E402
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Requests spend most of their time waiting on the database, so a few
+# threads per worker use the CPU better than extra processes would.
+# Workers only agree on cached values (model versions, single_flight
+# leases) through a shared cache, the default without DEBUG. With a
+# process-local cache (local memory, the DEBUG default) one worker is the
+# default and more are refused at startup.
+workers = _env_int(
+    'GUNICORN_WORKERS',
+    multiprocessing.cpu_count() * 2 + 1 if cache_is_shared() else 1
+)
+threads = _env_int('GUNICORN_THREADS', 4)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+# Import the application once in the master so workers share its memory
+# copy-on-write instead of each importing it again.
+preload_app = _env_bool('GUNICORN_PRELOAD', True)
+
+# Recycle workers periodically to cap memory growth; the jitter keeps them
+# from all restarting at once.
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+timeout = _env_int('GUNICORN_TIMEOUT', 60)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.environ.get('GUNICORN_ERROR_LOG', '-')
+
+
+def on_starting(server):
+    if server.cfg.workers > 1 and not cache_is_shared():
+        raise RuntimeError(
+            'Several workers need a shared cache: set CACHE_BACKEND, or run '
+            'one worker (GUNICORN_WORKERS=1).'
+        )
+    shutil.rmtree(settings.METRICS_DIR, ignore_errors=True)
+    os.makedirs(settings.METRICS_DIR)
+
+
+def when_ready(server):
+    """
+    Runs in the master after the preloaded app is imported and before any
+    worker is forked.
+    """
+    if preload_app and _env_bool('PRELOAD_NLP_MODELS', False):
+        from store.views import warm_nlp_models
+        warm_nlp_models()
+        server.log.info('Loaded NLP models in the master')
+
+    # Connections and pools opened while loading must not be shared by the
+    # workers; each worker opens its own pool on first use.
+    from django.db import connections
+    connections.close_all()
+    for connection in connections.all(initialized_only=True):
+        if connection.alias in getattr(connection, '_connection_pools', {}):
+            connection.close_pool()
+
+    # Move everything loaded so far out of the garbage collector's reach so
+    # that collections in the workers do not touch (and copy) shared pages.
+    gc.freeze()
+
+
+def worker_exit(server, worker):
+    # Save the last values recorded since the previous periodic flush.
+    from monitoring.metrics import REGISTRY
+    REGISTRY.flush()
+
+
+def child_exit(server, worker):
+    from monitoring.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
@@ -0,0 +1,16 @@
+from django import forms
+
+from store.forms import ItemChoiceMixin
+from .models import Invoice
+
+
+class InvoiceForm(ItemChoiceMixin, forms.ModelForm):
+    """
+    A form for creating and updating invoices.
+    """
+    class Meta:
+        model = Invoice
+        fields = [
+            'customer_name', 'contact_number', 'item',
+            'price_per_item', 'quantity', 'shipping'
+        ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django_extensions.db.fields import AutoSlugField
 
+from InventoryMS.cache import VersionedManager
 from store.models import Item
 
 
@@ -39,6 +40,8 @@ class Invoice(models.Model):
         verbose_name='Grand Total  ', editable=False
     )
 
+    objects = VersionedManager()
+
     def save(self, *args, **kwargs):
         """
         Update total and grand_total before saving.
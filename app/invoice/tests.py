@@ -1,3 +1,43 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone
 
-# Create your tests here.
+from django.urls import reverse
+
+from store.models import Category, Item
+from store.tests import QueryBudgetTestCase
+from .models import Invoice
+
+
+class InvoiceQueryBudgetTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Groceries')
+
+    def create_invoices(self, count):
+        start = Item.objects.count()
+        items = Item.objects.bulk_create(
+            Item(name=f'Item {start + i}', description='',
+                 category=self.category)
+            for i in range(count)
+        )
+        # Invoice slugs come from the date, so give each row its own.
+        Invoice.objects.bulk_create(
+            Invoice(
+                date=datetime(2025, 1, 1, tzinfo=timezone.utc)
+                + timedelta(minutes=start + i),
+                customer_name='Jane', contact_number='0300', item=item,
+                price_per_item=1, quantity=1, shipping=0,
+                total=1, grand_total=1
+            )
+            for i, item in enumerate(items)
+        )
+
+    def test_invoice_list(self):
+        self.assertQueryBudget(
+            reverse('invoicelist'), 5, self.create_invoices
+        )
+
+    def test_invoice_list_export(self):
+        self.assertQueryBudget(
+            reverse('invoicelist') + '?_export=csv', 4,
+            self.create_invoices
+        )
@@ -11,18 +11,20 @@ from django.views.generic import (
 
 # Third-party packages
 from django_tables2 import SingleTableView
-from django_tables2.export.views import ExportMixin
 
 # Local app imports
+from monitoring.mixins import TimedExportMixin
+from .forms import InvoiceForm
 from .models import Invoice
 from .tables import InvoiceTable
 
 
-class InvoiceListView(LoginRequiredMixin, ExportMixin, SingleTableView):
+class InvoiceListView(LoginRequiredMixin, TimedExportMixin, SingleTableView):
     """
     View for listing invoices with table export functionality.
     """
     model = Invoice
+    queryset = Invoice.objects.select_related('item__category')
     table_class = InvoiceTable
     template_name = 'invoice/invoicelist.html'
     context_object_name = 'invoices'
@@ -35,6 +37,7 @@ class InvoiceDetailView(DetailView):
     View for displaying invoice details.
     """
     model = Invoice
+    queryset = Invoice.objects.select_related('item')
     template_name = 'invoice/invoicedetail.html'
 
     def get_success_url(self):
@@ -50,10 +53,7 @@ class InvoiceCreateView(LoginRequiredMixin, CreateView):
     """
     model = Invoice
     template_name = 'invoice/invoicecreate.html'
-    fields = [
-        'customer_name', 'contact_number', 'item',
-        'price_per_item', 'quantity', 'shipping'
-    ]
+    form_class = InvoiceForm
 
     def get_success_url(self):
         """
@@ -68,10 +68,7 @@ class InvoiceUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     """
     model = Invoice
     template_name = 'invoice/invoiceupdate.html'
-    fields = [
-        'customer_name', 'contact_number', 'item',
-        'price_per_item', 'quantity', 'shipping'
-    ]
+    form_class = InvoiceForm
 
     def get_success_url(self):
         """
@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from .models import LiveEvent
+
+
+class LiveEventAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for recent live events.
+    """
+    list_display = ('id', 'type', 'created_at')
+    list_filter = ('type',)
+    ordering = ('-id',)
+
+
+admin.site.register(LiveEvent, LiveEventAdmin)
@@ -0,0 +1,319 @@
+"""
+Module: live.broker
+
+Relays events from the code that changes data to the browsers listening
+on the event stream (see live.views).
+
+``publish`` is called from ordinary synchronous code. Listeners are
+coroutines on the ASGI event loop, which ``wait`` for the events after a
+cursor. Events carry increasing ids; browsers send the last one they saw
+when they reconnect and get what they missed, as long as it is still
+held.
+
+Two brokers are available through ``LIVE_BROKER``:
+
+``local``
+    Events stay in the process that published them. Enough for a single
+    server process, such as development.
+``database``
+    Events are written to the ``LiveEvent`` table and every process polls
+    it, once every ``LIVE_POLL_INTERVAL`` seconds however many browsers
+    it serves. Needed as soon as several processes serve requests.
+
+    Ids are handed out when a row is inserted, but rows become visible when
+    their transaction commits, which may be out of id order. The poller
+    therefore only moves past an id once every id before it has been
+    read; it waits up to ``GAP_WAIT`` seconds for a missing id before
+    taking it for a rolled-back insert and skipping it.
+
+    A process serving browsers keeps a ``LiveListener`` row fresh. When no
+    process has one, nobody is listening and publishing writes nothing, so
+    checkouts do not pay for events no one receives. Publishers look at
+    most every ``PRESENCE_CHECK`` seconds, so events published in the
+    first seconds after the first browser connects may not reach it.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import LiveEvent, LiveListener
+
+logger = logging.getLogger(__name__)
+
+# Events each process keeps for listeners that fall behind or reconnect.
+BUFFER_SIZE = 1000
+
+# Events fetched from the database at a time.
+FETCH_SIZE = 500
+
+# Seconds the database poller keeps running after the last listener left.
+POLLER_IDLE = 30
+
+# Seconds between refreshes of a listening process's LiveListener row, and
+# after which a row that was not refreshed counts as gone.
+PRESENCE_REFRESH = 10
+PRESENCE_TTL = 30
+
+# Seconds a publisher trusts its last look for listeners.
+PRESENCE_CHECK = 5
+
+# Seconds the database poller waits for a missing id to commit before
+# skipping it.
+GAP_WAIT = 2
+
+
+class Event:
+    __slots__ = ('id', 'type', 'data')
+
+    def __init__(self, id, type, data):
+        self.id = id
+        self.type = type
+        self.data = data
+
+    def encode(self):
+        """
+        Returns the event in the text/event-stream format.
+        """
+        return (
+            f'id: {self.id}\nevent: {self.type}\n'
+            f'data: {json.dumps(self.data, separators=(",", ":"))}\n\n'
+        )
+
+
+class LocalBroker:
+    """
+    Keeps the last ``BUFFER_SIZE`` events in memory and wakes the
+    listeners of this process when one is published.
+    """
+
+    def __init__(self):
+        self.events = deque(maxlen=BUFFER_SIZE)
+        self.last_id = 0
+        self.lock = threading.Lock()
+        self.waiters = set()
+
+    def publish(self, type, data):
+        with self.lock:
+            self.last_id += 1
+            self._append(Event(self.last_id, type, data))
+
+    def _append(self, event):
+        # Called with the lock held.
+        self.events.append(event)
+        for loop, flag in self.waiters:
+            try:
+                loop.call_soon_threadsafe(flag.set)
+            except RuntimeError:
+                # The listener's event loop has closed.
+                pass
+
+    async def latest_id(self):
+        """
+        Returns the id of the newest event, the cursor of a new listener.
+        """
+        return self.last_id
+
+    async def since(self, cursor):
+        with self.lock:
+            return [event for event in self.events if event.id > cursor]
+
+    async def wait(self, cursor, timeout):
+        """
+        Returns the events after ``cursor``, waiting up to ``timeout``
+        seconds for one if there are none yet. Returns an empty list on
+        timeout.
+        """
+        flag = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), flag)
+        with self.lock:
+            self.waiters.add(waiter)
+        try:
+            events = await self.since(cursor)
+            if not events:
+                try:
+                    await asyncio.wait_for(flag.wait(), timeout)
+                except asyncio.TimeoutError:
+                    return []
+                events = await self.since(cursor)
+            return events
+        finally:
+            with self.lock:
+                self.waiters.discard(waiter)
+
+
+class DatabaseBroker(LocalBroker):
+    """
+    Publishes events to the ``LiveEvent`` table. One poller per process
+    copies new rows into the in-memory buffer while anyone is listening;
+    listeners further behind than the buffer read the table directly.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.poller = None
+        self.poller_loop = None
+        # The buffer holds every event after this id; nothing until the
+        # poller starts.
+        self.floor = float('inf')
+        self.process = f'{socket.gethostname()}:{os.getpid()}'
+        self.listening = False
+        self.checked_at = float('-inf')
+        # When the poller first found an id missing after last_id.
+        self.gap_since = None
+
+    def publish(self, type, data):
+        if self.has_listeners():
+            LiveEvent.objects.create(type=type, data=data)
+
+    def has_listeners(self):
+        """
+        Returns whether any process serves browsers on the event stream,
+        as of at most ``PRESENCE_CHECK`` seconds ago.
+        """
+        now = time.monotonic()
+        if now - self.checked_at >= PRESENCE_CHECK:
+            self.listening = LiveListener.objects.filter(
+                seen_at__gte=timezone.now()
+                - timedelta(seconds=PRESENCE_TTL)
+            ).exists()
+            self.checked_at = now
+        return self.listening
+
+    async def latest_id(self):
+        return await sync_to_async(self._latest_id, thread_sensitive=False)()
+
+    async def since(self, cursor):
+        self._ensure_poller()
+        if cursor < self.floor:
+            # No further than the poller, which waits for gaps to fill.
+            return await sync_to_async(self._fetch, thread_sensitive=False)(
+                cursor, self.last_id
+            )
+        return await super().since(cursor)
+
+    def _ensure_poller(self):
+        loop = asyncio.get_running_loop()
+        if self.poller is None or self.poller.done() or \
+                self.poller_loop is not loop:
+            self.poller_loop = loop
+            self.poller = loop.create_task(self._poll())
+
+    async def _poll(self):
+        latest = await self.latest_id()
+        with self.lock:
+            # Start afresh: rows added while nobody polled are read from
+            # the table by the listeners that need them.
+            self.events.clear()
+            self.last_id = self.floor = latest
+            self.gap_since = None
+        idle_since = None
+        present_at = float('-inf')
+        while True:
+            if self.waiters:
+                idle_since = None
+                if time.monotonic() - present_at >= PRESENCE_REFRESH:
+                    present_at = time.monotonic()
+                    await self._presence(self._mark_present)
+            elif idle_since is None:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since > POLLER_IDLE:
+                await self._presence(self._mark_gone)
+                return
+            try:
+                events = self._settled(await sync_to_async(
+                    self._fetch, thread_sensitive=False
+                )(self.last_id))
+            except Exception:
+                logger.exception('Could not poll live events')
+                events = []
+            if events:
+                with self.lock:
+                    for event in events:
+                        self._append(event)
+                    self.last_id = events[-1].id
+                    if len(self.events) == self.events.maxlen:
+                        self.floor = self.events[0].id - 1
+            if len(events) < FETCH_SIZE:
+                await asyncio.sleep(settings.LIVE_POLL_INTERVAL)
+
+    def _settled(self, events):
+        """
+        Returns the leading ``events`` that follow ``last_id`` without a
+        gap, or across a gap that has been open for ``GAP_WAIT`` seconds.
+        The rest are read again on the next poll.
+        """
+        settled = []
+        expected = self.last_id + 1
+        for event in events:
+            if event.id != expected:
+                if self.gap_since is None:
+                    self.gap_since = time.monotonic()
+                if time.monotonic() - self.gap_since < GAP_WAIT:
+                    break
+            self.gap_since = None
+            settled.append(event)
+            expected = event.id + 1
+        return settled
+
+    async def _presence(self, update):
+        try:
+            await sync_to_async(update, thread_sensitive=False)()
+        except Exception:
+            logger.exception('Could not update live listener presence')
+
+    def _mark_present(self):
+        close_old_connections()
+        LiveListener.objects.update_or_create(
+            process=self.process, defaults={'seen_at': timezone.now()}
+        )
+
+    def _mark_gone(self):
+        close_old_connections()
+        LiveListener.objects.filter(process=self.process).delete()
+
+    def _latest_id(self):
+        close_old_connections()
+        latest = LiveEvent.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first()
+        return latest or 0
+
+    def _fetch(self, cursor, upto=None):
+        close_old_connections()
+        rows = LiveEvent.objects.filter(pk__gt=cursor).order_by('pk')
+        if upto is not None:
+            rows = rows.filter(pk__lte=upto)
+        return [
+            Event(row.pk, row.type, row.data) for row in rows[:FETCH_SIZE]
+        ]
+
+
+BROKERS = {
+    'local': LocalBroker,
+    'database': DatabaseBroker,
+}
+
+
+@lru_cache(maxsize=None)
+def _broker(kind):
+    return BROKERS[kind]()
+
+
+def get_broker():
+    """
+    Returns this process's broker of the ``LIVE_BROKER`` kind.
+    """
+    return _broker(settings.LIVE_BROKER)
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.5 on 2026-10-19 21:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveListener',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('process', models.CharField(max_length=100, unique=True)),
+                ('seen_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
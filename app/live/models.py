@@ -0,0 +1,27 @@
+from django.db import models
+
+
+class LiveEvent(models.Model):
+    """
+    A change pushed to browsers, kept briefly so that every process can
+    relay it (see live.broker.DatabaseBroker).
+    """
+    type = models.CharField(max_length=20)
+    data = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f'{self.type} #{self.pk}'
+
+
+class LiveListener(models.Model):
+    """
+    A process serving browsers on the event stream, refreshed while they
+    listen, so that publishers can skip writing events that nobody would
+    receive (see live.broker.DatabaseBroker).
+    """
+    process = models.CharField(max_length=100, unique=True)
+    seen_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f'{self.process} (seen {self.seen_at})'
@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+
+from store.models import LOW_STOCK_THRESHOLD, Item
+from transactions.models import Sale
+from transactions.signals import sales_synced
+from .broker import get_broker
+
+
+def publish_on_commit(type, data):
+    """
+    Publishes an event once the current transaction commits, so browsers
+    never see a change that is rolled back.
+    """
+    transaction.on_commit(
+        lambda: get_broker().publish(type, data), robust=True
+    )
+
+
+@receiver(post_init, sender=Item)
+def remember_quantity(sender, instance, **kwargs):
+    """
+    Signal to remember an item's quantity as loaded, to tell what a save
+    changed.
+    """
+    instance._live_quantity = instance.__dict__.get('quantity')
+
+
+def publish_quantity(item, previous, quantity):
+    """
+    Publishes an item's change of quantity from ``previous`` (None for a
+    new item), and its crossing below the low-stock threshold.
+    """
+    if previous == quantity:
+        return
+    publish_on_commit('stock', {
+        'id': item.pk,
+        'name': item.name,
+        'quantity': quantity,
+        'delta': quantity - (previous or 0),
+    })
+    if previous is not None and previous > LOW_STOCK_THRESHOLD >= quantity:
+        publish_on_commit('low_stock', {
+            'id': item.pk,
+            'name': item.name,
+            'quantity': quantity,
+            'threshold': LOW_STOCK_THRESHOLD,
+        })
+
+
+@receiver(post_save, sender=Item)
+def publish_stock_change(sender, instance, created, **kwargs):
+    """
+    Signal to push an item's new quantity, and low-stock crossings.
+    """
+    previous = None if created else instance._live_quantity
+    instance._live_quantity = instance.quantity
+    publish_quantity(instance, previous, instance.quantity)
+
+
+@receiver(post_save, sender=Sale)
+def publish_sale(sender, instance, created, **kwargs):
+    """
+    Signal to push new sales.
+    """
+    if created:
+        publish_on_commit('sale', {
+            'id': instance.pk,
+            'grand_total': float(instance.grand_total),
+            'date': instance.date_added.isoformat(),
+        })
+
+
+@receiver(sales_synced)
+def publish_synced_sales(sender, sales, items, quantities, **kwargs):
+    """
+    Signal to push the sales synced from offline tills and the stock they
+    took, which bulk writes do not signal on their own.
+    """
+    for sale in sales:
+        publish_sale(Sale, sale, created=True)
+    for item in items:
+        previous, quantity = quantities[item.pk]
+        item._live_quantity = quantity
+        publish_quantity(item, previous, quantity)
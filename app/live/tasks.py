@@ -0,0 +1,31 @@
+"""
+Module: live.tasks
+
+Periodic jobs of the live app, run by ``manage.py runworker``.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from tasks.scheduler import periodic
+from .broker import PRESENCE_TTL
+from .models import LiveEvent, LiveListener
+
+
+@periodic('*/10 * * * *')
+def prune_live_events():
+    """
+    Deletes live events older than ``LIVE_EVENT_TTL`` seconds. Browsers
+    that reconnect after longer miss the changes in between. Also deletes
+    the listener rows of processes that stopped without removing theirs.
+    """
+    now = timezone.now()
+    deleted, _ = LiveEvent.objects.filter(
+        created_at__lt=now - timedelta(seconds=settings.LIVE_EVENT_TTL)
+    ).delete()
+    LiveListener.objects.filter(
+        seen_at__lt=now - timedelta(seconds=PRESENCE_TTL)
+    ).delete()
+    return {'deleted': deleted}
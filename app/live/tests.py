@@ -0,0 +1,215 @@
+import asyncio
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Customer
+from store.models import Category, Item
+from transactions.models import Sale
+from .broker import GAP_WAIT, DatabaseBroker, Event, LocalBroker
+from .models import LiveEvent, LiveListener
+from .tasks import prune_live_events
+
+
+class BrokerTests(TestCase):
+    def test_local_broker(self):
+        broker = LocalBroker()
+
+        async def scenario():
+            cursor = await broker.latest_id()
+            self.assertEqual(await broker.wait(cursor, 0.01), [])
+            waiting = asyncio.ensure_future(broker.wait(cursor, 5))
+            await asyncio.sleep(0)
+            broker.publish('stock', {'id': 1})
+            [event] = await waiting
+            self.assertEqual((event.type, event.data), ('stock', {'id': 1}))
+            self.assertEqual(
+                event.encode(), f'id: {event.id}\nevent: stock\n'
+                                'data: {"id":1}\n\n'
+            )
+            broker.publish('sale', {'id': 2})
+            self.assertEqual(
+                [e.type for e in await broker.wait(cursor, 5)],
+                ['stock', 'sale'],
+            )
+
+        async_to_sync(scenario)()
+
+
+class DatabaseBrokerTests(TransactionTestCase):
+    def test_relays_events_between_processes(self):
+        publisher, listener = DatabaseBroker(), DatabaseBroker()
+
+        async def scenario():
+            cursor = await listener.latest_id()
+            waiting = asyncio.ensure_future(listener.wait(cursor, 5))
+            await asyncio.sleep(0.1)
+            await asyncio.to_thread(publisher.publish, 'sale', {'id': 2})
+            [event] = await waiting
+            self.assertEqual((event.id, event.type), (cursor + 1, 'sale'))
+            # Events from before the poller started are read from the table.
+            self.assertEqual(
+                [e.type for e in await listener.since(cursor - 1)], ['sale']
+            )
+            listener.poller.cancel()
+
+        with self.settings(LIVE_POLL_INTERVAL=0.05):
+            async_to_sync(scenario)()
+        self.assertTrue(
+            LiveListener.objects.filter(process=listener.process).exists()
+        )
+
+    def test_waits_for_ids_that_commit_late(self):
+        broker = DatabaseBroker()
+        broker.last_id = 10
+        events = [Event(id, 'stock', {}) for id in (11, 13, 14)]
+        with mock.patch('live.broker.time.monotonic', return_value=100):
+            # 12 may still be committing.
+            self.assertEqual([e.id for e in broker._settled(events)], [11])
+            broker.last_id = 11
+            self.assertEqual(broker._settled(events[1:]), [])
+        with mock.patch('live.broker.time.monotonic', return_value=101):
+            events.insert(1, Event(12, 'stock', {}))
+            self.assertEqual([e.id for e in broker._settled(events[1:])],
+                             [12, 13, 14])
+        broker.last_id = 14
+        with mock.patch('live.broker.time.monotonic', return_value=200):
+            self.assertEqual(broker._settled([Event(16, 'stock', {})]), [])
+        # 15 was rolled back.
+        with mock.patch('live.broker.time.monotonic',
+                        return_value=200 + GAP_WAIT):
+            self.assertEqual([e.id for e in broker._settled(
+                [Event(16, 'stock', {})]
+            )], [16])
+
+    def test_writes_nothing_without_listeners(self):
+        DatabaseBroker().publish('stock', {'id': 1})
+        self.assertFalse(LiveEvent.objects.exists())
+
+        # A process that stopped without removing its row.
+        LiveListener.objects.create(
+            process='gone:1', seen_at=timezone.now() - timedelta(minutes=5)
+        )
+        DatabaseBroker().publish('stock', {'id': 1})
+        self.assertFalse(LiveEvent.objects.exists())
+        prune_live_events()
+        self.assertFalse(LiveListener.objects.exists())
+
+        LiveListener.objects.create(process='web:1', seen_at=timezone.now())
+        DatabaseBroker().publish('stock', {'id': 1})
+        self.assertEqual(LiveEvent.objects.count(), 1)
+
+
+@override_settings(LIVE_BROKER='local')
+class SignalTests(TestCase):
+    def setUp(self):
+        from .broker import get_broker
+        self.broker = get_broker()
+        self.cursor = self.broker.last_id
+        self.item = Item.objects.create(
+            name='Rice', description='', quantity=30,
+            category=Category.objects.create(name='Food'),
+        )
+
+    def published(self):
+        return [(event.type, event.data) for event in self.broker.events
+                if event.id > self.cursor]
+
+    def test_events_follow_commits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.quantity = 25
+            self.item.save()
+            self.item.name = 'Basmati'
+            self.item.save()
+            self.item.quantity = 20
+            self.item.save()
+        self.assertEqual([event[0] for event in self.published()],
+                         ['stock', 'stock', 'low_stock'])
+        self.assertEqual(self.published()[1][1]['delta'], -5)
+        self.assertEqual(self.published()[2][1]['quantity'], 20)
+
+    def test_no_event_before_commit(self):
+        item = Item.objects.get(pk=self.item.pk)
+        item.quantity = 1
+        item.save()
+        self.assertEqual(self.published(), [])
+
+    def test_synced_sales_publish_the_stock_they_took(self):
+        from transactions.services import sync_sales
+
+        customer = Customer.objects.create(first_name='Ada', last_name='L')
+        # Loaded, and so remembered, before the sync changes the stock.
+        self.item.quantity = 28
+        self.item.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            sync_sales([{
+                'client_id': 'a', 'timestamp': timezone.now().isoformat(),
+                'customer': customer.pk, 'sub_total': 9, 'grand_total': 9,
+                'amount_paid': 9, 'amount_change': 0,
+                'items': [{'id': self.item.pk, 'price': 1, 'quantity': 9,
+                           'total_item': 9}],
+            }])
+        stock = [data for type, data in self.published() if type == 'stock']
+        self.assertEqual((stock[-1]['quantity'], stock[-1]['delta']),
+                         (19, -9))
+        self.assertIn('low_stock', [type for type, _ in self.published()])
+
+    def test_sales_are_published(self):
+        customer = Customer.objects.create(first_name='Ada', last_name='L')
+        with self.captureOnCommitCallbacks(execute=True):
+            sale = Sale.objects.create(customer=customer, grand_total=12)
+        self.assertEqual(
+            self.published(),
+            [('sale', {'id': sale.pk, 'grand_total': 12.0,
+                       'date': sale.date_added.isoformat()})],
+        )
+
+
+@override_settings(LIVE_BROKER='local')
+class StreamTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='pass')
+
+    def test_wsgi_requests_are_told_not_to_reconnect(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('live-stream')).status_code,
+                         204)
+
+    def test_requires_login(self):
+        response = self.client.get(reverse('live-stream'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_streams_events(self):
+        async def scenario():
+            from .broker import get_broker
+            await self.async_client.aforce_login(self.user)
+            get_broker().publish('stock', {'id': 1})
+            response = await self.async_client.get(
+                reverse('live-stream'),
+                headers={'Last-Event-ID': str(get_broker().last_id - 1)},
+            )
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            chunks = aiter(response.streaming_content)
+            self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+            self.assertIn(b'event: stock\n', await anext(chunks))
+            get_broker().publish('sale', {'id': 2})
+            self.assertIn(b'event: sale\n', await anext(chunks))
+            await chunks.aclose()
+
+        async_to_sync(scenario)()
+
+
+class PruneTests(TestCase):
+    def test_prunes_old_events(self):
+        LiveEvent.objects.create(type='stock', data={})
+        old = LiveEvent.objects.create(type='stock', data={})
+        LiveEvent.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+        self.assertEqual(prune_live_events(), {'deleted': 1})
+        self.assertEqual(LiveEvent.objects.count(), 1)
@@ -0,0 +1,10 @@
+# Django core imports
+from django.urls import path
+
+# Local app imports
+from .views import stream
+
+# URL patterns
+urlpatterns = [
+    path('stream/', stream, name='live-stream'),
+]
@@ -0,0 +1,55 @@
+"""
+Module: live.views
+
+Server-Sent Events stream of stock changes, low-stock crossings and new
+sales, consumed by the product list and the dashboard.
+
+Each open stream holds a connection, which only an ASGI server can afford
+(see GUNICORN_WORKER_CLASS in gunicorn.conf.py). Under WSGI the view
+answers 204 No Content, which tells EventSource not to reconnect; pages
+then simply stop updating live.
+"""
+
+from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .broker import get_broker
+
+# Seconds between keep-alive comments on an idle stream, below the idle
+# timeouts of common proxies.
+HEARTBEAT = 15
+
+# Milliseconds browsers wait before reconnecting a dropped stream.
+RETRY_MS = 3000
+
+
+@login_required
+async def stream(request):
+    """
+    Streams events as they are published, starting after the
+    ``Last-Event-ID`` a reconnecting browser sends, or from now.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    broker = get_broker()
+    last_id = request.headers.get('Last-Event-ID', '')
+    cursor = int(last_id) if last_id.isdigit() else await broker.latest_id()
+    response = StreamingHttpResponse(
+        _events(broker, cursor), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def _events(broker, cursor):
+    yield f'retry: {RETRY_MS}\n\n'
+    while True:
+        events = await broker.wait(cursor, HEARTBEAT)
+        if not events:
+            yield ': keep-alive\n\n'
+        for event in events:
+            cursor = event.id
+            yield event.encode()
@@ -0,0 +1,66 @@
+"""
+Module: monitoring.instrumentation
+
+Per-request performance counters. ``PerformanceMiddleware`` activates a
+``RequestStats`` for each request; the database wrapper, the template
+backend and the versioned cache record into it through the functions
+below, which do nothing outside a request.
+"""
+
+from contextvars import ContextVar
+
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """
+    Time and counts spent in the database, cache and templates while
+    serving one request. Times are in seconds.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+
+    def activate(self):
+        """
+        Makes this the current request's stats; returns a token for
+        ``deactivate``.
+        """
+        return _current.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+
+def current_stats():
+    """
+    Returns the stats of the request being served, or None.
+    """
+    return _current.get()
+
+
+def record_query(seconds):
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_time += seconds
+
+
+def record_cache(hit):
+    stats = _current.get()
+    if stats is not None:
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+
+
+def record_template(seconds):
+    stats = _current.get()
+    if stats is not None:
+        stats.template_time += seconds
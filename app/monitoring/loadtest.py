@@ -0,0 +1,331 @@
+"""
+Module: monitoring.loadtest
+
+An HTTP load generator for a running server, built on the standard
+library only.
+
+Each virtual user logs in with its own session and then repeats the
+scenario of its role, as a browser would: cashiers open the sale screen,
+look items up and check out, managers browse the dashboard, stock and bills,
+and reporters pull reports and exports. Roles are shared out between the
+users by weight, so a shop day with many cashiers and the odd report
+looks like ``ROLES`` below.
+
+``run()`` returns every request's endpoint, status and duration;
+``summarize()`` turns them into a JSON-serializable report and
+``compare()`` checks a report against a stored baseline.
+"""
+
+import http.cookiejar
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, timedelta
+
+SEARCH_TERMS = [
+    'milk', 'tea', 'rice', 'oil', 'soap', 'bread', 'sugar', 'juice',
+    'biscuits', 'chips', 'shampoo', 'flour',
+]
+CUSTOMER_OPTION = re.compile(r'<option value="(\d+)"')
+
+
+class LoadTestError(Exception):
+    pass
+
+
+class Session:
+    """
+    One virtual user: a cookie jar and a way to time requests.
+    """
+
+    def __init__(self, base_url, record=None, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.record = record or (lambda endpoint, status, seconds: None)
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies)
+        )
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, endpoint, path, data=None, json_body=None, ajax=False):
+        """
+        Sends a request, records how it went under ``endpoint`` and returns
+        ``(status, body)``. A redirect to the login page counts as an error.
+        """
+        headers = {}
+        if ajax:
+            headers['X-Requested-With'] = 'XMLHttpRequest'
+        if json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif data is not None:
+            data = urllib.parse.urlencode(data).encode()
+        if data is not None:
+            headers['X-CSRFToken'] = self.csrf_token()
+
+        request = urllib.request.Request(
+            self.base_url + path, data=data, headers=headers
+        )
+        started = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                body = response.read()
+                status = response.status
+                if '/login/' in response.geturl() and 'login' not in endpoint:
+                    status = 401
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            body = b''
+            status = 0
+        self.record(endpoint, status, time.perf_counter() - started)
+        return status, body
+
+    def login(self, username, password):
+        self.request('login', '/accounts/login/')
+        self.request('login', '/accounts/login/', data={
+            'username': username,
+            'password': password,
+            'csrfmiddlewaretoken': self.csrf_token(),
+        })
+        # The redirect after logging in may fail on its own; the session
+        # cookie is what tells whether the credentials were accepted.
+        if 'sessionid' not in {cookie.name for cookie in self.cookies}:
+            raise LoadTestError(f'Could not log in as {username!r}.')
+
+
+def cashier(session, rng):
+    """
+    Opens the sale screen, looks up a few items and checks out.
+    """
+    status, body = session.request('new-sale page', '/transactions/new-sale/')
+    customers = CUSTOMER_OPTION.findall(body.decode(errors='replace'))
+    lines = []
+    for _ in range(rng.randint(1, 4)):
+        status, body = session.request(
+            'get-items', '/get-items/', ajax=True,
+            data={'term': rng.choice(SEARCH_TERMS)},
+        )
+        if status == 200:
+            found = json.loads(body)
+            if found:
+                lines.append(rng.choice(found))
+    if not customers or not lines:
+        return
+
+    items = []
+    for item in {line['id']: line for line in lines}.values():
+        quantity = rng.randint(1, 3)
+        items.append({
+            'id': item['id'],
+            'price': item['price'],
+            'quantity': quantity,
+            'total_item': round(item['price'] * quantity, 2),
+        })
+    total = round(sum(item['total_item'] for item in items), 2)
+    session.request('checkout', '/transactions/new-sale/', ajax=True,
+                    json_body={
+                        'customer': rng.choice(customers),
+                        'sub_total': total,
+                        'grand_total': total,
+                        'tax_amount': 0,
+                        'tax_percentage': 0,
+                        'amount_paid': total,
+                        'amount_change': 0,
+                        'items': items,
+                    })
+
+
+def manager(session, rng):
+    """
+    Checks the dashboard, the stock list, a search and the bills.
+    """
+    session.request('dashboard', '/')
+    session.request('products', f'/products/?page={rng.randint(1, 5)}')
+    session.request('search', '/search/?q=' + rng.choice(SEARCH_TERMS))
+    session.request('bills', '/bills/bills/')
+
+
+def reporter(session, rng):
+    """
+    Runs a sales report over the last month, then one export.
+    """
+    today = date.today()
+    query = urllib.parse.urlencode({
+        'from_date': (today - timedelta(days=30)).isoformat(),
+        'to_date': today.isoformat(),
+    })
+    session.request('sales report', f'/transactions/sales/report/?{query}')
+    endpoint, path = rng.choice([
+        ('products export', '/products/?_export=xlsx'),
+        ('sales export', '/transactions/sales/export/'),
+    ])
+    session.request(endpoint, path)
+
+
+# (role, weight, scenario)
+ROLES = [
+    ('cashier', 8, cashier),
+    ('manager', 3, manager),
+    ('reporter', 1, reporter),
+]
+
+
+def assign_roles(users, roles=ROLES):
+    """
+    Shares ``users`` out between the roles in proportion to their weights,
+    giving every role at least one user when there are enough.
+    """
+    total = sum(weight for _, weight, _ in roles)
+    assigned = []
+    cumulative = 0
+    for index, (name, weight, scenario) in enumerate(roles):
+        cumulative += weight
+        upto = round(users * cumulative / total)
+        count = max(upto - len(assigned), 0)
+        if count == 0 and len(assigned) < users:
+            count = 1
+        assigned.extend([(name, scenario)] * count)
+    return assigned[:users]
+
+
+def run(base_url, username, password, users=10, duration=60, think_time=0.5,
+        seed=0, roles=ROLES):
+    """
+    Drives the server at ``base_url`` with ``users`` concurrent virtual
+    users for ``duration`` seconds. Between scenarios each user waits a
+    random time averaging ``think_time`` seconds.
+
+    Returns the recorded requests as ``(endpoint, status, seconds)`` and
+    the wall time the run took.
+    """
+    records = []
+    lock = threading.Lock()
+    errors = []
+
+    def record(endpoint, status, seconds):
+        with lock:
+            records.append((endpoint, status, seconds))
+
+    sessions = []
+    for number, (role, scenario) in enumerate(assign_roles(users, roles)):
+        session = Session(base_url)
+        session.login(username, password)
+        session.record = record
+        sessions.append((session, scenario, random.Random(seed + number)))
+
+    deadline = time.monotonic() + duration
+
+    def virtual_user(session, scenario, rng):
+        try:
+            while time.monotonic() < deadline:
+                scenario(session, rng)
+                if think_time:
+                    time.sleep(min(rng.expovariate(1 / think_time),
+                                   max(deadline - time.monotonic(), 0)))
+        except Exception as e:
+            errors.append(e)
+
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=virtual_user, args=args, daemon=True)
+        for args in sessions
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return records, time.perf_counter() - started
+
+
+def percentile(ordered, fraction):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(records, elapsed):
+    """
+    Throughput, latency percentiles (in milliseconds) and error rate per
+    endpoint and overall.
+    """
+    by_endpoint = {}
+    for endpoint, status, seconds in records:
+        by_endpoint.setdefault(endpoint, []).append((status, seconds))
+    by_endpoint['all'] = [(status, seconds) for _, status, seconds in records]
+
+    endpoints = {}
+    for endpoint, samples in sorted(by_endpoint.items()):
+        durations = sorted(seconds * 1000 for _, seconds in samples)
+        errors = sum(1 for status, _ in samples
+                     if status == 0 or status >= 400)
+        endpoints[endpoint] = {
+            'requests': len(samples),
+            'errors': errors,
+            'error_rate': round(errors / len(samples), 4) if samples else 0,
+            'rps': round(len(samples) / elapsed, 2) if elapsed else 0,
+            'mean_ms': round(sum(durations) / len(durations), 2)
+            if durations else 0,
+            'p50_ms': round(percentile(durations, 0.50), 2),
+            'p90_ms': round(percentile(durations, 0.90), 2),
+            'p95_ms': round(percentile(durations, 0.95), 2),
+            'p99_ms': round(percentile(durations, 0.99), 2),
+            'max_ms': round(durations[-1], 2) if durations else 0,
+        }
+    return {'duration_s': round(elapsed, 2), 'endpoints': endpoints}
+
+
+def compare(report, baseline, tolerance=0.2, error_margin=0.01,
+            throughput=True):
+    """
+    Lists the regressions of ``report`` against ``baseline``: an endpoint
+    whose p95 latency grew by more than ``tolerance`` (a fraction), whose
+    error rate rose by more than ``error_margin``, or, unless
+    ``throughput`` is false, an overall throughput that fell by more than
+    ``tolerance``.
+    """
+    regressions = []
+    for endpoint, before in baseline['endpoints'].items():
+        after = report['endpoints'].get(endpoint)
+        if after is None:
+            regressions.append(f'{endpoint}: no requests recorded')
+            continue
+        if after['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f"{endpoint}: p95 {after['p95_ms']:.1f} ms "
+                f"(baseline {before['p95_ms']:.1f} ms)"
+            )
+        if after['error_rate'] > before['error_rate'] + error_margin:
+            regressions.append(
+                f"{endpoint}: error rate {after['error_rate']:.2%} "
+                f"(baseline {before['error_rate']:.2%})"
+            )
+    if not throughput:
+        return regressions
+    before_rps = baseline['endpoints'].get('all', {}).get('rps', 0)
+    after_rps = report['endpoints'].get('all', {}).get('rps', 0)
+    if after_rps < before_rps * (1 - tolerance):
+        regressions.append(
+            f'all: throughput {after_rps:.1f} req/s '
+            f'(baseline {before_rps:.1f} req/s)'
+        )
+    return regressions
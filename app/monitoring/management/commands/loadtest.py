@@ -0,0 +1,110 @@
+"""
+Management command: loadtest
+
+Runs the shop-day scenarios of monitoring.loadtest against a running
+server and reports throughput, latency percentiles and error rates per
+endpoint. The report can be written as JSON and compared with a stored
+baseline, failing when an endpoint got slower or less reliable.
+
+Start the server first (for example ``gunicorn InventoryMS.wsgi:application
+-c gunicorn.conf.py``) on a database filled by ``generate_dataset``. The
+user must exist there; --create-user adds it to the configured database.
+
+Usage:
+    python manage.py loadtest --url http://127.0.0.1:8000 --users 20 --duration 60
+    python manage.py loadtest --output report.json --baseline baseline.json
+"""
+
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.loadtest import (
+    LoadTestError, ROLES, assign_roles, compare, run, summarize,
+)
+
+
+class Command(BaseCommand):
+    help = 'Load test a running server with weighted shop-day scenarios.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--username', default='loadtest')
+        parser.add_argument('--password', default='loadtest')
+        parser.add_argument('--create-user', action='store_true',
+                            help='Create the user in the configured '
+                                 'database if it does not exist.')
+        parser.add_argument('--users', type=int, default=10,
+                            help='Concurrent virtual users.')
+        parser.add_argument('--duration', type=float, default=60,
+                            help='Seconds to run.')
+        parser.add_argument('--think-time', type=float, default=0.5,
+                            help='Average pause between scenarios, seconds.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report here.')
+        parser.add_argument('--baseline',
+                            help='Fail on regressions against this report.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed p95 latency growth and throughput '
+                                 'drop, as a fraction (default 0.2).')
+
+    def handle(self, *args, **options):
+        if options['create_user'] and not User.objects.filter(
+                username=options['username']).exists():
+            User.objects.create_user(options['username'],
+                                     password=options['password'])
+
+        mix = {}
+        for role, _ in assign_roles(options['users']):
+            mix[role] = mix.get(role, 0) + 1
+        self.stdout.write('Virtual users: ' + ', '.join(
+            f'{mix[role]} {role}' for role, _, _ in ROLES if role in mix
+        ))
+
+        try:
+            records, elapsed = run(
+                options['url'], options['username'], options['password'],
+                users=options['users'], duration=options['duration'],
+                think_time=options['think_time'], seed=options['seed'],
+            )
+        except LoadTestError as e:
+            raise CommandError(e)
+        report = summarize(records, elapsed)
+        report['config'] = {
+            key: options[key]
+            for key in ('url', 'users', 'duration', 'think_time', 'seed')
+        }
+
+        self.stdout.write(
+            f"\n{'endpoint':<18}{'requests':>9}{'errors':>8}{'req/s':>8}"
+            f"{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+        )
+        for endpoint, row in report['endpoints'].items():
+            self.stdout.write(
+                f"{endpoint:<18}{row['requests']:>9}{row['errors']:>8}"
+                f"{row['rps']:>8.1f}{row['p50_ms']:>9.1f}"
+                f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+                f"{row['max_ms']:>9.1f}"
+            )
+        self.stdout.write('(latencies in ms)')
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+        if options['baseline']:
+            with open(options['baseline']) as source:
+                baseline = json.load(source)
+            regressions = compare(report, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError(
+                    'Regressions against the baseline:\n  '
+                    + '\n  '.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS(
+                'No regressions against the baseline.'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('Load test finished.'))
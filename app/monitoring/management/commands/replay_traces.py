@@ -0,0 +1,134 @@
+"""
+Management command: replay_traces
+
+Plays back request traces captured with TRACE_CAPTURE (see
+monitoring.traces) against a running server, keeping the original spacing
+between requests or compressing it by --speed. Reports latency and error
+rate per endpoint and fails on regressions against the latencies recorded
+in the traces, or against a previous replay report given with --baseline.
+
+Requests are sent with one logged-in session per recorded role; roles
+without --credentials use --username/--password. Logins, logouts and
+POSTs whose body was not captured are skipped.
+
+Usage:
+    python manage.py replay_traces traces/requests.jsonl --url https://staging.example.com
+    python manage.py replay_traces traces/requests.jsonl --speed 5 --credentials operative=till1:secret
+    python manage.py replay_traces traces/requests.jsonl --speed 10 --output replay.json --baseline last.json
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.loadtest import LoadTestError, Session, compare, summarize
+from monitoring.traces import (
+    load_traces, recorded_summary, replay, replayable,
+)
+
+
+class Command(BaseCommand):
+    help = 'Replay captured request traces and report latency regressions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('trace_file')
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--speed', type=float, default=1.0,
+                            help='Replay speed: 1, 5, 10 ... times the '
+                                 'recorded rate.')
+        parser.add_argument('--username', default='loadtest')
+        parser.add_argument('--password', default='loadtest')
+        parser.add_argument('--credentials', nargs='*', default=[],
+                            metavar='ROLE=USER:PASSWORD',
+                            help='Log in as this user for the requests of '
+                                 'a recorded role.')
+        parser.add_argument('--limit', type=int,
+                            help='Replay only the first N requests.')
+        parser.add_argument('--workers', type=int, default=32,
+                            help='Maximum requests in flight.')
+        parser.add_argument('--output', help='Write the JSON report here.')
+        parser.add_argument('--baseline',
+                            help='Compare with this replay report instead '
+                                 'of the recorded latencies.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed p95 latency growth, as a '
+                                 'fraction (default 0.2).')
+
+    def handle(self, *args, **options):
+        if options['speed'] <= 0:
+            raise CommandError('--speed must be positive.')
+        traces = load_traces(options['trace_file'])
+        if options['limit']:
+            traces = traces[:options['limit']]
+        selected = [trace for trace in traces if replayable(trace)]
+        if not selected:
+            raise CommandError('No replayable requests in the trace file.')
+
+        logins = {None: (options['username'], options['password'])}
+        for entry in options['credentials']:
+            role, _, login = entry.partition('=')
+            username, _, password = login.partition(':')
+            if not role or not username:
+                raise CommandError(f'Malformed credentials: {entry!r}')
+            logins[role] = (username, password)
+        try:
+            sessions = {}
+            for role, (username, password) in logins.items():
+                sessions[role] = Session(options['url'])
+                sessions[role].login(username, password)
+        except LoadTestError as e:
+            raise CommandError(e)
+
+        span = selected[-1]['t'] - selected[0]['t']
+        self.stdout.write(
+            f'Replaying {len(selected):,} of {len(traces):,} requests '
+            f'({span:.0f} s recorded) at {options["speed"]:g}x...'
+        )
+        records, elapsed, lag = replay(
+            selected, sessions, options['speed'], options['workers']
+        )
+        report = summarize(records, elapsed)
+        report['config'] = {
+            'url': options['url'], 'speed': options['speed'],
+            'trace_file': options['trace_file'], 'requests': len(selected),
+            'max_lag_s': round(lag, 3),
+        }
+
+        if options['baseline']:
+            with open(options['baseline']) as source:
+                baseline = json.load(source)
+        else:
+            baseline = recorded_summary(selected)
+
+        self.stdout.write(
+            f"\n{'endpoint':<28}{'requests':>9}{'errors':>8}"
+            f"{'p50':>9}{'p95':>9}{'base p95':>10}"
+        )
+        for endpoint, row in report['endpoints'].items():
+            before = baseline['endpoints'].get(endpoint, {})
+            self.stdout.write(
+                f"{endpoint:<28}{row['requests']:>9}{row['errors']:>8}"
+                f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+                f"{before.get('p95_ms', float('nan')):>10.1f}"
+            )
+        self.stdout.write('(latencies in ms)')
+        if lag > 1:
+            self.stdout.write(self.style.WARNING(
+                f'Requests went out up to {lag:.1f} s late; raise --workers '
+                f'or lower --speed for the pacing to hold.'
+            ))
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+        # A replay is paced by the recording, so its throughput says
+        # nothing about the server.
+        regressions = compare(report, baseline, options['tolerance'],
+                              throughput=False)
+        if regressions:
+            raise CommandError(
+                'Regressions:\n  ' + '\n  '.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('No latency regressions.'))
@@ -0,0 +1,307 @@
+"""
+Module: monitoring.metrics
+
+A small metrics registry rendered in the Prometheus text format by the
+``/metrics`` endpoint.
+
+Recording a value only updates a dict in the current process. When
+``METRICS_DIR`` is set (the default without DEBUG), every process also
+dumps its values to ``<METRICS_DIR>/<pid>.json`` from a background thread
+every ``METRICS_FLUSH_INTERVAL`` seconds, and a scrape adds up the files of
+all processes. Counters of processes that exited (gunicorn workers, task
+workers) are folded into ``archive.json`` so totals never go backwards.
+
+Define metrics at module level, next to the code that records them::
+
+    SALES = Counter('inventory_sales_total', 'Sales recorded.')
+    SALES.inc()
+"""
+
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+    60.0,
+)
+
+ARCHIVE = 'archive.json'
+
+
+class Registry:
+    """
+    The metrics of this process and their current values.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.flusher_pid = None
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'Duplicate metric: {metric.name}')
+        self.metrics[metric.name] = metric
+
+    def reset_after_fork(self):
+        self.lock = threading.Lock()
+        self.flusher_pid = None
+        for metric in self.metrics.values():
+            metric.values.clear()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: [[list(key), value]
+                       for key, value in metric.values.items()]
+                for name, metric in self.metrics.items()
+                if metric.kind != 'gauge'
+            }
+
+    def ensure_flusher(self):
+        """
+        Starts the thread writing this process's values to METRICS_DIR,
+        once per process.
+        """
+        if self.flusher_pid == os.getpid():
+            return
+        with self.lock:
+            if self.flusher_pid == os.getpid():
+                return
+            self.flusher_pid = os.getpid()
+        if not settings.METRICS_DIR:
+            return
+        threading.Thread(
+            target=self._flush_periodically, name='metrics-flusher',
+            daemon=True,
+        ).start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        """
+        Writes this process's values to ``<METRICS_DIR>/<pid>.json``.
+        """
+        if not settings.METRICS_DIR:
+            return
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = os.path.join(settings.METRICS_DIR, f'{os.getpid()}.json')
+        _write_json(path, self.snapshot())
+
+    def collect(self):
+        """
+        Returns the values of every process, added up.
+        """
+        if not settings.METRICS_DIR:
+            return self.snapshot()
+        self.flush()
+        totals = {}
+        with _directory_lock():
+            for name in os.listdir(settings.METRICS_DIR):
+                if name.endswith('.json'):
+                    _merge(totals, _read_json(
+                        os.path.join(settings.METRICS_DIR, name)
+                    ))
+        return totals
+
+    def render(self):
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        values = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            if metric.kind == 'gauge':
+                lines.append(f'{name} {_number(metric.function())}')
+                continue
+            for key, value in sorted(values.get(name, []),
+                                     key=lambda pair: pair[0]):
+                lines.extend(metric.samples(dict(zip(metric.labelnames, key)),
+                                            value))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+os.register_at_fork(after_in_child=REGISTRY.reset_after_fork)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        REGISTRY.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    """
+    A value that only goes up, such as the number of sales recorded.
+    """
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with REGISTRY.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        REGISTRY.ensure_flusher()
+
+    def samples(self, labels, value):
+        return [f'{self.name}{_labels(labels)} {_number(value)}']
+
+
+class Histogram(Metric):
+    """
+    A distribution of observed values, such as request durations in
+    seconds, counted into cumulative ``buckets``.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with REGISTRY.lock:
+            # Per-bucket counts, then the +Inf count, then the sum.
+            data = self.values.get(key)
+            if data is None:
+                data = self.values[key] = [0] * (len(self.buckets) + 2)
+            data[index] += 1
+            data[-1] += value
+        REGISTRY.ensure_flusher()
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observes the duration of the ``with`` block, in seconds. Labels
+        can still be changed inside the block through the yielded dict.
+        """
+        labels = dict(labels)
+        started = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self, labels, data):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), data[:-1]):
+            cumulative += count
+            bucket_labels = _labels({**labels, 'le': _number(bound)})
+            lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+        lines.append(f'{self.name}_sum{_labels(labels)} {_number(data[-1])}')
+        lines.append(f'{self.name}_count{_labels(labels)} {cumulative}')
+        return lines
+
+
+class Gauge(Metric):
+    """
+    A current value computed by ``function`` when metrics are scraped,
+    such as the number of items low on stock.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, function):
+        super().__init__(name, documentation)
+        self.function = function
+
+
+def mark_process_dead(pid):
+    """
+    Folds the values of an exited process into the archive. Called by the
+    gunicorn master when a worker exits, and by task workers as they stop.
+    """
+    if not settings.METRICS_DIR:
+        return
+    path = os.path.join(settings.METRICS_DIR, f'{pid}.json')
+    archive = os.path.join(settings.METRICS_DIR, ARCHIVE)
+    with _directory_lock():
+        if not os.path.exists(path):
+            return
+        totals = {}
+        for source in (archive, path):
+            if os.path.exists(source):
+                _merge(totals, _read_json(source))
+        _write_json(archive, totals)
+        os.remove(path)
+
+
+def _merge(totals, values):
+    for name, pairs in values.items():
+        merged = {tuple(key): value for key, value in totals.get(name, [])}
+        for key, value in pairs:
+            key = tuple(key)
+            if key not in merged:
+                merged[key] = value
+            elif isinstance(value, list):
+                merged[key] = [a + b for a, b in zip(merged[key], value)]
+            else:
+                merged[key] += value
+        totals[name] = [[list(key), value] for key, value in merged.items()]
+
+
+@contextmanager
+def _directory_lock():
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    with open(os.path.join(settings.METRICS_DIR, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_json(path):
+    try:
+        with open(path) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(path, data):
+    # Write and rename so readers never see a half-written file.
+    temporary = f'{path}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w') as output:
+        json.dump(data, output)
+    os.replace(temporary, path)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\')
+                         .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _number(value):
+    if isinstance(value, (str, int)):
+        return str(value)
+    value = float(value)
+    return f'{value:.1f}' if value.is_integer() else repr(value)
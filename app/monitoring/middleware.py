@@ -0,0 +1,253 @@
+"""
+Module: monitoring.middleware
+
+``RequestMetricsMiddleware`` times every request for the
+``http_request_duration_seconds`` metric.
+
+With ``PERFORMANCE_MONITORING`` on (the default with DEBUG),
+``PerformanceMiddleware`` records where each request spends its time:
+total wall time, number and time of database queries, versioned-cache
+hits and misses, and template rendering. The numbers go to the
+``monitoring.requests`` logger and out in a ``Server-Timing`` header
+(shown by the browser's network tab), which outside DEBUG only staff
+receive so that other clients learn nothing of the internals.
+
+Queries slower than ``SLOW_QUERY_MS`` are logged to ``monitoring.queries``
+with their EXPLAIN plan. With ``PROFILE_SAMPLE_RATE`` above zero, that
+share of requests is profiled and the profile written to ``PROFILE_DIR``.
+
+``TraceCaptureMiddleware`` records sanitized request traces for replay
+(see monitoring.traces) when ``TRACE_CAPTURE`` is on.
+"""
+
+import cProfile
+import logging
+import os
+import random
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections
+
+from .instrumentation import RequestStats, record_query
+from .metrics import Histogram
+from .traces import TraceWriter, sanitize_body, sanitize_query, user_role
+
+request_logger = logging.getLogger('monitoring.requests')
+query_logger = logging.getLogger('monitoring.queries')
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds',
+    'Time to serve a request, in seconds, by URL name and method.',
+    ['view', 'method'],
+)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records how long every request takes, by URL name and method.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        match = request.resolver_match
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            view=match.view_name if match else 'unmatched',
+            method=request.method,
+        )
+        return response
+
+
+class PerformanceMiddleware:
+    """
+    Times every request and reports the breakdown in ``Server-Timing``.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_MONITORING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = stats.activate()
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                if random.random() < settings.PROFILE_SAMPLE_RATE:
+                    response = _profiled(self.get_response, request)
+                else:
+                    response = self.get_response(request)
+        finally:
+            stats.deactivate(token)
+        elapsed = time.perf_counter() - started
+
+        # The user is set by the authentication middleware further in.
+        user = getattr(request, 'user', None)
+        if settings.DEBUG or (user is not None and user.is_staff):
+            response['Server-Timing'] = _server_timing(stats, elapsed)
+        request_logger.debug(
+            '%s %s %s %.1fms db=%d/%.1fms cache=%d/%d tpl=%.1fms',
+            request.method, request.path, response.status_code,
+            elapsed * 1000, stats.queries, stats.query_time * 1000,
+            stats.cache_hits, stats.cache_misses, stats.template_time * 1000,
+        )
+        return response
+
+
+class TraceCaptureMiddleware:
+    """
+    Appends a sanitized trace of every request to ``TRACE_FILE``.
+
+    Must come after the authentication middleware, which provides the
+    user whose role is recorded.
+    """
+
+    def __init__(self, get_response):
+        if not settings.TRACE_CAPTURE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.writer = TraceWriter(settings.TRACE_FILE)
+
+    def __call__(self, request):
+        started = time.time()
+        timer = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - timer
+
+        match = request.resolver_match
+        trace = {
+            't': round(started, 3),
+            'm': request.method,
+            'p': request.path,
+            'v': match.view_name if match else None,
+            'q': sanitize_query(request.GET),
+            'r': user_role(request),
+            's': response.status_code,
+            'd': round(duration * 1000, 1),
+        }
+        body = getattr(request, '_trace_body', None)
+        if body is not None:
+            trace['b'], trace['j'] = body
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            trace['x'] = 1
+        self.writer.write(trace)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Read the body before the view does; form data can no longer be
+        # read raw once the view has parsed it.
+        body, is_json = sanitize_body(request.resolver_match.view_name,
+                                      request)
+        if body is not None:
+            request._trace_body = (body, int(is_json))
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper that records query time and logs the plan of
+    slow queries.
+    """
+
+    def __init__(self):
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - started
+        if self.explaining:
+            return result
+
+        record_query(duration)
+        if duration * 1000 >= settings.SLOW_QUERY_MS and not many:
+            query_logger.warning(
+                'Slow query (%.1f ms): %s; params=%r\n%s',
+                duration * 1000, sql, params,
+                self.explain(context['connection'], sql, params),
+            )
+        return result
+
+    def explain(self, connection, sql, params):
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return '(no plan for non-SELECT statements)'
+        self.explaining = True
+        # A savepoint keeps a failed EXPLAIN from breaking the surrounding
+        # transaction on PostgreSQL. Outside a transaction there is none.
+        sid = connection.savepoint()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'{connection.ops.explain_query_prefix()} {sql}', params
+                )
+                plan = '\n'.join(str(row[-1]) for row in cursor.fetchall())
+        except DatabaseError as e:
+            if sid:
+                connection.savepoint_rollback(sid)
+            return f'(EXPLAIN failed: {e})'
+        else:
+            if sid:
+                connection.savepoint_commit(sid)
+            return plan
+        finally:
+            self.explaining = False
+
+
+def _server_timing(stats, elapsed):
+    return ', '.join([
+        f'db;dur={stats.query_time * 1000:.1f};desc="{stats.queries} queries"',
+        f'cache;desc="{stats.cache_hits} hits, {stats.cache_misses} misses"',
+        f'tpl;dur={stats.template_time * 1000:.1f}',
+        f'total;dur={elapsed * 1000:.1f}',
+    ])
+
+
+def _profiled(get_response, request):
+    """
+    Serves the request under the configured profiler and writes the
+    profile to ``PROFILE_DIR``.
+    """
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    name = '{}.{:06d}-{}-{}{}'.format(
+        time.strftime('%Y%m%d-%H%M%S'), int(time.time() * 1e6) % 1000000,
+        os.getpid(),
+        re.sub(r'[^\w-]+', '_', request.path).strip('_') or 'root',
+        '.html' if settings.PROFILER == 'pyinstrument' else '.prof',
+    )
+    path = os.path.join(settings.PROFILE_DIR, name)
+
+    if settings.PROFILER == 'pyinstrument':
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            return get_response(request)
+        finally:
+            profiler.stop()
+            with open(path, 'w') as output:
+                output.write(profiler.output_html())
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another thread is already being profiled (only one profiler can
+        # be active per process on Python 3.12+).
+        return get_response(request)
+    try:
+        return get_response(request)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -0,0 +1,27 @@
+"""
+Module: monitoring.mixins
+
+View mixins recording metrics.
+"""
+
+from django_tables2.export.views import ExportMixin
+
+from .metrics import Histogram
+
+EXPORT_SECONDS = Histogram(
+    'inventory_export_seconds',
+    'Time to build a table or spreadsheet export, in seconds.',
+    ['export', 'format'],
+)
+
+
+class TimedExportMixin(ExportMixin):
+    """
+    django-tables2's ExportMixin, timing every export it builds.
+    """
+
+    def create_export(self, export_format):
+        with EXPORT_SECONDS.time(
+            export=self.model._meta.model_name, format=export_format
+        ):
+            return super().create_export(export_format)
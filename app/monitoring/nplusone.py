@@ -0,0 +1,182 @@
+"""
+Module: monitoring.nplusone
+
+Finds N+1 queries at runtime: the same query run again and again from
+the same template line or line of code, typically a related object loaded
+lazily inside a loop (``{{ purchase.item.name }}`` without
+``select_related``, or ``Item.__str__`` reading ``self.category`` for
+every option of a form select).
+
+While a ``Detector`` is active, every SELECT is recorded with its shape
+(the SQL without parameter values), the template line and the project
+code that ran it and, for lazy loads, the model and field being loaded.
+Shapes repeated ``NPLUSONE_THRESHOLD`` times from one place are reported.
+
+``NPlusOneMiddleware`` runs a detector around each request when
+``NPLUSONE_DETECTION`` is on, logging findings to ``monitoring.nplusone``
+or, with ``NPLUSONE_RAISE``, raising ``NPlusOneError`` so tests fail.
+Tests can also use ``detect_nplusone()`` directly.
+"""
+
+import logging
+import os
+import re
+import sys
+from contextlib import contextmanager, ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('monitoring.nplusone')
+
+RELATED_DESCRIPTORS = os.path.join(
+    'django', 'db', 'models', 'fields', 'related_descriptors.py'
+)
+TEMPLATE_BASE = os.path.join('django', 'template', 'base.py')
+IGNORED_CODE = (
+    os.path.join('monitoring', ''), 'site-packages', 'dist-packages',
+)
+PLACEHOLDER_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+class Finding:
+    """
+    One query shape repeated ``count`` times from the same place.
+    """
+
+    def __init__(self, sql, template, code, relation, count):
+        self.sql = sql
+        self.template = template
+        self.code = code
+        self.relation = relation
+        self.count = count
+
+    def __str__(self):
+        what = f'loading {self.relation}' if self.relation else 'running'
+        where = ', '.join(filter(None, [self.template, self.code]))
+        return (
+            f'{self.count} identical queries {what} from {where}:\n'
+            f'    {self.sql}'
+        )
+
+
+class Detector:
+    """
+    Database execute wrapper recording the shape and origin of every query.
+    """
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold or settings.NPLUSONE_THRESHOLD
+        self.counts = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        # Writes repeated per row are usually deliberate; N+1s are reads.
+        if not many and sql.lstrip()[:6].upper() == 'SELECT':
+            frame = sys._getframe(1)
+            key = (shape(sql),) + origin(frame)
+            self.counts[key] = self.counts.get(key, 0) + 1
+        return execute(sql, params, many, context)
+
+    def findings(self):
+        return [
+            Finding(sql, template, code, relation, count)
+            for (sql, template, code, relation), count in self.counts.items()
+            if count >= self.threshold
+        ]
+
+
+def shape(sql):
+    """
+    The query with ``IN (%s, %s, ...)`` lists of any length made equal.
+    """
+    return PLACEHOLDER_LIST.sub('(...)', sql)
+
+
+def origin(frame):
+    """
+    Where a query comes from: ``(template line, code line, relation)``,
+    each None when not found. The relation is ``Model.field`` for lazy
+    loads through a related-object descriptor.
+    """
+    template = code = relation = None
+    base_dir = str(settings.BASE_DIR)
+    while frame is not None and (template is None or code is None):
+        filename = frame.f_code.co_filename
+        if relation is None and filename.endswith(RELATED_DESCRIPTORS):
+            relation = _relation(frame.f_locals.get('self'))
+        elif (template is None and filename.endswith(TEMPLATE_BASE)
+              and frame.f_code.co_name == 'render_annotated'):
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            if token is not None:
+                name = node.origin.template_name or node.origin.name
+                template = f'{name}:{token.lineno}'
+        elif (code is None and filename.startswith(base_dir)
+              and not any(part in filename for part in IGNORED_CODE)):
+            code = '{}:{} in {}'.format(
+                os.path.relpath(filename, base_dir), frame.f_lineno,
+                frame.f_code.co_name,
+            )
+        frame = frame.f_back
+    return template, code, relation
+
+
+def _relation(descriptor):
+    instance = getattr(descriptor, 'instance', None)
+    if instance is not None:
+        # A related manager: reverse foreign key or many-to-many.
+        accessor = getattr(descriptor, 'prefetch_cache_name', None) or \
+            descriptor.field.remote_field.get_accessor_name()
+        return f'{type(instance).__name__}.{accessor}'
+    field = getattr(descriptor, 'field', None)
+    if field is not None:
+        # Forward foreign key or one-to-one.
+        return f'{field.model.__name__}.{field.name}'
+    related = getattr(descriptor, 'related', None)
+    if related is not None:
+        # Reverse one-to-one.
+        return f'{related.model.__name__}.{related.get_accessor_name()}'
+    return None
+
+
+@contextmanager
+def detect_nplusone(threshold=None):
+    """
+    Records the queries run inside the block, on every database, and
+    yields the ``Detector``; call ``findings()`` on it afterwards.
+    """
+    detector = Detector(threshold)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(detector))
+        yield detector
+
+
+class NPlusOneMiddleware:
+    """
+    Reports the N+1 queries of each request.
+    """
+
+    def __init__(self, get_response):
+        if not settings.NPLUSONE_DETECTION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with detect_nplusone() as detector:
+            response = self.get_response(request)
+        findings = detector.findings()
+        if findings:
+            message = '{} {}: N+1 queries\n{}'.format(
+                request.method, request.path,
+                '\n'.join(str(finding) for finding in findings),
+            )
+            if settings.NPLUSONE_RAISE:
+                raise NPlusOneError(message)
+            logger.warning(message)
+        return response
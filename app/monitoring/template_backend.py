@@ -0,0 +1,34 @@
+"""
+Module: monitoring.template_backend
+
+Django template backend that times every top-level render for the
+request's performance stats. Templates included from a rendered template
+are part of their parent's time.
+"""
+
+import time
+
+from django.template.backends import django as django_backend
+
+from .instrumentation import record_template
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            record_template(time.perf_counter() - started)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """
+    The standard Django backend, returning timed templates.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
@@ -0,0 +1,299 @@
+import json
+import os
+import pstats
+import tempfile
+
+from django.contrib.auth.models import User
+from django.db.models import Sum
+from django.template import engines
+from django.http import HttpResponse
+from django.test import (
+    LiveServerTestCase, RequestFactory, TestCase, override_settings,
+)
+from django.urls import reverse
+
+from accounts.models import Customer
+from store.models import Category, Item
+from transactions.models import SaleDetail
+from . import loadtest, traces
+from .nplusone import NPlusOneError, NPlusOneMiddleware, detect_nplusone
+from .metrics import REGISTRY, Counter, Histogram, mark_process_dead
+
+TEST_COUNTER = Counter('test_events_total', 'Test events.', ['kind'])
+TEST_HISTOGRAM = Histogram('test_seconds', 'Test durations.', buckets=(1, 5))
+
+
+class DatabaseStatsViewTests(TestCase):
+    def test_reports_connection_settings(self):
+        user = User.objects.create_superuser('admin', password='admin')
+        self.client.force_login(user)
+        response = self.client.get(reverse('monitoring-db'))
+        self.assertEqual(response.status_code, 200)
+        default = response.json()['databases']['default']
+        self.assertIn('conn_max_age', default)
+        self.assertTrue(default['connected'])
+        # SQLite has no connection pool.
+        self.assertIsNone(default['pool'])
+
+    def test_requires_superuser(self):
+        user = User.objects.create_user('staff', password='staff')
+        self.client.force_login(user)
+        response = self.client.get(reverse('monitoring-db'))
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(PERFORMANCE_MONITORING=True)
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        self.client.force_login(
+            User.objects.create_user('staff', is_staff=True)
+        )
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('profile_list'))
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'cache;desc=', 'tpl;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+        self.assertNotIn('db;dur=0.0;desc="0 queries"', timing)
+        self.assertNotIn('tpl;dur=0.0', timing)
+
+    def test_server_timing_is_for_staff_only(self):
+        self.client.force_login(User.objects.create_user('cashier'))
+        response = self.client.get(reverse('profile_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(PERFORMANCE_MONITORING=False)
+    def test_off_unless_enabled(self):
+        response = self.client.get(reverse('profile_list'))
+        self.assertNotIn('Server-Timing', response)
+        # Request durations are still measured for /metrics.
+        self.assertIn('http_request_duration_seconds_count{view="profile_list"',
+                      REGISTRY.render())
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_queries_logged_with_plan(self):
+        with self.assertLogs('monitoring.queries', 'WARNING') as logs:
+            self.client.get(reverse('profile_list'))
+        self.assertTrue(
+            any('Slow query' in line and ('SCAN' in line or 'SEARCH' in line)
+                for line in logs.output)
+        )
+
+    def test_sampled_profiles_written(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                PROFILE_SAMPLE_RATE=1.0, PROFILE_DIR=directory
+            ):
+                self.client.get(reverse('profile_list'))
+            profiles = os.listdir(directory)
+            self.assertEqual(len(profiles), 1)
+            pstats.Stats(os.path.join(directory, profiles[0]))
+
+
+class MetricsRegistryTests(TestCase):
+    def setUp(self):
+        TEST_COUNTER.values.clear()
+        TEST_HISTOGRAM.values.clear()
+
+    def test_renders_prometheus_text(self):
+        TEST_COUNTER.inc(kind='a')
+        TEST_COUNTER.inc(2, kind='a')
+        TEST_HISTOGRAM.observe(0.5)
+        TEST_HISTOGRAM.observe(3)
+        TEST_HISTOGRAM.observe(7)
+        text = REGISTRY.render()
+        self.assertIn('# TYPE test_events_total counter', text)
+        self.assertIn('test_events_total{kind="a"} 3', text)
+        self.assertIn('test_seconds_bucket{le="1"} 1', text)
+        self.assertIn('test_seconds_bucket{le="5"} 2', text)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn('test_seconds_sum 10.5', text)
+        self.assertIn('test_seconds_count 3', text)
+
+    def test_adds_up_worker_processes(self):
+        TEST_COUNTER.inc(kind='a')
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(METRICS_DIR=directory):
+                # Another worker that has since exited.
+                with open(os.path.join(directory, '999999.json'), 'w') as f:
+                    json.dump({
+                        'test_events_total': [[['a'], 4], [['b'], 1]],
+                        'test_seconds': [[[], [0, 1, 0, 2.0]]],
+                    }, f)
+                mark_process_dead(999999)
+                self.assertEqual(
+                    sorted(os.listdir(directory)), ['.lock', 'archive.json']
+                )
+                text = REGISTRY.render()
+        self.assertIn('test_events_total{kind="a"} 5', text)
+        self.assertIn('test_events_total{kind="b"} 1', text)
+        self.assertIn('test_seconds_count 1', text)
+
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsViewTests(TestCase):
+    def test_requires_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(
+            reverse('metrics'), headers={'Authorization': 'Bearer secret'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE http_request_duration_seconds histogram',
+                      response.content)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_superusers_without_token(self):
+        self.client.force_login(User.objects.create_superuser('admin'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+
+class LoadTestTests(LiveServerTestCase):
+    def test_cashiers_check_out(self):
+        User.objects.create_user('cashier', password='cashier')
+        Customer.objects.create(first_name='Ali', last_name='Khan')
+        category = Category.objects.create(name='Dairy')
+        for term in loadtest.SEARCH_TERMS:
+            Item.objects.create(name=term.title(), category=category,
+                                quantity=1000, price=2.5)
+        # One user: the live server shares the test's SQLite connection
+        # between its threads, so concurrent checkouts are not isolated.
+        records, elapsed = loadtest.run(
+            self.live_server_url, 'cashier', 'cashier', users=1, duration=1,
+            think_time=0, roles=[('cashier', 1, loadtest.cashier)],
+        )
+        report = loadtest.summarize(records, elapsed)
+        checkout = report['endpoints']['checkout']
+        self.assertGreater(checkout['requests'], 0)
+        self.assertEqual(report['endpoints']['all']['errors'], 0)
+        sold = SaleDetail.objects.aggregate(Sum('quantity'))['quantity__sum']
+        in_stock = Item.objects.aggregate(Sum('quantity'))['quantity__sum']
+        self.assertEqual(sold + in_stock, 1000 * len(loadtest.SEARCH_TERMS))
+
+    def test_wrong_password(self):
+        with self.assertRaises(loadtest.LoadTestError):
+            loadtest.run(self.live_server_url, 'nobody', 'x', users=1,
+                         duration=0)
+
+
+class LoadTestReportTests(TestCase):
+    def test_roles_shared_by_weight(self):
+        roles = [role for role, _ in loadtest.assign_roles(12)]
+        self.assertEqual(
+            [roles.count('cashier'), roles.count('manager'),
+             roles.count('reporter')], [8, 3, 1]
+        )
+        self.assertEqual(len(loadtest.assign_roles(1)), 1)
+
+    def test_summary_and_baseline(self):
+        records = [('search', 200, n / 1000) for n in range(1, 101)]
+        records.append(('search', 500, 0.001))
+        report = loadtest.summarize(records, elapsed=10)
+        search = report['endpoints']['search']
+        self.assertEqual(search['p50_ms'], 50)
+        self.assertEqual(search['p95_ms'], 95)
+        self.assertEqual(search['errors'], 1)
+        self.assertEqual(report['endpoints']['all']['rps'], 10.1)
+        self.assertEqual(json.loads(json.dumps(report)), report)
+
+        self.assertEqual(loadtest.compare(report, report), [])
+        slower = loadtest.summarize(
+            [(endpoint, status, seconds * 2)
+             for endpoint, status, seconds in records], elapsed=10
+        )
+        self.assertEqual(len(loadtest.compare(slower, report)), 2)
+
+
+class TraceCaptureTests(TestCase):
+    def setUp(self):
+        self.trace_file = os.path.join(tempfile.mkdtemp(), 'traces.jsonl')
+        self.client.force_login(User.objects.create_superuser('admin'))
+
+    def captured(self):
+        return traces.load_traces(self.trace_file)
+
+    def test_records_sanitized_traces(self):
+        with self.settings(TRACE_CAPTURE=True, TRACE_FILE=self.trace_file):
+            self.client.get(
+                reverse('sale-report'), {'customer_name': 'Ali Khan'}
+            )
+            self.client.post(
+                reverse('sale-create'), json.dumps({
+                    'customer': 1, 'items': [{'id': 3, 'price': 2,
+                                              'quantity': 1, 'total_item': 2,
+                                              'note': 'x'}],
+                    'comment': 'dropped',
+                }), content_type='application/json',
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            )
+            self.client.post(reverse('user-logout'))
+
+        report, sale, logout = self.captured()
+        self.assertEqual(report['v'], 'sale-report')
+        self.assertEqual(report['q'], {'customer_name': traces.REDACTED})
+        self.assertEqual(report['r'], 'superuser')
+        self.assertEqual(sale['b'], {
+            'customer': 1,
+            'items': [{'id': 3, 'price': 2, 'quantity': 1, 'total_item': 2}],
+        })
+        self.assertEqual((sale['j'], sale['x']), (1, 1))
+        self.assertTrue(traces.replayable(report))
+        self.assertTrue(traces.replayable(sale))
+        self.assertFalse(traces.replayable(logout))
+        self.assertEqual(traces.endpoint(sale), 'sale-create POST')
+        self.assertEqual(
+            traces.replay_path(report),
+            reverse('sale-report') + '?customer_name=-'
+        )
+
+    def test_off_by_default(self):
+        self.client.get(reverse('sale-report'))
+        self.assertFalse(os.path.exists(self.trace_file))
+
+
+class NPlusOneTests(TestCase):
+    def setUp(self):
+        for number in range(3):
+            category = Category.objects.create(name=f'Category {number}')
+            Item.objects.create(name=f'Item {number}', category=category)
+
+    def test_flags_lazy_loads_with_template_line(self):
+        template = engines.all()[0].from_string(
+            '<ul>\n{% for item in items %}\n'
+            '<li>{{ item.category.name }}</li>\n{% endfor %}</ul>'
+        )
+        with detect_nplusone() as detector:
+            template.render({'items': Item.objects.all()})
+        [finding] = detector.findings()
+        self.assertEqual(finding.count, 3)
+        self.assertEqual(finding.relation, 'Item.category')
+        self.assertTrue(finding.template.endswith(':3'))
+
+        with detect_nplusone() as detector:
+            template.render(
+                {'items': Item.objects.select_related('category')}
+            )
+        self.assertEqual(detector.findings(), [])
+
+    def test_flags_lazy_loads_in_code(self):
+        with detect_nplusone() as detector:
+            [str(item) for item in Item.objects.all()]
+        [finding] = detector.findings()
+        self.assertEqual(finding.relation, 'Item.category')
+        self.assertIn('store/models.py', finding.code)
+        self.assertIn('__str__', finding.code)
+
+    @override_settings(NPLUSONE_DETECTION=True, NPLUSONE_RAISE=True)
+    def test_middleware_fails_requests(self):
+        self.client.force_login(User.objects.create_superuser('admin'))
+        for name in ('delivery-create', 'purchase-create', 'invoice-create'):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+
+        def n_plus_one_view(request):
+            return HttpResponse(', '.join(map(str, Item.objects.all())))
+
+        middleware = NPlusOneMiddleware(n_plus_one_view)
+        with self.assertRaisesMessage(NPlusOneError, 'loading Item.category'):
+            middleware(RequestFactory().get('/'))
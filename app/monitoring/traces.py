@@ -0,0 +1,240 @@
+"""
+Module: monitoring.traces
+
+Request traces: what ``TraceCaptureMiddleware`` records about real
+traffic, and how the ``replay_traces`` command plays it back.
+
+A trace file holds one JSON object per line with short keys:
+
+    t   time the request started (Unix seconds)
+    m   method
+    p   path
+    v   URL name of the view
+    q   query parameters, sensitive values redacted
+    b   request body, only for the views in CAPTURED_BODIES
+    j   1 when ``b`` is a JSON body rather than form fields
+    x   1 for AJAX requests
+    r   role of the user: anonymous, superuser, or the profile role
+    s   response status
+    d   time to respond, in milliseconds
+
+Nothing else from the request is kept: no cookies, headers, IP addresses
+or free-text form fields.
+"""
+
+import json
+import os
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from .loadtest import summarize
+
+# Views whose bodies are worth replaying, with the fields kept.
+CAPTURED_BODIES = {
+    'sale-create': {
+        'customer', 'sub_total', 'grand_total', 'tax_amount',
+        'tax_percentage', 'amount_paid', 'amount_change', 'items',
+    },
+    'get_items': {'term'},
+    'get_customers': {'term'},
+}
+SALE_LINE_FIELDS = {'id', 'price', 'quantity', 'total_item'}
+
+# Query parameters whose values identify people or grant access.
+REDACTED_PARAMS = {
+    'password', 'token', 'csrfmiddlewaretoken', 'email', 'phone',
+    'customer_name', 'name', 'first_name', 'last_name', 'address',
+}
+REDACTED = '-'
+
+# Never replayed: they would end or replace the replay's own session.
+SKIPPED_VIEWS = {'user-login', 'user-logout', 'user-register'}
+
+
+def sanitize_query(query):
+    """
+    Query parameters as a dict, single values unwrapped, with sensitive
+    values redacted.
+    """
+    sanitized = {}
+    for key, values in query.lists():
+        if key.lower() in REDACTED_PARAMS:
+            values = [REDACTED] * len(values)
+        sanitized[key] = values[0] if len(values) == 1 else values
+    return sanitized
+
+
+def sanitize_body(view_name, request):
+    """
+    The allowed fields of the request body for the views in
+    CAPTURED_BODIES, or None. Returns ``(body, is_json)``.
+    """
+    fields = CAPTURED_BODIES.get(view_name)
+    if fields is None or request.method != 'POST':
+        return None, False
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return None, True
+        if not isinstance(data, dict):
+            return None, True
+        body = {key: value for key, value in data.items() if key in fields}
+        if isinstance(body.get('items'), list):
+            body['items'] = [
+                {key: line.get(key) for key in SALE_LINE_FIELDS}
+                for line in body['items'] if isinstance(line, dict)
+            ]
+        return body, True
+    return {
+        key: request.POST.get(key) for key in fields if key in request.POST
+    }, False
+
+
+def user_role(request):
+    """
+    The requesting user's role, looked up once per session.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return 'anonymous'
+    role = request.session.get('trace_role')
+    if role is None:
+        if user.is_superuser:
+            role = 'superuser'
+        else:
+            profile = getattr(user, 'profile', None)
+            role = (profile and profile.get_role_display()) or 'user'
+            role = role.lower()
+        request.session['trace_role'] = role
+    return role
+
+
+class TraceWriter:
+    """
+    Appends trace lines to a file. Each line goes out in one ``write`` on
+    a file opened for appending, so several worker processes can share the
+    file without interleaving lines.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.fd = None
+        self.pid = None
+
+    def write(self, trace):
+        line = (json.dumps(trace, separators=(',', ':')) + '\n').encode()
+        with self.lock:
+            if self.pid != os.getpid():
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self.fd = os.open(
+                    self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600
+                )
+                self.pid = os.getpid()
+            os.write(self.fd, line)
+
+
+def load_traces(path):
+    """
+    Reads a trace file, oldest request first, skipping unreadable lines.
+    """
+    traces = []
+    with open(path) as source:
+        for line in source:
+            try:
+                traces.append(json.loads(line))
+            except ValueError:
+                continue
+    traces.sort(key=lambda trace: trace['t'])
+    return traces
+
+
+def replayable(trace):
+    """
+    Whether a trace can be sent again: GETs, and POSTs whose body was
+    captured.
+    """
+    if trace.get('v') in SKIPPED_VIEWS:
+        return False
+    if trace['m'] == 'GET':
+        return True
+    return trace['m'] == 'POST' and 'b' in trace
+
+
+def endpoint(trace):
+    """
+    The name results are grouped under: the view name, and the method when
+    it is not GET.
+    """
+    name = trace.get('v') or trace['p']
+    return name if trace['m'] == 'GET' else f"{name} {trace['m']}"
+
+
+def replay_path(trace):
+    query = urllib.parse.urlencode(trace.get('q', {}), doseq=True)
+    return trace['p'] + (f'?{query}' if query else '')
+
+
+def recorded_summary(traces):
+    """
+    Per-endpoint latency of the traces as recorded, in the format of
+    ``monitoring.loadtest.summarize``.
+    """
+    if not traces:
+        return summarize([], 0)
+    records = [
+        (endpoint(trace), trace['s'], trace['d'] / 1000)
+        for trace in traces
+    ]
+    return summarize(records, traces[-1]['t'] - traces[0]['t'])
+
+
+def replay(traces, sessions, speed=1.0, workers=32):
+    """
+    Sends ``traces`` again, keeping their original spacing divided by
+    ``speed``. ``sessions`` maps a role to the logged-in
+    ``monitoring.loadtest.Session`` used for that role's requests; other
+    roles use the ``None`` entry.
+
+    Returns the records and wall time, as ``monitoring.loadtest.run`` does,
+    and the largest delay in seconds between when a request was due and
+    when it was sent.
+    """
+    records = []
+    lock = threading.Lock()
+    lag = [0.0]
+
+    def record(name, status, seconds):
+        with lock:
+            records.append((name, status, seconds))
+
+    for session in sessions.values():
+        session.record = record
+
+    def send(trace, due):
+        with lock:
+            lag[0] = max(lag[0], time.monotonic() - due)
+        session = sessions.get(trace.get('r'), sessions[None])
+        body = trace.get('b')
+        session.request(
+            endpoint(trace), replay_path(trace),
+            data=None if trace.get('j') else body,
+            json_body=body if trace.get('j') else None,
+            ajax=bool(trace.get('x')),
+        )
+
+    started = time.monotonic()
+    first = traces[0]['t'] if traces else 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for trace in traces:
+            due = started + (trace['t'] - first) / speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, trace, due)
+    return records, time.monotonic() - started, lag[0]
@@ -0,0 +1,10 @@
+# Django core imports
+from django.urls import path
+
+# Local app imports
+from .views import database_stats_view
+
+# URL patterns
+urlpatterns = [
+    path('db/', database_stats_view, name='monitoring-db'),
+]
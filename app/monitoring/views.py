@@ -0,0 +1,91 @@
+"""
+Module: monitoring.views
+
+Operational endpoints: Prometheus metrics, and database connection and
+pool usage of the worker process serving the request.
+"""
+
+import hmac
+import os
+
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.db import connections
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+
+from .metrics import REGISTRY
+
+
+def pool_stats(connection):
+    """
+    Returns usage statistics of a connection's psycopg pool, or None when
+    the connection is not pooled.
+    """
+    pool = getattr(connection, 'pool', None)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    size = stats.get('pool_size', 0)
+    available = stats.get('pool_available', 0)
+    return {
+        'min_size': stats.get('pool_min', pool.min_size),
+        'max_size': stats.get('pool_max', pool.max_size),
+        'size': size,
+        'available': available,
+        'checked_out': size - available,
+        'waiting': stats.get('requests_waiting', 0),
+        'requests': stats.get('requests_num', 0),
+        'queued': stats.get('requests_queued', 0),
+        'wait_ms': stats.get('requests_wait_ms', 0),
+        # psycopg counts requests that timed out waiting for a connection
+        # as errors.
+        'timeouts': stats.get('requests_errors', 0),
+        'connection_errors': stats.get('connections_errors', 0),
+        'connections_lost': stats.get('connections_lost', 0),
+    }
+
+
+def database_stats():
+    """
+    Returns the connection settings and pool usage of every database alias.
+    """
+    databases = {}
+    for alias in connections:
+        connection = connections[alias]
+        databases[alias] = {
+            'vendor': connection.vendor,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'conn_health_checks':
+                connection.settings_dict['CONN_HEALTH_CHECKS'],
+            'connected': connection.connection is not None,
+            'pool': pool_stats(connection),
+        }
+    return databases
+
+
+@login_required
+@user_passes_test(lambda user: user.is_superuser)
+def database_stats_view(request):
+    """
+    Reports database connection and pool usage as JSON. Pools are per
+    process, so the response is for the worker (``pid``) that served it.
+    """
+    return JsonResponse({'pid': os.getpid(), 'databases': database_stats()})
+
+
+def metrics_view(request):
+    """
+    Serves all metrics in the Prometheus text format. Scrapers authenticate
+    with ``Authorization: Bearer <METRICS_TOKEN>``; without a token
+    configured, only logged-in superusers can read them.
+    """
+    if settings.METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '')
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        if not hmac.compare_digest(supplied.encode(), expected.encode()):
+            return HttpResponseForbidden()
+    elif not request.user.is_superuser:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        REGISTRY.render(), content_type='text/plain; version=0.0.4'
+    )
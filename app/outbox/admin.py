@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from .models import OutboxEvent
+
+
+class OutboxEventAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for outbox events.
+    """
+    list_display = ('id', 'txid', 'topic', 'key', 'action', 'created_at')
+    list_filter = ('topic', 'action')
+    search_fields = ('key',)
+    readonly_fields = ('payload',)
+    ordering = ('-id',)
+
+
+admin.site.register(OutboxEvent, OutboxEventAdmin)
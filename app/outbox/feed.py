@@ -0,0 +1,167 @@
+"""
+Module: outbox.feed
+
+Writing the outbox and reading it back as a change feed.
+
+Consumers keep a cursor, ``<txid>-<id>``, and ask for the events after
+it; each page costs the number of changes since, not the table sizes.
+
+The feed must never hand out an event after one that commits later
+with a smaller position, or a consumer that already moved past it would
+skip it, and events for one record must come in the order their states
+were committed. On SQLite writers are serialized, so ids follow commit
+order. On PostgreSQL ids are taken before commit and concurrent
+transactions commit in any order, so a deferred trigger (see migration
+0002_commit_order) stamps each transaction's events with ``txid`` from a
+sequence as it commits, under an advisory lock held until the commit is
+visible. Events are ordered by ``txid`` first; a reader sees every
+position below the newest it sees.
+"""
+
+import json
+
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .models import DELETED, OutboxEvent, OutboxHorizon
+
+# Events deleted per statement by compaction and retention.
+DELETE_BATCH = 5000
+
+
+def serialize(instance):
+    """
+    Returns the instance's field values as JSON-safe data.
+    """
+    [data] = serializers.serialize('python', [instance])
+    return json.loads(json.dumps(
+        {'id': instance.pk, **data['fields']}, cls=DjangoJSONEncoder
+    ))
+
+
+def record(topic, instance, action):
+    """
+    Adds an event for a change to ``instance`` to the outbox, inside the
+    current transaction.
+    """
+    OutboxEvent.objects.create(
+        topic=topic, key=str(instance.pk), action=action,
+        payload=None if action == DELETED else serialize(instance),
+    )
+
+
+def record_many(topic, instances, action):
+    """
+    Adds events for changes made in bulk, which send no signals, to the
+    outbox in one statement, inside the current transaction.
+    """
+    events = [
+        OutboxEvent(
+            topic=topic, key=str(instance.pk), action=action,
+            payload=None if action == DELETED else serialize(instance),
+        )
+        for instance in instances
+    ]
+    OutboxEvent.objects.bulk_create(events)
+
+
+def parse_cursor(cursor):
+    """
+    Returns the (txid, id) position of a cursor; the empty cursor is the
+    start of the feed. Raises ValueError for malformed cursors.
+    """
+    if not cursor:
+        return (0, 0)
+    txid, _, event_id = cursor.partition('-')
+    return (int(txid), int(event_id))
+
+
+def format_cursor(position):
+    return f'{position[0]}-{position[1]}'
+
+
+def _after(position):
+    txid, event_id = position
+    return Q(txid__gt=txid) | Q(txid=txid, id__gt=event_id)
+
+
+def horizon():
+    """
+    Returns the position up to which events may have been deleted.
+    """
+    row = OutboxHorizon.objects.first()
+    return (row.txid, row.event_id) if row else (0, 0)
+
+
+def head():
+    """
+    Returns the position of the newest event the feed hands out now. A
+    copy of the tables read afterwards reflects at least every event up
+    to it.
+    """
+    latest = OutboxEvent.objects.order_by('-txid', '-id') \
+        .values_list('txid', 'id').first()
+    return max(latest or (0, 0), horizon())
+
+
+def read(position, limit, topics=None):
+    """
+    Returns up to ``limit`` committed events after ``position`` in feed
+    order, and whether more are waiting.
+    """
+    events = OutboxEvent.objects.filter(_after(position))
+    if topics:
+        events = events.filter(topic__in=topics)
+    page = list(events.order_by('txid', 'id')[:limit + 1])
+    return page[:limit], len(page) > limit
+
+
+def compact(before):
+    """
+    Deletes events written before ``before`` that a later event for the
+    same record supersedes, keeping the latest state of every record.
+    Returns the number deleted.
+    """
+    # Later in feed order, not merely by id.
+    newer = OutboxEvent.objects.filter(
+        Q(txid__gt=OuterRef('txid'))
+        | Q(txid=OuterRef('txid'), id__gt=OuterRef('id')),
+        topic=OuterRef('topic'), key=OuterRef('key'),
+    )
+    superseded = OutboxEvent.objects.filter(
+        Exists(newer), created_at__lt=before
+    )
+    deleted = 0
+    while True:
+        ids = list(superseded.values_list('pk', flat=True)[:DELETE_BATCH])
+        if not ids:
+            return deleted
+        deleted += OutboxEvent.objects.filter(pk__in=ids).delete()[0]
+
+
+def prune(before):
+    """
+    Deletes every event written before ``before`` and moves the horizon
+    past them. Returns the number deleted.
+    """
+    expired = OutboxEvent.objects.filter(created_at__lt=before)
+    deleted = 0
+    while True:
+        batch = list(
+            expired.order_by('txid', 'id').values_list('txid', 'pk')
+            [:DELETE_BATCH]
+        )
+        if not batch:
+            return deleted
+        with transaction.atomic():
+            row, _ = OutboxHorizon.objects.select_for_update() \
+                .get_or_create(pk=1)
+            last = max(batch)
+            if last > (row.txid, row.event_id):
+                row.txid, row.event_id = last
+                row.save()
+            deleted += OutboxEvent.objects.filter(
+                pk__in=[pk for _, pk in batch]
+            ).delete()[0]
@@ -0,0 +1,74 @@
+# Generated by Django 5.1.5 on 2026-10-19 21:35
+
+from django.db import migrations
+
+# PostgreSQL only: SQLite serializes writers, so ids already follow commit
+# order there. Events are inserted with txid 0; at commit, the first of
+# them to fire the deferred trigger takes the advisory lock, which is held
+# until the commit is visible, and draws the transaction's position, with
+# which its events are stamped. Positions therefore follow commit order.
+# The sequence starts above the transaction ids stamped so far, so
+# existing cursors stay valid.
+COMMIT_ORDER = [
+    'CREATE SEQUENCE outbox_commit_position',
+    """
+    SELECT setval('outbox_commit_position', GREATEST(
+        (SELECT COALESCE(MAX(txid), 0) FROM outbox_outboxevent),
+        pg_current_xact_id()::text::bigint
+    ))
+    """,
+    """
+    CREATE FUNCTION outbox_stamp_commit_position() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF coalesce(current_setting('outbox.commit_position', true), '')
+                = '' THEN
+            PERFORM pg_advisory_xact_lock(hashtext('outbox_commit_position'));
+            PERFORM set_config(
+                'outbox.commit_position',
+                nextval('outbox_commit_position')::text, true
+            );
+        END IF;
+        -- Other transactions' unstamped events are not visible, and after
+        -- the first call this finds nothing to stamp.
+        UPDATE outbox_outboxevent
+        SET txid = current_setting('outbox.commit_position')::bigint
+        WHERE txid = 0;
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE CONSTRAINT TRIGGER outbox_stamp_commit_position
+    AFTER INSERT ON outbox_outboxevent
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION outbox_stamp_commit_position()
+    """,
+]
+
+REVERSE_COMMIT_ORDER = [
+    'DROP TRIGGER outbox_stamp_commit_position ON outbox_outboxevent',
+    'DROP FUNCTION outbox_stamp_commit_position()',
+    'DROP SEQUENCE outbox_commit_position',
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outbox', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run(COMMIT_ORDER), _run(REVERSE_COMMIT_ORDER)
+        ),
+    ]
@@ -0,0 +1,54 @@
+from django.db import models
+from django.utils import timezone
+
+CREATED = 'created'
+UPDATED = 'updated'
+DELETED = 'deleted'
+
+ACTION_CHOICES = [
+    (CREATED, 'Created'),
+    (UPDATED, 'Updated'),
+    (DELETED, 'Deleted'),
+]
+
+
+class OutboxEvent(models.Model):
+    """
+    A change to a tracked model, written in the same transaction as the
+    change itself and served in commit order by the change feed.
+
+    ``txid`` numbers the writing transactions in commit order on
+    PostgreSQL, stamped as they commit (see outbox.feed), and is 0
+    elsewhere; an event's position in the feed is (``txid``, ``id``).
+    """
+    txid = models.BigIntegerField(default=0)
+    topic = models.CharField(max_length=20)
+    key = models.CharField(max_length=64)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    payload = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['txid', 'id'], name='outbox_position_idx'
+            ),
+            models.Index(
+                fields=['topic', 'key', 'id'], name='outbox_entity_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.topic} {self.key} {self.action}'
+
+
+class OutboxHorizon(models.Model):
+    """
+    The position up to which events may have been deleted for good. A
+    consumer whose cursor is older has missed changes and must resync.
+    """
+    txid = models.BigIntegerField(default=0)
+    event_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.txid}-{self.event_id}'
@@ -0,0 +1,55 @@
+from django.db.models.signals import post_delete, post_save
+
+from accounts.models import Customer
+from store.models import Category, Item
+from transactions.models import Purchase, Sale, SaleDetail
+from transactions.signals import sales_synced
+from .feed import record, record_many
+from .models import CREATED, DELETED, UPDATED
+
+# Models whose changes go to the outbox, and their feed topics.
+TOPICS = {
+    Sale: 'sale',
+    SaleDetail: 'sale_detail',
+    Purchase: 'purchase',
+    Item: 'item',
+    Category: 'category',
+    Customer: 'customer',
+}
+
+
+def record_save(sender, instance, created, raw=False, **kwargs):
+    """
+    Signal to record a created or updated record in the outbox.
+    """
+    if not raw:
+        record(TOPICS[sender], instance, CREATED if created else UPDATED)
+
+
+def record_delete(sender, instance, **kwargs):
+    """
+    Signal to record a deleted record in the outbox.
+    """
+    record(TOPICS[sender], instance, DELETED)
+
+
+def record_synced_sales(sender, sales, details, items, **kwargs):
+    """
+    Signal to record the sales synced from offline tills, their lines and
+    their items' new stock in the outbox.
+    """
+    record_many(TOPICS[Sale], sales, CREATED)
+    record_many(TOPICS[SaleDetail], details, CREATED)
+    record_many(TOPICS[Item], items, UPDATED)
+
+
+for model in TOPICS:
+    post_save.connect(
+        record_save, sender=model, dispatch_uid=f'outbox-save-{model.__name__}'
+    )
+    post_delete.connect(
+        record_delete, sender=model,
+        dispatch_uid=f'outbox-delete-{model.__name__}',
+    )
+
+sales_synced.connect(record_synced_sales, dispatch_uid='outbox-sales-synced')
@@ -0,0 +1,28 @@
+"""
+Module: outbox.tasks
+
+Periodic jobs of the outbox app, run by ``manage.py runworker``.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from tasks.scheduler import periodic
+from .feed import compact, prune
+
+
+@periodic('0 3 * * *', lease=3600)
+def compact_outbox():
+    """
+    Drops superseded events older than ``EVENTS_COMPACT_AFTER`` seconds
+    and every event older than ``EVENTS_RETENTION`` seconds.
+    """
+    now = timezone.now()
+    return {
+        'compacted': compact(
+            now - timedelta(seconds=settings.EVENTS_COMPACT_AFTER)
+        ),
+        'pruned': prune(now - timedelta(seconds=settings.EVENTS_RETENTION)),
+    }
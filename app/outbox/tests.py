@@ -0,0 +1,142 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Customer
+from store.models import Category, Item
+from transactions.services import create_sale
+from .feed import compact, prune
+from .models import OutboxEvent
+from .tasks import compact_outbox
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.item = Item.objects.create(
+            name='Rice', description='', quantity=30, price=2,
+            category=Category.objects.create(name='Food'),
+        )
+        self.customer = Customer.objects.create(first_name='Ada',
+                                                last_name='L')
+
+    def events(self):
+        return list(OutboxEvent.objects.order_by('id')
+                    .values_list('topic', 'action'))
+
+    def test_writes_are_recorded(self):
+        self.item.quantity = 25
+        self.item.save()
+        self.customer.delete()
+        self.assertEqual(self.events(), [
+            ('category', 'created'), ('item', 'created'), ('customer', 'created'),
+            ('item', 'updated'), ('customer', 'deleted'),
+        ])
+        event = OutboxEvent.objects.filter(topic='item').last()
+        self.assertEqual(event.key, str(self.item.pk))
+        self.assertEqual(event.payload['quantity'], 25)
+        self.assertEqual(event.payload['name'], 'Rice')
+
+    def test_events_roll_back_with_the_write(self):
+        before = OutboxEvent.objects.count()
+        with self.assertRaises(ValueError):
+            create_sale({'customer': self.customer}, [
+                {'id': self.item.pk, 'price': 2, 'quantity': 99,
+                 'total_item': 198},
+            ])
+        self.assertEqual(OutboxEvent.objects.count(), before)
+
+        create_sale({'customer': self.customer, 'grand_total': 4}, [
+            {'id': self.item.pk, 'price': 2, 'quantity': 2, 'total_item': 4},
+        ])
+        self.assertEqual(self.events()[-3:], [
+            ('sale', 'created'), ('sale_detail', 'created'),
+            ('item', 'updated'),
+        ])
+
+    def test_compaction_keeps_the_latest_state(self):
+        for quantity in (1, 2, 3):
+            self.item.quantity = quantity
+            self.item.save()
+        self.assertEqual(compact(timezone.now() + timedelta(seconds=1)), 3)
+        [event] = OutboxEvent.objects.filter(topic='item')
+        self.assertEqual(event.payload['quantity'], 3)
+
+    def test_compaction_follows_feed_order(self):
+        # A transaction that wrote first but committed last has the smaller
+        # id and the larger position.
+        committed_last = OutboxEvent.objects.create(
+            txid=200, topic='item', key='1', action='updated',
+            payload={'quantity': 1},
+        )
+        OutboxEvent.objects.create(
+            txid=100, topic='item', key='1', action='updated',
+            payload={'quantity': 2},
+        )
+        compact(timezone.now() + timedelta(seconds=1))
+        [event] = OutboxEvent.objects.filter(topic='item', key='1')
+        self.assertEqual(event.pk, committed_last.pk)
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', password='pass')
+        category = Category.objects.create(name='Food')
+        for number in range(5):
+            Item.objects.create(name=f'Item {number}', description='',
+                                category=category)
+        Customer.objects.create(first_name='Ada', last_name='L')
+
+    def get(self, **params):
+        return self.client.get(reverse('outbox-feed'), params)
+
+    def test_pages_through_changes(self):
+        self.client.force_login(self.user)
+        first = self.get(limit=5).json()
+        self.assertEqual(len(first['events']), 5)
+        self.assertTrue(first['has_more'])
+        self.assertEqual(first['next'], first['events'][-1]['cursor'])
+
+        rest = self.get(after=first['next']).json()
+        self.assertEqual([e['topic'] for e in rest['events']],
+                         ['item', 'customer'])
+        self.assertFalse(rest['has_more'])
+
+        empty = self.get(after=rest['next']).json()
+        self.assertEqual((empty['events'], empty['next']), ([], rest['next']))
+
+        customers = self.get(topics='customer').json()
+        self.assertEqual([e['payload']['first_name']
+                          for e in customers['events']], ['Ada'])
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.get().status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.get(after='soon').status_code, 400)
+
+    @override_settings(EVENTS_FEED_TOKEN='secret')
+    def test_token(self):
+        response = self.client.get(reverse('outbox-feed'),
+                                   HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(len(response.json()['events']), 7)
+        response = self.client.get(reverse('outbox-feed'),
+                                   HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(EVENTS_COMPACT_AFTER=0, EVENTS_RETENTION=3600)
+    def test_expired_cursors_are_gone(self):
+        self.client.force_login(self.user)
+        cursor = self.get(limit=1).json()['next']
+        OutboxEvent.objects.filter(
+            pk__in=list(OutboxEvent.objects.order_by('id')
+                        .values_list('pk', flat=True)[:3])
+        ).update(created_at=timezone.now() - timedelta(hours=2))
+
+        self.assertEqual(compact_outbox(), {'compacted': 0, 'pruned': 3})
+        response = self.get(after=cursor)
+        self.assertEqual(response.status_code, 410)
+        restart = response.json()['next']
+        self.assertEqual(len(self.get(after=restart).json()['events']), 4)
+        self.assertEqual(prune(timezone.now() - timedelta(hours=1)), 0)
@@ -0,0 +1,10 @@
+# Django core imports
+from django.urls import path
+
+# Local app imports
+from .views import feed_view
+
+# URL patterns
+urlpatterns = [
+    path('feed/', feed_view, name='outbox-feed'),
+]
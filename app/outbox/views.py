@@ -0,0 +1,72 @@
+"""
+Module: outbox.views
+
+The change feed endpoint for downstream consumers (ERP, BI).
+"""
+
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponseForbidden, JsonResponse
+
+from .feed import format_cursor, horizon, parse_cursor, read
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def feed_view(request):
+    """
+    Returns the changes after the ``after`` cursor, oldest first::
+
+        GET /events/feed/?after=0-1234&limit=500&topics=sale,sale_detail
+
+    Consumers store ``next`` and pass it as ``after`` on their next call,
+    and call again at once while ``has_more`` is true. A cursor older than
+    the retention window gets 410 Gone: changes were deleted unseen, so
+    the consumer must resync from the tables.
+
+    Consumers authenticate with ``Authorization: Bearer
+    <EVENTS_FEED_TOKEN>``; without a token configured, only logged-in
+    superusers can read the feed.
+    """
+    if settings.EVENTS_FEED_TOKEN:
+        supplied = request.headers.get('Authorization', '')
+        expected = f'Bearer {settings.EVENTS_FEED_TOKEN}'
+        if not hmac.compare_digest(supplied.encode(), expected.encode()):
+            return HttpResponseForbidden()
+    elif not request.user.is_superuser:
+        return HttpResponseForbidden()
+
+    try:
+        position = parse_cursor(request.GET.get('after', ''))
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor or limit.'}, status=400)
+    limit = max(1, min(limit, MAX_LIMIT))
+    topics = [t for t in request.GET.get('topics', '').split(',') if t]
+
+    if position < horizon():
+        return JsonResponse({
+            'error': 'Cursor expired; resync and start from "next".',
+            'next': format_cursor(horizon()),
+        }, status=410)
+
+    events, has_more = read(position, limit, topics)
+    if events:
+        position = (events[-1].txid, events[-1].id)
+    return JsonResponse({
+        'events': [
+            {
+                'cursor': format_cursor((event.txid, event.id)),
+                'topic': event.topic,
+                'key': event.key,
+                'action': event.action,
+                'payload': event.payload,
+                'created_at': event.created_at,
+            }
+            for event in events
+        ],
+        'next': format_cursor(position),
+        'has_more': has_more,
+    })
@@ -0,0 +1,68 @@
+'use strict'
+
+// Keeps a copy of the item catalog (store/catalog.py) in the browser, so
+// that searches and prices need no request. sync() fetches the changes
+// since the version held; the copy survives reloads in localStorage.
+function localCatalog(url) {
+  const key = 'catalog:' + url
+  let state = {version: '', items: {}}
+  try {
+    state = JSON.parse(localStorage.getItem(key)) || state
+  } catch (e) {
+    // Unreadable copy: start over with a full snapshot.
+  }
+
+  function apply(data) {
+    if (data.mode === 'full') {
+      state.items = {}
+    }
+    data.items.forEach(function (row) {
+      const item = {}
+      data.fields.forEach(function (field, i) {
+        item[field] = row[i]
+      })
+      state.items[item.id] = item
+    })
+    data.deleted.forEach(function (id) {
+      delete state.items[id]
+    })
+    state.version = data.version
+    try {
+      localStorage.setItem(key, JSON.stringify(state))
+    } catch (e) {
+      // Over quota: the copy lasts as long as the page.
+    }
+  }
+
+  return {
+    get ready() {
+      return state.version !== ''
+    },
+
+    sync: function () {
+      const since = state.version
+        ? '?since=' + encodeURIComponent(state.version) : ''
+      return fetch(url + since, {credentials: 'same-origin'})
+        .then(function (response) {
+          if (!response.ok) {
+            throw new Error('Catalog sync failed: ' + response.status)
+          }
+          return response.json()
+        })
+        .then(apply)
+    },
+
+    // Returns up to limit items whose name contains term, by name.
+    search: function (term, limit) {
+      const needle = term.toLowerCase()
+      return Object.values(state.items)
+        .filter(function (item) {
+          return item.name.toLowerCase().includes(needle)
+        })
+        .sort(function (a, b) {
+          return a.name.localeCompare(b.name)
+        })
+        .slice(0, limit || 10)
+    },
+  }
+}
@@ -0,0 +1,25 @@
+'use strict'
+
+// Opens the server's event stream (live/views.py) and calls
+// handlers[type](data) for each event of that type. Returns the
+// EventSource, or null where the browser has none.
+function liveUpdates(url, handlers) {
+  if (!window.EventSource) {
+    return null
+  }
+  const source = new EventSource(url)
+  Object.keys(handlers).forEach(function (type) {
+    source.addEventListener(type, function (event) {
+      handlers[type](JSON.parse(event.data))
+    })
+  })
+  return source
+}
+
+// Briefly highlights an element that was just updated.
+function liveFlash(el, className) {
+  el.classList.add(className)
+  setTimeout(function () {
+    el.classList.remove(className)
+  }, 1500)
+}
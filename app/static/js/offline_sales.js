@@ -0,0 +1,85 @@
+'use strict'
+
+// Keeps the sales made while the server cannot be reached and sends them
+// to the sync endpoint (transactions/views.py) once it can. The queue
+// survives reloads in localStorage; onResults(results) is called with the
+// server's answer for each batch sent.
+function offlineSales(url, csrftoken, onResults) {
+  const key = 'offline-sales:' + url
+  // Sales sent per request, as many as the server takes.
+  const batchSize = 500
+  let flushing = false
+
+  function load() {
+    try {
+      return JSON.parse(localStorage.getItem(key)) || []
+    } catch (e) {
+      return []
+    }
+  }
+
+  function save(queue) {
+    localStorage.setItem(key, JSON.stringify(queue))
+  }
+
+  function newId() {
+    if (window.crypto && crypto.randomUUID) {
+      return crypto.randomUUID()
+    }
+    return Date.now().toString(36) + Math.random().toString(36).slice(2)
+  }
+
+  return {
+    get pending() {
+      return load().length
+    },
+
+    add: function (sale) {
+      const queue = load()
+      queue.push(Object.assign(
+        {client_id: newId(), timestamp: new Date().toISOString()}, sale
+      ))
+      save(queue)
+    },
+
+    flush: function () {
+      const batch = load().slice(0, batchSize)
+      if (flushing || !batch.length) {
+        return Promise.resolve([])
+      }
+      flushing = true
+      return fetch(url, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-CSRFToken': csrftoken,
+        },
+        body: JSON.stringify({sales: batch}),
+      })
+        .then(function (response) {
+          if (!response.ok) {
+            throw new Error('Sale sync failed: ' + response.status)
+          }
+          return response.json()
+        })
+        .then(function (data) {
+          // Every sale sent has its answer now, whatever it is; sales
+          // added meanwhile stay queued.
+          const answered = new Set(data.results.map(function (result) {
+            return result.client_id
+          }))
+          save(load().filter(function (sale) {
+            return !answered.has(sale.client_id)
+          }))
+          if (onResults) {
+            onResults(data.results)
+          }
+          return data.results
+        })
+        .finally(function () {
+          flushing = false
+        })
+    },
+  }
+}
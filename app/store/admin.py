@@ -6,11 +6,26 @@ Django admin configurations for managing categories, items, and deliveries.
 This module defines the following admin classes:
 - CategoryAdmin: Configuration for the Category model in the admin interface.
 - ItemAdmin: Configuration for the Item model in the admin interface.
+- ItemBarcodeInline: Barcodes edited on the item's admin page.
+- LocationStockInline: An item's stock by location, on its admin page.
+- LocationAdmin: Configuration for stores and warehouses.
+- LocationStockAdmin: Configuration for browsing stock by location.
+- StockTransferAdmin: Configuration for moving stock between locations.
+- StockLotAdmin: Configuration for browsing stock lots by expiry.
+- ShardedStockAdmin: Configuration for the items with sharded stock.
 - DeliveryAdmin: Configuration for the Delivery model in the admin interface.
 """
 
+from django.conf import settings
 from django.contrib import admin
-from .models import Category, Item, Delivery
+
+from .forms import StockTransferForm
+from .locations import transfer
+from .models import (
+    Category, Item, ItemBarcode, Location, LocationStock, ShardedStock,
+    StockLot, StockTransfer, Delivery,
+)
+from .stock import shard, unshard
 
 
 class CategoryAdmin(admin.ModelAdmin):
@@ -22,16 +37,136 @@ class CategoryAdmin(admin.ModelAdmin):
     ordering = ('name',)
 
 
+class ItemBarcodeInline(admin.TabularInline):
+    """
+    Admin configuration for an item's barcodes.
+    """
+    model = ItemBarcode
+    extra = 1
+
+
+class LocationStockInline(admin.TabularInline):
+    """
+    Admin configuration for an item's stock by location. Stock changes go
+    through sales, purchases, transfers and the item's quantity.
+    """
+    model = LocationStock
+    fields = ('location', 'quantity')
+    readonly_fields = ('location', 'quantity')
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 class ItemAdmin(admin.ModelAdmin):
     """
     Admin configuration for the Item model.
     """
     list_display = (
-        'name', 'category', 'quantity', 'price', 'expiring_date', 'vendor'
+        'name', 'sku', 'category', 'quantity', 'price', 'expiring_date',
+        'vendor'
     )
-    search_fields = ('name', 'category__name', 'vendor__name')
+    search_fields = ('name', 'sku', 'barcodes__code', 'category__name',
+                     'vendor__name')
     list_filter = ('category', 'vendor')
     ordering = ('name',)
+    inlines = [ItemBarcodeInline, LocationStockInline]
+    actions = ['shard_stock', 'unshard_stock']
+
+    @admin.action(description='Shard stock of selected items')
+    def shard_stock(self, request, queryset):
+        for item_id in queryset.values_list('pk', flat=True):
+            shard(item_id, settings.STOCK_SLOTS)
+        self.message_user(
+            request, f'Stock split across {settings.STOCK_SLOTS} slots.'
+        )
+
+    @admin.action(description='Unshard stock of selected items')
+    def unshard_stock(self, request, queryset):
+        for item_id in queryset.filter(
+            sharded_stock__isnull=False
+        ).values_list('pk', flat=True):
+            unshard(item_id)
+        self.message_user(request, 'Stock moved back to the item rows.')
+
+
+class ShardedStockAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for the ShardedStock model.
+    """
+    list_display = ('item', 'slots', 'folded_quantity', 'folded_at')
+    search_fields = ('item__name',)
+    readonly_fields = ('folded_quantity', 'folded_at')
+
+
+class LocationAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for the Location model.
+    """
+    list_display = ('name', 'kind', 'is_default')
+    search_fields = ('name',)
+    list_filter = ('kind',)
+
+
+class LocationStockAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for browsing the stock of each location.
+    """
+    list_display = ('item', 'location', 'quantity')
+    list_select_related = ('item', 'location')
+    search_fields = ('item__name', 'item__sku')
+    list_filter = ('location',)
+    ordering = ('location', 'item__name')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class StockTransferAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for the StockTransfer model. Transfers are
+    recorded, never edited.
+    """
+    list_display = ('date', 'item', 'source', 'destination', 'quantity')
+    list_select_related = ('item', 'source', 'destination')
+    search_fields = ('item__name', 'note')
+    list_filter = ('source', 'destination')
+    form = StockTransferForm
+    date_hierarchy = 'date'
+
+    def has_change_permission(self, request, obj=None):
+        return obj is None
+
+    def save_model(self, request, obj, form, change):
+        """
+        Move the stock, recording the transfer.
+        """
+        obj.pk = transfer(obj.item_id, obj.source_id, obj.destination_id,
+                          obj.quantity, obj.note).pk
+
+
+class StockLotAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for the StockLot model. Lots are received with
+    purchases and taken from by sales and transfers.
+    """
+    list_display = ('item', 'location', 'code', 'expires_at', 'quantity',
+                    'received_quantity', 'received_at')
+    list_select_related = ('item', 'location')
+    search_fields = ('item__name', 'code')
+    list_filter = ('location', 'expires_at')
+    ordering = ('expires_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 class DeliveryAdmin(admin.ModelAdmin):
@@ -49,4 +184,9 @@ class DeliveryAdmin(admin.ModelAdmin):
 
 admin.site.register(Category, CategoryAdmin)
 admin.site.register(Item, ItemAdmin)
+admin.site.register(Location, LocationAdmin)
+admin.site.register(LocationStock, LocationStockAdmin)
+admin.site.register(StockTransfer, StockTransferAdmin)
+admin.site.register(StockLot, StockLotAdmin)
+admin.site.register(ShardedStock, ShardedStockAdmin)
 admin.site.register(Delivery, DeliveryAdmin)
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self):
+        import store.signals
+        from InventoryMS.sqlite import apply_pragmas
+        connection_created.connect(
+            apply_pragmas, dispatch_uid='sqlite-pragmas'
+        )
@@ -0,0 +1,49 @@
+"""
+Module: store.barcodes
+
+Normalizing and checking the barcodes printed on items.
+
+Numeric codes of a GTIN length (GTIN-8, UPC-A, EAN-13, GTIN-14) are
+stored zero-padded to 14 digits, the form GS1 defines for comparing them,
+so a UPC-A label and the same product's EAN-13 resolve to one item.
+Other codes, such as in-house labels, are kept as scanned.
+"""
+
+from django.core.exceptions import ValidationError
+
+GTIN_LENGTHS = (8, 12, 13, 14)
+
+
+def is_gtin(code):
+    return code.isdigit() and len(code) in GTIN_LENGTHS
+
+
+def normalize_code(code):
+    """
+    Returns the form a scanned code is stored and looked up in.
+    """
+    code = code.strip()
+    return code.zfill(14) if is_gtin(code) else code
+
+
+def gtin_check_digit(digits):
+    """
+    Returns the GS1 check digit for a GTIN without its last digit.
+    """
+    total = sum(
+        int(digit) * (3 if position % 2 == 0 else 1)
+        for position, digit in enumerate(reversed(digits))
+    )
+    return (10 - total % 10) % 10
+
+
+def validate_barcode(code):
+    """
+    Rejects GTINs whose check digit is wrong, which usually means a typo.
+    """
+    code = code.strip()
+    if is_gtin(code) and gtin_check_digit(code[:-1]) != int(code[-1]):
+        raise ValidationError(
+            '%(code)s is not a valid GTIN: wrong check digit.',
+            params={'code': code},
+        )
@@ -0,0 +1,73 @@
+"""
+Module: store.catalog
+
+The item catalog as kept by point-of-sale clients.
+
+A till downloads a full snapshot once, then asks for the changes since
+the version it holds and searches and prices items locally. Versions are
+change feed cursors (see outbox.feed): a delta costs the number of items
+changed since, not the size of the catalog.
+"""
+
+from django.db.models import Q
+
+from InventoryMS.cache import cached
+from outbox.feed import format_cursor, head, horizon, read
+from .models import Category, Item
+
+# Fields of each item row, in order.
+FIELDS = ['id', 'name', 'category', 'price', 'quantity']
+
+# Changes beyond which a full snapshot is cheaper than a delta.
+DELTA_LIMIT = 2000
+
+
+def _rows(items):
+    return [
+        list(row) for row in items.order_by('pk').values_list(
+            'pk', 'name', 'category__name', 'price', 'quantity'
+        )
+    ]
+
+
+def snapshot():
+    """
+    Returns every item, with the version the snapshot is current to.
+    """
+    # Read the version first: changes committed in between are sent
+    # again with the next delta, never missed. Keying the cache by it
+    # keeps a snapshot read before the version from being served.
+    version = format_cursor(head())
+    items = cached('catalog-snapshot', [Item, Category],
+                   lambda: _rows(Item.objects.all()), version)
+    return {'mode': 'full', 'version': version, 'fields': FIELDS,
+            'items': items, 'deleted': []}
+
+
+def changes(position):
+    """
+    Returns the items changed or deleted after ``position``, or a full
+    snapshot when the change feed no longer reaches back that far or a
+    snapshot is smaller.
+    """
+    if position < horizon():
+        return snapshot()
+    events, has_more = read(position, DELTA_LIMIT, ['item', 'category'])
+    if has_more:
+        return snapshot()
+    if events:
+        position = (events[-1].txid, events[-1].id)
+
+    item_ids = {int(e.key) for e in events if e.topic == 'item'}
+    category_ids = {int(e.key) for e in events if e.topic == 'category'}
+    # A renamed category changes the rows of all of its items.
+    rows = _rows(Item.objects.filter(
+        Q(pk__in=item_ids) | Q(category__in=category_ids)
+    )) if events else []
+    return {
+        'mode': 'delta',
+        'version': format_cursor(position),
+        'fields': FIELDS,
+        'items': rows,
+        'deleted': sorted(item_ids - {row[0] for row in rows}),
+    }
@@ -0,0 +1,472 @@
+"""
+Module: store.dataset
+
+Generates a large, realistic and reproducible dataset for benchmarks:
+categories, vendors, items with skewed and partly duplicated names,
+customers, multi-line sales spread over shop hours, purchases, deliveries,
+invoices and bills.
+
+The same seed and end date always produce the same rows. Sales and their
+lines, which make up almost all of the volume, are written as raw rows in
+batches (COPY on PostgreSQL when requested) instead of through model
+instances; everything else goes through ``bulk_create``.
+"""
+
+import math
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connection
+from django.utils import timezone
+from django.utils.text import slugify
+
+from InventoryMS.cache import bump_version
+from accounts.models import Customer, Vendor
+from bills.models import Bill
+from invoice.models import Invoice
+from transactions.models import DailyItemSales, Purchase, Sale, SaleDetail
+from .locations import default_location_id
+from .models import Category, Delivery, Item, LocationStock
+
+BRANDS = [
+    'Nestle', 'Unilever', 'Shan', 'National', 'Tapal', 'Lipton', 'Olpers',
+    'Dalda', 'Knorr', 'Colgate', 'Lux', 'Surf', 'Ariel', 'Dettol', 'Pepsi',
+    'Coca-Cola', 'Nurpur', 'Mitchells', 'Peek Freans', 'LU', 'Sufi',
+    'Habib', 'Kolson', 'Rafhan', 'Young\'s', 'Safeguard', 'Head & Shoulders',
+    'Sunsilk', 'Pampers', 'Dawn',
+]
+PRODUCTS = {
+    'Dairy': ['Milk', 'Yogurt', 'Butter', 'Cheese', 'Cream', 'Lassi'],
+    'Beverages': ['Tea', 'Green Tea', 'Coffee', 'Juice', 'Cola', 'Water'],
+    'Bakery': ['Bread', 'Rusk', 'Biscuits', 'Cake', 'Buns', 'Cookies'],
+    'Staples': ['Rice', 'Flour', 'Sugar', 'Salt', 'Lentils', 'Chickpeas'],
+    'Cooking': ['Cooking Oil', 'Ghee', 'Spice Mix', 'Ketchup', 'Vinegar'],
+    'Household': ['Detergent', 'Dishwash', 'Bleach', 'Floor Cleaner'],
+    'Personal Care': ['Soap', 'Shampoo', 'Toothpaste', 'Lotion', 'Diapers'],
+    'Snacks': ['Chips', 'Nimko', 'Chocolate', 'Noodles', 'Popcorn'],
+}
+VARIANTS = [
+    '', '', '', 'Small', 'Large', 'Family Pack', '250g', '500g', '1kg',
+    '1L', '1.5L', 'Pack of 6', 'Classic', 'Lite', 'Extra',
+]
+FIRST_NAMES = [
+    'Ali', 'Ahmed', 'Ayesha', 'Fatima', 'Hassan', 'Zainab', 'Usman', 'Sana',
+    'Bilal', 'Hina', 'Omar', 'Maryam', 'Imran', 'Saira', 'Kamran', 'Nida',
+]
+LAST_NAMES = [
+    'Khan', 'Ahmed', 'Malik', 'Hussain', 'Raza', 'Sheikh', 'Butt', 'Qureshi',
+    'Siddiqui', 'Chaudhry', 'Mirza', 'Baig',
+]
+CITIES = [
+    'Karachi', 'Lahore', 'Islamabad', 'Rawalpindi', 'Faisalabad', 'Multan',
+    'Peshawar', 'Quetta', 'Hyderabad', 'Sialkot',
+]
+# Relative footfall per opening hour, 8:00 to 21:00.
+HOUR_WEIGHTS = [2, 4, 6, 7, 8, 9, 8, 7, 7, 8, 10, 11, 9, 5]
+
+
+@contextmanager
+def preset_slugs(*models):
+    """
+    Keeps the slugs assigned by the generator instead of regenerating them
+    on insert, which would query for uniqueness row by row and collide
+    within a batch.
+    """
+    fields = [
+        model._meta.get_field('slug') for model in models
+        if hasattr(model._meta.get_field('slug'), 'overwrite_on_add')
+    ]
+    for field in fields:
+        field.overwrite_on_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.overwrite_on_add = True
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """
+    Lets the generator set ``auto_now``/``auto_now_add`` date fields.
+    """
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def zipf_cumulative_weights(n, exponent=1.1):
+    """
+    Cumulative weights under which rank ``k`` is picked proportionally to
+    ``1 / k ** exponent``: a few items get most of the sales.
+    """
+    total = 0.0
+    weights = []
+    for rank in range(1, n + 1):
+        total += 1.0 / rank ** exponent
+        weights.append(total)
+    return weights
+
+
+def _money(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+class DatasetGenerator:
+    """
+    Writes a synthetic dataset to the default database.
+
+    ``days`` is the period sales and other records are spread over, ending
+    at the start of ``end_date`` (today by default). ``progress`` is called
+    with a label and counts as batches are written.
+    """
+
+    def __init__(self, seed=42, days=365, end_date=None, batch_size=5000,
+                 use_copy=False, progress=None):
+        self.rng = random.Random(seed)
+        self.days = days
+        end_date = end_date or timezone.localdate()
+        self.end = timezone.make_aware(datetime.combine(end_date, time()))
+        self.start = self.end - timedelta(days=days)
+        self.batch_size = batch_size
+        self.use_copy = use_copy
+        self.progress = progress or (lambda label, done, total: None)
+
+    def generate(self, categories=20, vendors=100, items=5000,
+                 customers=2000, sales=100000, lines=3, purchases=5000,
+                 deliveries=2000, invoices=1000, bills=500,
+                 rebuild_rollups=True):
+        """
+        Writes the requested number of rows of each kind and returns the
+        counts written.
+        """
+        with preset_slugs(Category, Vendor, Item, Purchase, Invoice), \
+                explicit_timestamps(
+                    Purchase._meta.get_field('order_date'),
+                    Invoice._meta.get_field('date'),
+                    Bill._meta.get_field('date'),
+                ):
+            category_ids = self.categories(categories)
+            vendor_ids = self.vendors(vendors)
+            catalog = self.items(items, category_ids, vendor_ids)
+            customer_ids = self.customers(customers)
+            sale_lines = self.sales(sales, lines, catalog, customer_ids)
+            self.purchases(purchases, catalog, vendor_ids)
+            self.deliveries(deliveries, catalog)
+            self.invoices(invoices, catalog)
+            self.bills(bills)
+
+        # Raw inserts bypass the versioned managers.
+        for model in (Sale, SaleDetail):
+            bump_version(model)
+        if rebuild_rollups:
+            self.progress('daily sales rollup', 0, 1)
+            DailyItemSales.rebuild()
+            self.progress('daily sales rollup', 1, 1)
+        return {
+            'categories': categories, 'vendors': vendors, 'items': items,
+            'customers': customers, 'sales': sales,
+            'sale lines': sale_lines, 'purchases': purchases,
+            'deliveries': deliveries, 'invoices': invoices, 'bills': bills,
+        }
+
+    def categories(self, n):
+        names = list(PRODUCTS)
+        offset = self._offset(Category)
+        return self._bulk_create('categories', (
+            Category(
+                name=names[i] if i < len(names)
+                else f'{names[i % len(names)]} {i // len(names) + 1}',
+                slug=f'category-{offset + i}',
+            )
+            for i in range(n)
+        ), n)
+
+    def vendors(self, n):
+        rng = self.rng
+        offset = self._offset(Vendor)
+        return self._bulk_create('vendors', (
+            Vendor(
+                name=f'{rng.choice(BRANDS)} Distributors '
+                     f'{rng.choice(CITIES)}',
+                slug=f'vendor-{offset + i}',
+                phone_number=rng.randint(3000000000, 3499999999),
+                address=rng.choice(CITIES),
+            )
+            for i in range(n)
+        ), n)
+
+    def items(self, n, category_ids, vendor_ids):
+        """
+        Writes ``n`` items and returns (id, price in cents) pairs ordered
+        from most to least popular.
+        """
+        rng = self.rng
+        categories = list(PRODUCTS.items())
+        brand_weights = zipf_cumulative_weights(len(BRANDS), 0.8)
+        offset = self._offset(Item)
+
+        def item(i):
+            index = rng.randrange(len(category_ids))
+            _, products = categories[index % len(categories)]
+            name = ' '.join(filter(None, [
+                rng.choices(BRANDS, cum_weights=brand_weights)[0],
+                rng.choice(products),
+                rng.choice(VARIANTS),
+            ]))
+            return Item(
+                name=name[:50],
+                slug=f'{slugify(name)[:30]}-{offset + i}',
+                description=f'{name}, sourced locally.',
+                category_id=category_ids[index],
+                vendor_id=rng.choice(vendor_ids),
+                # Roughly one item in ten is running low.
+                quantity=rng.randint(0, 20) if rng.random() < 0.1
+                else rng.randint(21, 500),
+                price=round(rng.lognormvariate(5, 1), 2),
+            )
+
+        created = self._bulk_create(
+            'items', (item(i) for i in range(n)), n, ids_only=False
+        )
+        # All of it at the default location, as the item signals would.
+        location_id = default_location_id()
+        self._bulk_create('item stock', (
+            LocationStock(item_id=obj.id, location_id=location_id,
+                          quantity=obj.quantity)
+            for obj in created
+        ), n)
+        catalog = [(obj.id, round(obj.price * 100)) for obj in created]
+        rng.shuffle(catalog)
+        return catalog
+
+    def customers(self, n):
+        rng = self.rng
+        return self._bulk_create('customers', (
+            Customer(
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                address=rng.choice(CITIES),
+                email=f'customer{i}@example.com',
+                phone=f'03{rng.randint(0, 499999999):09d}',
+                loyalty_points=rng.randint(0, 500),
+            )
+            for i in range(n)
+        ), n)
+
+    def sales(self, n, lines, catalog, customer_ids):
+        """
+        Writes ``n`` sales in chronological order with between 1 and
+        ``2 * lines - 1`` lines each; returns the number of lines.
+        """
+        rng = self.rng
+        item_weights = zipf_cumulative_weights(len(catalog), 0.9)
+        next_id = self._offset(Sale) + 1
+        sale_fields = [
+            'id', 'date_added', 'customer', 'sub_total', 'grand_total',
+            'tax_amount', 'tax_percentage', 'amount_paid', 'amount_change',
+        ]
+        line_fields = ['sale', 'item', 'price', 'quantity', 'total_detail']
+        adapt_datetime = connection.ops.adapt_datetimefield_value
+        written_lines = 0
+        span = (self.end - self.start).total_seconds()
+
+        for first in range(0, n, self.batch_size):
+            count = min(self.batch_size, n - first)
+            # Each batch covers its own slice of the period, so dates
+            # increase with ids as they do in a real shop.
+            window_start = span * first / n
+            window = span * count / n
+            moments = sorted(
+                window_start + rng.random() * window for _ in range(count)
+            )
+            sale_rows = []
+            line_rows = []
+            for offset, moment in enumerate(moments):
+                sale_id = next_id + first + offset
+                date_added = self._shop_hours(
+                    self.start + timedelta(seconds=moment)
+                )
+                sub_total = 0
+                for item_id, price in rng.choices(
+                    catalog, cum_weights=item_weights,
+                    k=rng.randint(1, 2 * lines - 1),
+                ):
+                    quantity = rng.choices((1, 2, 3, 4, 6), (60, 20, 10, 6, 4))[0]
+                    sub_total += price * quantity
+                    line_rows.append((
+                        sale_id, item_id, _money(price), quantity,
+                        _money(price * quantity),
+                    ))
+                tax = round(sub_total * 0.05)
+                grand_total = sub_total + tax
+                paid = math.ceil(grand_total / 50000) * 50000
+                sale_rows.append((
+                    sale_id, adapt_datetime(date_added),
+                    rng.choice(customer_ids), _money(sub_total),
+                    _money(grand_total), _money(tax), 5.0, _money(paid),
+                    _money(paid - grand_total),
+                ))
+            self._insert_rows(Sale, sale_fields, sale_rows)
+            self._insert_rows(SaleDetail, line_fields, line_rows)
+            written_lines += len(line_rows)
+            self.progress('sales', first + count, n)
+
+        self._reset_sequences(Sale)
+        return written_lines
+
+    def purchases(self, n, catalog, vendor_ids):
+        rng = self.rng
+        offset = self._offset(Purchase)
+
+        def purchase(i):
+            item_id, price = rng.choice(catalog)
+            quantity = rng.randint(10, 200)
+            order_date = self._random_date()
+            status = 'S' if rng.random() < 0.85 else 'P'
+            return Purchase(
+                slug=f'purchase-{offset + i}',
+                item_id=item_id,
+                vendor_id=rng.choice(vendor_ids),
+                order_date=order_date,
+                delivery_date=order_date + timedelta(days=rng.randint(1, 14))
+                if status == 'S' else None,
+                quantity=quantity,
+                delivery_status=status,
+                price=_money(round(price * 0.7)),
+                total_value=_money(round(price * 0.7) * quantity),
+            )
+
+        return self._bulk_create(
+            'purchases', (purchase(i) for i in range(n)), n
+        )
+
+    def deliveries(self, n, catalog):
+        rng = self.rng
+        return self._bulk_create('deliveries', (
+            Delivery(
+                item_id=rng.choice(catalog)[0],
+                customer_name=f'{rng.choice(FIRST_NAMES)} '
+                              f'{rng.choice(LAST_NAMES)}',
+                location=rng.choice(CITIES),
+                date=self._random_date(),
+                is_delivered=rng.random() < 0.9,
+            )
+            for _ in range(n)
+        ), n)
+
+    def invoices(self, n, catalog):
+        rng = self.rng
+        offset = self._offset(Invoice)
+
+        def invoice(i):
+            item_id, price = rng.choice(catalog)
+            quantity = rng.randint(1, 20)
+            shipping = rng.choice([0, 0, 150, 250, 500])
+            total = round(price * quantity / 100, 2)
+            return Invoice(
+                slug=f'invoice-{offset + i}',
+                date=self._random_date(),
+                customer_name=f'{rng.choice(FIRST_NAMES)} '
+                              f'{rng.choice(LAST_NAMES)}',
+                contact_number=f'03{rng.randint(0, 499999999):09d}',
+                item_id=item_id,
+                price_per_item=price / 100,
+                quantity=quantity,
+                shipping=shipping,
+                total=total,
+                grand_total=round(total + shipping, 2),
+            )
+
+        return self._bulk_create(
+            'invoices', (invoice(i) for i in range(n)), n
+        )
+
+    def bills(self, n):
+        rng = self.rng
+        offset = self._offset(Bill)
+        institutions = [
+            'K-Electric', 'SSGC', 'PTCL', 'Water Board', 'Landlord',
+            'Security Services', 'Internet Provider',
+        ]
+        return self._bulk_create('bills', (
+            Bill(
+                slug=f'bill-{offset + i}',
+                date=self._random_date(),
+                institution_name=rng.choice(institutions),
+                payment_details=rng.choice(['Bank transfer', 'Cash', 'Card']),
+                amount=round(rng.uniform(1000, 50000), 2),
+                status=rng.random() < 0.9,
+            )
+            for i in range(n)
+        ), n)
+
+    def _random_date(self):
+        return self._shop_hours(
+            self.start + timedelta(days=self.rng.randrange(self.days))
+        )
+
+    def _shop_hours(self, moment):
+        hour = 8 + self.rng.choices(range(len(HOUR_WEIGHTS)), HOUR_WEIGHTS)[0]
+        return moment.replace(
+            hour=hour, minute=self.rng.randrange(60),
+            second=self.rng.randrange(60),
+        )
+
+    def _offset(self, model):
+        # Continue after existing rows so slugs and ids stay unique when
+        # generating into a database that already has data.
+        last = model.objects.order_by('-pk').values_list('pk', flat=True)
+        return last.first() or 0
+
+    def _bulk_create(self, label, objs, total, ids_only=True):
+        model = None
+        created = []
+        batch = []
+        for obj in objs:
+            model = type(obj)
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                created.extend(model.objects.bulk_create(batch))
+                batch = []
+                self.progress(label, len(created), total)
+        if batch:
+            created.extend(model.objects.bulk_create(batch))
+        self.progress(label, len(created), total)
+        return [obj.pk for obj in created] if ids_only else created
+
+    def _insert_rows(self, model, field_names, rows):
+        fields = [model._meta.get_field(name) for name in field_names]
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(
+            connection.ops.quote_name(field.column) for field in fields
+        )
+        with connection.cursor() as cursor:
+            if self.use_copy:
+                with cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy:
+                    for row in rows:
+                        copy.write_row(row)
+            else:
+                placeholders = ', '.join(['%s'] * len(fields))
+                cursor.executemany(
+                    f'INSERT INTO {table} ({columns}) VALUES ({placeholders})',
+                    rows,
+                )
+        if settings.DEBUG:
+            # DEBUG keeps every executed batch alive in queries_log.
+            connection.queries_log.clear()
+
+    def _reset_sequences(self, *models):
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
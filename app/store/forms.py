@@ -1,5 +1,15 @@
 from django import forms
-from .models import Item, Category, Delivery
+from .models import Item, Category, Delivery, LocationStock, StockTransfer
+
+
+class ItemChoiceMixin:
+    """
+    Loads the categories of the items offered in the ``item`` select along
+    with the items, since ``Item.__str__`` shows them.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['item'].queryset = Item.objects.select_related('category')
 
 
 class ItemForm(forms.ModelForm):
@@ -10,6 +20,7 @@ class ItemForm(forms.ModelForm):
         model = Item
         fields = [
             'name',
+            'sku',
             'description',
             'category',
             'quantity',
@@ -19,6 +30,7 @@ class ItemForm(forms.ModelForm):
         ]
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control'}),
+            'sku': forms.TextInput(attrs={'class': 'form-control'}),
             'description': forms.Textarea(
                 attrs={
                     'class': 'form-control',
@@ -41,6 +53,12 @@ class ItemForm(forms.ModelForm):
             ),
             'vendor': forms.Select(attrs={'class': 'form-control'}),
         }
+        help_texts = {
+            'quantity': (
+                'Total over all locations; a change is made at the '
+                'default location.'
+            ),
+        }
 
 
 class CategoryForm(forms.ModelForm):
@@ -62,7 +80,7 @@ class CategoryForm(forms.ModelForm):
         }
 
 
-class DeliveryForm(forms.ModelForm):
+class DeliveryForm(ItemChoiceMixin, forms.ModelForm):
     class Meta:
         model = Delivery
         fields = [
@@ -100,3 +118,27 @@ class DeliveryForm(forms.ModelForm):
                 'label': 'Mark as delivered',
             }),
         }
+
+
+class StockTransferForm(ItemChoiceMixin, forms.ModelForm):
+    """
+    A form for moving an item's stock from one location to another.
+    """
+    class Meta:
+        model = StockTransfer
+        fields = ['item', 'source', 'destination', 'quantity', 'note']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        item = cleaned_data.get('item')
+        source = cleaned_data.get('source')
+        quantity = cleaned_data.get('quantity')
+        if item and source and quantity:
+            available = LocationStock.objects.filter(
+                item=item, location=source
+            ).values_list('quantity', flat=True).first() or 0
+            if quantity > available:
+                raise forms.ValidationError(
+                    f'Only {available} of {item.name} in stock at {source}.'
+                )
+        return cleaned_data
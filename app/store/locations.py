@@ -0,0 +1,198 @@
+"""
+Module: store.locations
+
+Stock kept per location: each store and warehouse has a LocationStock row
+per item, and ``Item.quantity`` is the total over all of them.
+
+The total is maintained as stock moves rather than summed on read. Every
+write here changes the location's row and the item's row in the same
+transaction, so catalog lists, low-stock checks and the live updates keep
+reading ``Item.quantity`` alone. Item rows are locked before location
+rows, in id order, so sales and transfers of the same items wait for each
+other rather than deadlock.
+
+Code that predates locations writes ``Item.quantity`` directly, such as
+the item edit form. The item signals count any such change as stock
+received at, or taken from, the default location, which keeps the total
+and the rows in step.
+"""
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .lots import allocate, fefo_lots, take_lots
+from .models import (
+    LOW_STOCK_THRESHOLD, Item, Location, LocationStock, StockLot,
+    StockTransfer,
+)
+
+
+def default_location_id():
+    """
+    Returns the id of the default location, creating it on first use.
+    """
+    location_id = Location.objects.filter(is_default=True).values_list(
+        'pk', flat=True
+    ).first()
+    if location_id is None:
+        location_id = Location.objects.get_or_create(
+            is_default=True, defaults={'name': 'Main store'}
+        )[0].pk
+    return location_id
+
+
+def resolve_location(location_id=None):
+    """
+    Returns (location id, whether it is the default location) for a
+    location id, or for the default location when None. Raises
+    Location.DoesNotExist for an unknown location.
+    """
+    default_id = default_location_id()
+    if location_id is None or int(location_id) == default_id:
+        return default_id, True
+    location_id = int(location_id)
+    if not Location.objects.filter(pk=location_id).exists():
+        raise Location.DoesNotExist('Location matching query does not exist.')
+    return location_id, False
+
+
+def add_to_location(item_id, location_id, quantity):
+    """
+    Adds ``quantity`` (negative to take) to an item's row at a location,
+    creating the row if needed. Leaves ``Item.quantity`` alone.
+    """
+    row, created = LocationStock.objects.get_or_create(
+        item_id=item_id, location_id=location_id,
+        defaults={'quantity': quantity},
+    )
+    if not created and quantity:
+        LocationStock.objects.filter(pk=row.pk).update(
+            quantity=F('quantity') + quantity
+        )
+
+
+def set_total(item, quantity):
+    """
+    Sets ``item.quantity`` to a total the location rows already account
+    for, so that saving the item is not counted as a direct edit.
+    """
+    item.quantity = quantity
+    item._stock_quantity = quantity
+
+
+def adjust_stock(item_id, quantity, location_id=None):
+    """
+    Adds ``quantity`` (negative to take) to an item's stock at a location,
+    the default one when None, and to its total. Stock taken comes out of
+    the item's lots there first expiry first (see store.lots). Returns the
+    saved item.
+    """
+    location_id, _ = resolve_location(location_id)
+    with transaction.atomic():
+        item = Item.objects.select_for_update().get(pk=item_id)
+        add_to_location(item_id, location_id, quantity)
+        if quantity < 0:
+            take_lots(item_id, location_id, -quantity)
+        set_total(item, item.quantity + quantity)
+        item.save(update_fields=['quantity'])
+    return item
+
+
+def transfer(item_id, source_id, destination_id, quantity, note=''):
+    """
+    Moves ``quantity`` of an item from one location to another, leaving
+    its total unchanged. The lots first expiring at the source move along,
+    becoming lots at the destination with the same batch and expiry.
+    Returns the StockTransfer recorded. Raises ValueError when the source
+    has not that much stock.
+    """
+    quantity = int(quantity)
+    if quantity < 1:
+        raise ValueError('Transfer quantity should be positive')
+    if int(source_id) == int(destination_id):
+        raise ValueError('Transfer source and destination are the same')
+
+    with transaction.atomic():
+        # Locked like a sale of the item would, item first.
+        item = Item.objects.select_for_update().get(pk=item_id)
+        add_to_location(item_id, destination_id, 0)
+        rows = {
+            row.location_id: row for row in
+            LocationStock.objects.select_for_update()
+            .filter(item_id=item_id,
+                    location_id__in=[source_id, destination_id])
+            .order_by('location_id')
+        }
+        source = rows.get(int(source_id))
+        if source is None or source.quantity < quantity:
+            raise ValueError(
+                f'Not enough stock for item: {item.name} at the source'
+            )
+        destination = rows[int(destination_id)]
+        source.quantity -= quantity
+        destination.quantity += quantity
+        LocationStock.objects.bulk_update([source, destination],
+                                          ['quantity'])
+
+        moved = allocate(fefo_lots(item_id, source_id), quantity)
+        StockLot.objects.bulk_update([lot for lot, _ in moved],
+                                     ['quantity'])
+        StockLot.objects.bulk_create(
+            StockLot(item_id=item_id, location_id=destination_id,
+                     code=lot.code, expires_at=lot.expires_at,
+                     received_quantity=taken, quantity=taken)
+            for lot, taken in moved
+        )
+        return StockTransfer.objects.create(
+            item=item, source_id=source_id, destination_id=destination_id,
+            quantity=quantity, note=note,
+        )
+
+
+def stock_at(location_id):
+    """
+    Returns the stock rows of a location with their items, by item name.
+    """
+    return (
+        LocationStock.objects.filter(location_id=location_id)
+        .select_related('item').order_by('item__name')
+    )
+
+
+def low_stock_at(location_id):
+    """
+    Returns the stock rows of a location at or below the low-stock
+    threshold, lowest first.
+    """
+    return (
+        LocationStock.objects
+        .filter(location_id=location_id, quantity__lte=LOW_STOCK_THRESHOLD)
+        .select_related('item').order_by('quantity')
+    )
+
+
+def rebuild_totals():
+    """
+    Recomputes ``Item.quantity`` from the location rows, for rows written
+    in bulk. Items without any row yet, such as items written in bulk,
+    get theirs at the default location. Returns the number of items
+    corrected. Fold sharded items first (see store.stock).
+    """
+    totals = dict(
+        LocationStock.objects.values('item').annotate(total=Sum('quantity'))
+        .order_by().values_list('item', 'total')
+    )
+    default_id = default_location_id()
+    corrected = 0
+    for item_id, quantity in Item.objects.values_list('pk', 'quantity'):
+        if item_id not in totals:
+            add_to_location(item_id, default_id, quantity)
+        elif totals[item_id] != quantity:
+            with transaction.atomic():
+                item = Item.objects.select_for_update().get(pk=item_id)
+                set_total(item, LocationStock.objects.filter(
+                    item_id=item_id
+                ).aggregate(total=Sum('quantity'))['total'])
+                item.save(update_fields=['quantity'])
+            corrected += 1
+    return corrected
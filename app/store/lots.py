@@ -0,0 +1,102 @@
+"""
+Module: store.lots
+
+Stock lots and first-expiry-first-out (FEFO) allocation.
+
+Each purchase received becomes a StockLot at its location, with its own
+quantity and expiry. Whatever takes stock out of a location takes it from
+the item's lots there, earliest expiry first; lots without an expiry go
+after those with one. Stock outside any lot, such as stock counted before
+lots existed or added by editing an item's quantity, is taken last. So a
+location's stock is the sum of its lots plus that untracked remainder.
+
+Finding the lots to take from is one query per item and location, served
+by the partial ``stocklot_fefo_idx`` index over the lots with stock left.
+"""
+
+from django.db.models import F
+
+from .models import StockLot
+
+
+def fefo_lots(item_id, location_id):
+    """
+    Returns the lots of an item with stock left at a location, locked, in
+    the order stock is taken from them.
+    """
+    return (
+        StockLot.objects.select_for_update()
+        .filter(item_id=item_id, location_id=location_id, quantity__gt=0)
+        .order_by(F('expires_at').asc(nulls_last=True), 'pk')
+    )
+
+
+def lots_for(pairs):
+    """
+    Returns {(item id, location id): [lot, ...]} for several items and
+    locations at once, locked and in FEFO order, for writes in bulk.
+    """
+    item_ids = {item_id for item_id, _ in pairs}
+    location_ids = {location_id for _, location_id in pairs}
+    lots = {}
+    for lot in (
+        StockLot.objects.select_for_update()
+        .filter(item_id__in=item_ids, location_id__in=location_ids,
+                quantity__gt=0)
+        .order_by('item_id', 'location_id',
+                  F('expires_at').asc(nulls_last=True), 'pk')
+    ):
+        lots.setdefault((lot.item_id, lot.location_id), []).append(lot)
+    return lots
+
+
+def allocate(lots, quantity):
+    """
+    Takes up to ``quantity`` out of ``lots``, in order, and returns the
+    (lot, quantity taken) pairs. Whatever the lots cannot cover comes from
+    untracked stock. Leaves saving the lots to the caller.
+    """
+    allocations = []
+    for lot in lots:
+        if quantity <= 0:
+            break
+        taken = min(lot.quantity, quantity)
+        if taken:
+            lot.quantity -= taken
+            quantity -= taken
+            allocations.append((lot, taken))
+    return allocations
+
+
+def take_lots(item_id, location_id, quantity):
+    """
+    Takes ``quantity`` of an item out of its lots at a location, first
+    expiry first, and returns the (lot, quantity taken) pairs.
+    """
+    allocations = allocate(fefo_lots(item_id, location_id), quantity)
+    StockLot.objects.bulk_update([lot for lot, _ in allocations],
+                                 ['quantity'])
+    return allocations
+
+
+def receive_lot(item_id, location_id, quantity, expires_at=None, code=''):
+    """
+    Records a received lot. The stock itself is added by the caller.
+    """
+    return StockLot.objects.create(
+        item_id=item_id, location_id=location_id, code=code,
+        expires_at=expires_at, received_quantity=quantity,
+        quantity=quantity,
+    )
+
+
+def expiring_lots(until):
+    """
+    Returns the lots with stock left that expire by ``until``, expired
+    ones included, soonest first. Served by the partial
+    ``stocklot_expiry_idx`` index.
+    """
+    return (
+        StockLot.objects.filter(quantity__gt=0, expires_at__lte=until)
+        .select_related('item', 'location').order_by('expires_at')
+    )
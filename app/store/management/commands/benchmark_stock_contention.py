@@ -0,0 +1,229 @@
+"""
+Management command: benchmark_stock_contention
+
+Measures checkout throughput when every till sells the same few hot
+items, as during a promotion, with their stock in a single row and then
+sharded across slots (see store.stock). Every till is a separate process,
+like gunicorn workers.
+
+Row locks only matter on a server database: on PostgreSQL the benchmark
+runs against the configured database and deletes the rows it created
+afterwards. On SQLite, which serializes all writes anyway, it runs on
+throwaway databases.
+
+After each run the stock left is checked against the units sold, so the
+benchmark also catches lost updates and stock going below zero.
+
+Usage:
+    python manage.py benchmark_stock_contention
+    python manage.py benchmark_stock_contention --tills 16 --sales 200 --slots 16
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+
+from accounts.models import Customer
+from store.models import Category, Item
+from store.stock import fold, shard
+from transactions.models import Sale
+from transactions.services import create_sale
+
+MODES = ('single-row', 'sharded')
+
+STOCK = 1_000_000
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare checkout throughput on a few hot items with single-row and '
+        'sharded stock.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tills', type=int, default=8,
+                            help='Processes recording sales.')
+        parser.add_argument('--sales', type=int, default=100,
+                            help='Sales recorded by each till.')
+        parser.add_argument('--items', type=int, default=2,
+                            help='Hot items, sold by every sale.')
+        parser.add_argument('--slots', type=int, default=8,
+                            help='Stock slots per item when sharded.')
+        # Internal: run a single role against the configured database.
+        parser.add_argument('--role', choices=['seed', 'till', 'check'],
+                            help=argparse.SUPPRESS)
+        parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+        parser.add_argument('--setup', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['role']:
+            role = {'seed': _seed, 'till': _till, 'check': _check}
+            self.stdout.write(json.dumps(role[options['role']](**options)))
+            return
+
+        for mode in MODES:
+            if connection.vendor == 'sqlite':
+                directory = tempfile.TemporaryDirectory()
+                env = {
+                    **os.environ,
+                    'DATABASE_URL':
+                        f'sqlite:///{directory.name}/bench.sqlite3',
+                }
+                self._wait(self._manage(env, 'migrate', '--verbosity', '0'))
+            else:
+                directory = nullcontext()
+                env = dict(os.environ)
+            with directory:
+                self._report(mode, self._benchmark(env, mode, options))
+
+    def _benchmark(self, env, mode, options):
+        setup = self._result(self._manage(
+            env, '--role', 'seed', '--mode', mode,
+            '--items', str(options['items']),
+            '--slots', str(options['slots']),
+        ))
+        tills = [
+            self._manage(env, '--role', 'till', '--setup', json.dumps(setup),
+                         '--sales', str(options['sales']))
+            for _ in range(options['tills'])
+        ]
+        results = [self._result(till) for till in tills]
+        committed = sum(result['committed'] for result in results)
+        check = self._result(self._manage(
+            env, '--role', 'check', '--setup',
+            json.dumps({**setup, 'sold': committed}),
+        ))
+
+        latencies = sorted(
+            latency for result in results for latency in result['latencies']
+        ) or [0]
+        elapsed = (
+            max(result['finished'] for result in results)
+            - min(result['started'] for result in results)
+        )
+        return {
+            'sales_per_second': committed / elapsed,
+            'committed': committed,
+            'failed': sum(result['failed'] for result in results),
+            'p50_ms': statistics.median(latencies) * 1000,
+            'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000,
+            **check,
+        }
+
+    def _report(self, mode, result):
+        self.stdout.write(self.style.MIGRATE_HEADING(mode))
+        self.stdout.write(
+            f"  {result['sales_per_second']:.1f} sales/s, "
+            f"{result['committed']} committed, {result['failed']} failed"
+        )
+        self.stdout.write(
+            f"  sale latency p50 {result['p50_ms']:.1f} ms, "
+            f"p95 {result['p95_ms']:.1f} ms"
+        )
+        if result['stock_ok']:
+            self.stdout.write(self.style.SUCCESS(
+                '  stock left matches the units sold'
+            ))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f"  stock left {result['stock']} does not match "
+                f"{result['expected']} expected"
+            ))
+
+    def _manage(self, env, *args):
+        if args[0].startswith('--'):
+            args = ('benchmark_stock_contention', *args)
+        return subprocess.Popen(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), *args],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            env=env,
+        )
+
+    def _wait(self, process):
+        stdout, stderr = process.communicate()
+        if process.returncode:
+            raise CommandError(stderr)
+        return stdout
+
+    def _result(self, process):
+        return json.loads(self._wait(process).strip().splitlines()[-1])
+
+
+def _seed(mode, items, slots, **options):
+    customer = Customer.objects.create(first_name='Bench', last_name='Till')
+    category = Category.objects.create(name='Contention bench')
+    item_ids = []
+    for number in range(items):
+        item = Item.objects.create(
+            name=f'Hot item {number}', description='', category=category,
+            quantity=STOCK, price=1,
+        )
+        if mode == 'sharded':
+            shard(item.pk, slots)
+        item_ids.append(item.pk)
+    return {'customer': customer.pk, 'category': category.pk,
+            'items': item_ids}
+
+
+def _till(setup, sales, **options):
+    setup = json.loads(setup)
+    customer = Customer.objects.get(pk=setup['customer'])
+    lines = len(setup['items'])
+    latencies = []
+    failed = 0
+    started = time.time()
+    for _ in range(sales):
+        sale_started = time.perf_counter()
+        try:
+            create_sale(
+                {
+                    'customer': customer, 'sub_total': lines,
+                    'grand_total': lines, 'amount_paid': lines,
+                    'amount_change': 0,
+                },
+                [
+                    {'id': item_id, 'price': 1, 'quantity': 1,
+                     'total_item': 1}
+                    for item_id in setup['items']
+                ],
+            )
+        except DatabaseError:
+            # Lock timeouts and deadlocks.
+            failed += 1
+        else:
+            latencies.append(time.perf_counter() - sale_started)
+    return {
+        'started': started, 'finished': time.time(),
+        'committed': len(latencies), 'failed': failed,
+        'latencies': latencies,
+    }
+
+
+def _check(setup, **options):
+    setup = json.loads(setup)
+    stock = []
+    for item in Item.objects.filter(pk__in=setup['items']):
+        if hasattr(item, 'sharded_stock'):
+            stock.append(fold(item.pk))
+        else:
+            stock.append(item.quantity)
+    expected = [STOCK - setup['sold']] * len(setup['items'])
+
+    if connection.vendor != 'sqlite':
+        # Remove the benchmark's rows from the configured database.
+        Sale.objects.filter(customer_id=setup['customer']).delete()
+        Item.objects.filter(pk__in=setup['items']).delete()
+        Category.objects.filter(pk=setup['category']).delete()
+        Customer.objects.filter(pk=setup['customer']).delete()
+    return {'stock_ok': stock == expected, 'stock': stock,
+            'expected': expected}
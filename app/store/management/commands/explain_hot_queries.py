@@ -0,0 +1,312 @@
+"""
+Management command: explain_hot_queries
+
+Seeds a large throwaway dataset, then prints the query plan and timing of
+every hot query path twice: once with the indexes declared on the models and
+once with them dropped. Foreign-key indexes that a declared index replaced
+are recreated for the second run, so it measures against the schema as it
+was before rather than against no indexes at all. Everything runs inside a
+single transaction that is rolled back at the end, so the database is left
+untouched.
+
+Usage:
+    python manage.py explain_hot_queries --items 20000 --sales 100000
+"""
+
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from accounts.models import Customer, Vendor
+from bills.models import Bill
+from store.models import (
+    LOW_STOCK_THRESHOLD, Category, Delivery, Item, Location, LocationStock,
+    StockLot,
+)
+from transactions.models import Purchase, Sale, SaleDetail
+
+INDEXED_MODELS = [Item, LocationStock, StockLot, Delivery, Sale, SaleDetail,
+                  Purchase, Bill]
+
+# Single-column foreign-key indexes dropped in favour of a composite index
+# declared in Meta, as (model, field name).
+REPLACED_FK_INDEXES = [(SaleDetail, 'item')]
+
+
+def hot_queries():
+    """
+    Returns (label, queryset) pairs mirroring the filters and orderings
+    used by the views, reports and alert senders.
+    """
+    now = timezone.now()
+    month_ago = now - timedelta(days=30)
+    location = Location.objects.filter(slug='bench-location-0').values_list(
+        'pk', flat=True
+    ).first()
+    item = StockLot.objects.filter(location=location).values_list(
+        'item', flat=True
+    ).first()
+    return [
+        ('sales in date range',
+         Sale.objects.filter(date_added__range=[month_ago, now])
+         .order_by('date_added')),
+        ('purchases in date range',
+         Purchase.objects.filter(order_date__range=[month_ago, now])),
+        ('pending purchases',
+         Purchase.objects.filter(delivery_status='P').order_by('order_date')),
+        ('low stock items',
+         Item.objects.filter(quantity__lte=LOW_STOCK_THRESHOLD)
+         .order_by()),
+        ('low stock at a location',
+         LocationStock.objects.filter(location=location,
+                                      quantity__lte=LOW_STOCK_THRESHOLD)
+         .order_by('quantity')),
+        ('lots to sell first (FEFO)',
+         StockLot.objects.filter(item=item, location=location,
+                                 quantity__gt=0)
+         .order_by(F('expires_at').asc(nulls_last=True), 'pk')),
+        ('lots expiring within a week',
+         StockLot.objects.filter(quantity__gt=0,
+                                 expires_at__lte=now + timedelta(days=7))
+         .order_by('expires_at')),
+        ('sales at a location in date range',
+         Sale.objects.filter(location=location,
+                             date_added__range=[month_ago, now])
+         .order_by('date_added')),
+        ('duplicate item names',
+         Item.objects.values('name').annotate(name_count=Count('name'))
+         .filter(name_count__gt=1).order_by()),
+        ('items ordered by name',
+         Item.objects.order_by('name')[:10]),
+        ('items in sales',
+         SaleDetail.objects.values('item').distinct()),
+        ('sales trend per item',
+         SaleDetail.objects.filter(item__in=Item.objects.filter(
+             id__in=SaleDetail.objects.values('item').distinct()))
+         .values('item__name', 'sale__date_added__date')
+         .annotate(total_quantity=Sum('quantity'))
+         .order_by('sale__date_added__date')),
+        ('pending deliveries',
+         Delivery.objects.filter(is_delivered=False).order_by('date')),
+        ('unpaid bills',
+         Bill.objects.filter(status=False).order_by('date')),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large dataset in a rolled-back transaction and compare '
+        'EXPLAIN plans and timings of hot queries with and without indexes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=20000)
+        parser.add_argument('--sales', type=int, default=100000)
+        parser.add_argument('--lines', type=int, default=3,
+                            help='Sale lines per sale.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Timed runs per query.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write('Seeding dataset...')
+            _seed(
+                random.Random(options['seed']), options['items'],
+                options['sales'], options['lines'],
+            )
+            _analyze()
+
+            with_indexes = self._measure(options['repeat'])
+            self._drop_indexes()
+            _analyze()
+            without_indexes = self._measure(options['repeat'])
+
+            transaction.set_rollback(True)
+
+        for label, (plan_after, ms_after) in with_indexes.items():
+            plan_before, ms_before = without_indexes[label]
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(f'  before indexes:  {ms_before:.2f} ms')
+            self.stdout.write('    ' + plan_before.replace('\n', '\n    '))
+            self.stdout.write(f'  with indexes:    {ms_after:.2f} ms')
+            self.stdout.write('    ' + plan_after.replace('\n', '\n    '))
+
+    def _measure(self, repeat):
+        results = {}
+        for label, queryset in hot_queries():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            results[label] = (queryset.explain(), statistics.median(timings))
+        return results
+
+    def _drop_indexes(self):
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    cursor.execute(f'DROP INDEX {quote(index.name)}')
+            for model, field_name in REPLACED_FK_INDEXES:
+                table = model._meta.db_table
+                column = model._meta.get_field(field_name).column
+                cursor.execute(
+                    f'CREATE INDEX {quote(f"{table}_{column}_id")} '
+                    f'ON {quote(table)} ({quote(column)})'
+                )
+
+
+def _analyze():
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+@contextmanager
+def _preset_slugs(*models):
+    """
+    Keeps the slugs assigned below instead of regenerating them on insert,
+    which would query for uniqueness row by row and collide within a batch.
+    """
+    fields = [model._meta.get_field('slug') for model in models]
+    for field in fields:
+        field.overwrite_on_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.overwrite_on_add = True
+
+
+def _seed(rng, n_items, n_sales, lines_per_sale):
+    with _preset_slugs(Category, Vendor, Item, Location, Purchase):
+        _seed_rows(rng, n_items, n_sales, lines_per_sale)
+
+
+def _seed_rows(rng, n_items, n_sales, lines_per_sale):
+    now = timezone.now()
+    words = ['Milk', 'Rice', 'Soap', 'Tea', 'Bread', 'Oil', 'Salt', 'Sugar']
+
+    categories = Category.objects.bulk_create(
+        Category(name=f'Category {i}', slug=f'bench-category-{i}')
+        for i in range(50)
+    )
+    vendors = Vendor.objects.bulk_create(
+        Vendor(name=f'Vendor {i}', slug=f'bench-vendor-{i}')
+        for i in range(200)
+    )
+    customer = Customer.objects.create(first_name='Bench', last_name='Mark')
+    items = Item.objects.bulk_create(
+        (
+            Item(
+                name=f'{rng.choice(words)} {rng.randint(1, n_items // 2 or 1)}',
+                slug=f'bench-item-{i}',
+                description='',
+                category=rng.choice(categories),
+                vendor=rng.choice(vendors),
+                quantity=rng.randint(0, 500),
+                price=rng.randint(1, 1000),
+            )
+            for i in range(n_items)
+        ),
+        batch_size=2000,
+    )
+    locations = Location.objects.bulk_create(
+        Location(name=f'Location {i}', slug=f'bench-location-{i}')
+        for i in range(5)
+    )
+    LocationStock.objects.bulk_create(
+        (
+            LocationStock(item=item, location=location,
+                          quantity=rng.randint(0, 100))
+            for item in items for location in locations
+        ),
+        batch_size=2000,
+    )
+    # A few lots per item and location, most of them sold out.
+    StockLot.objects.bulk_create(
+        (
+            StockLot(
+                item=item, location=location,
+                expires_at=now + timedelta(days=rng.randint(-30, 365)),
+                received_quantity=50,
+                quantity=rng.choice([0, 0, 0, rng.randint(1, 50)]),
+            )
+            for item in items for location in locations for _ in range(4)
+        ),
+        batch_size=2000,
+    )
+
+    sales = Sale.objects.bulk_create(
+        (
+            Sale(customer=customer, location=rng.choice(locations))
+            for _ in range(n_sales)
+        ),
+        batch_size=2000,
+    )
+    # auto_now_add stamps every row with the same instant; spread them out.
+    for sale in sales:
+        sale.date_added = now - timedelta(minutes=rng.randint(0, 525600))
+    Sale.objects.bulk_update(sales, ['date_added'], batch_size=2000)
+
+    SaleDetail.objects.bulk_create(
+        (
+            SaleDetail(
+                sale=sale, item=rng.choice(items), price=1,
+                quantity=1, total_detail=1,
+            )
+            for sale in sales for _ in range(lines_per_sale)
+        ),
+        batch_size=2000,
+    )
+
+    purchases = Purchase.objects.bulk_create(
+        (
+            Purchase(
+                slug=f'bench-purchase-{i}',
+                item=rng.choice(items),
+                vendor=rng.choice(vendors),
+                quantity=10,
+                delivery_status=rng.choice('PSSSS'),
+                total_value=0,
+            )
+            for i in range(n_sales // 10)
+        ),
+        batch_size=2000,
+    )
+    for purchase in purchases:
+        purchase.order_date = now - timedelta(minutes=rng.randint(0, 525600))
+    Purchase.objects.bulk_update(purchases, ['order_date'], batch_size=2000)
+
+    Delivery.objects.bulk_create(
+        (
+            Delivery(
+                item=rng.choice(items),
+                date=now - timedelta(minutes=rng.randint(0, 525600)),
+                is_delivered=rng.random() < 0.9,
+            )
+            for _ in range(n_sales // 10)
+        ),
+        batch_size=2000,
+    )
+    Bill.objects.bulk_create(
+        (
+            Bill(
+                slug=f'bench-bill-{i}',
+                institution_name=f'Institution {i}',
+                payment_details='bank',
+                amount=100,
+                status=rng.random() < 0.9,
+            )
+            for i in range(n_sales // 100)
+        ),
+        batch_size=2000,
+    )
@@ -0,0 +1,27 @@
+"""
+Management command: rebuild_stock_totals
+
+Recomputes each item's total stock from its stock by location, after
+location rows were written in bulk or by hand. Items without any location
+row get their stock at the default location. Sharded items are folded
+first.
+
+Usage:
+    python manage.py rebuild_stock_totals
+"""
+
+from django.core.management.base import BaseCommand
+
+from store.locations import rebuild_totals
+from store.stock import fold_all
+
+
+class Command(BaseCommand):
+    help = 'Recompute item stock totals from the stock at each location.'
+
+    def handle(self, *args, **options):
+        fold_all()
+        corrected = rebuild_totals()
+        self.stdout.write(self.style.SUCCESS(
+            f'Corrected the stock total of {corrected} items.'
+        ))
@@ -0,0 +1,103 @@
+"""
+Management command: startup_benchmark
+
+Measures a worker's cold start in a fresh interpreter: the time to set up
+Django and import every view module through the URLconf, and the resident
+memory afterwards. It runs under ``python -X importtime`` and lists the
+slowest imports. Fails when a budget is exceeded or when a heavy optional
+dependency is imported at startup.
+
+Usage:
+    python manage.py startup_benchmark
+    python manage.py startup_benchmark --max-startup-ms 1500 --max-rss-mb 120
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Optional dependencies that must only be imported by the features using
+# them, never while a worker boots.
+HEAVY_MODULES = (
+    'spacy', 'transformers', 'torch', 'wordcloud', 'tkinter', 'openpyxl',
+)
+
+PROBE = '''
+import json, os, resource, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "startup_ms": elapsed * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_modules": [m for m in json.loads(sys.argv[1]) if m in sys.modules],
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measure cold-start time and memory of a worker against a budget.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-startup-ms', type=float, default=2000)
+        parser.add_argument('--max-rss-mb', type=float, default=150)
+        parser.add_argument('--top', type=int, default=10,
+                            help='Number of slowest imports to list.')
+
+    def handle(self, *args, **options):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE,
+             json.dumps(HEAVY_MODULES)],
+            capture_output=True, text=True, env=os.environ.copy(),
+        )
+        if result.returncode:
+            raise CommandError(result.stderr)
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+
+        self.stdout.write(f"startup: {stats['startup_ms']:.0f} ms")
+        self.stdout.write(f"max RSS: {stats['rss_mb']:.1f} MB")
+        self.stdout.write('slowest imports (cumulative):')
+        for micros, module in _slowest_imports(result.stderr, options['top']):
+            self.stdout.write(f'  {micros / 1000:8.1f} ms  {module}')
+
+        failures = []
+        if stats['heavy_modules']:
+            failures.append(
+                'heavy modules imported at startup: '
+                + ', '.join(stats['heavy_modules'])
+            )
+        if stats['startup_ms'] > options['max_startup_ms']:
+            failures.append(
+                f"startup {stats['startup_ms']:.0f} ms exceeds "
+                f"{options['max_startup_ms']:.0f} ms"
+            )
+        if stats['rss_mb'] > options['max_rss_mb']:
+            failures.append(
+                f"RSS {stats['rss_mb']:.1f} MB exceeds "
+                f"{options['max_rss_mb']:.0f} MB"
+            )
+        if failures:
+            raise CommandError('; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Startup within budget.'))
+
+
+def _slowest_imports(importtime_log, top):
+    """
+    Parses ``-X importtime`` output into the ``top`` top-level imports with
+    the largest cumulative time, in microseconds.
+    """
+    imports = []
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit() or module.startswith('  '):
+            continue
+        imports.append((int(cumulative), module.strip()))
+    return sorted(imports, reverse=True)[:top]
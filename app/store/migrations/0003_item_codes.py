@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-19 18:15
+
+import django.db.models.deletion
+import store.barcodes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='SKU'),
+        ),
+        migrations.CreateModel(
+            name='ItemBarcode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=64, unique=True, validators=[store.barcodes.validate_barcode])),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='barcodes', to='store.item')),
+            ],
+        ),
+    ]
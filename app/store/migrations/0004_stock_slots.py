@@ -0,0 +1,35 @@
+# Generated by Django 5.1.5 on 2026-10-19 18:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_item_codes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShardedStock',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sharded_stock', serialize=False, to='store.item')),
+                ('slots', models.PositiveSmallIntegerField(default=8)),
+                ('folded_quantity', models.IntegerField(default=0)),
+                ('folded_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_slots', to='store.item')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('item', 'slot'), name='stockslot_item_slot_unique'), models.CheckConstraint(condition=models.Q(('quantity__gte', 0)), name='stockslot_quantity_non_negative')],
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.1.5 on 2026-10-19 19:25
+
+import django.db.models.deletion
+import django.utils.timezone
+import django_extensions.db.fields
+from django.db import migrations, models
+
+
+def stock_at_default_location(apps, schema_editor):
+    Item = apps.get_model('store', 'Item')
+    Location = apps.get_model('store', 'Location')
+    LocationStock = apps.get_model('store', 'LocationStock')
+    location = Location.objects.create(
+        name='Main store', slug='main-store', is_default=True
+    )
+    LocationStock.objects.bulk_create(
+        (
+            LocationStock(item_id=item_id, location=location,
+                          quantity=quantity)
+            for item_id, quantity in
+            Item.objects.values_list('id', 'quantity').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_stock_slots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('slug', django_extensions.db.fields.AutoSlugField(blank=True, editable=False, populate_from='name', unique=True)),
+                ('kind', models.CharField(choices=[('S', 'Store'), ('W', 'Warehouse')], default='S', max_length=1)),
+                ('is_default', models.BooleanField(default=False)),
+            ],
+            options={
+                'ordering': ['name'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_default', True)), fields=('is_default',), name='location_single_default')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LocationStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='location_stock', to='store.item')),
+                ('location', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='stock', to='store.location')),
+            ],
+            options={
+                'verbose_name_plural': 'Location stock',
+                'indexes': [models.Index(condition=models.Q(('quantity__lte', 20)), fields=['location', 'quantity'], name='locationstock_low_stock_idx')],
+                'constraints': [models.UniqueConstraint(fields=('location', 'item'), name='locationstock_location_item_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('destination', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='transfers_in', to='store.location')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transfers', to='store.item')),
+                ('source', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='transfers_out', to='store.location')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['source', 'date'], name='transfer_source_date_idx'), models.Index(fields=['destination', 'date'], name='transfer_destination_date_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('source', models.F('destination')), _negated=True), name='stocktransfer_distinct_locations'), models.CheckConstraint(condition=models.Q(('quantity__gt', 0)), name='stocktransfer_quantity_positive')],
+            },
+        ),
+        migrations.RunPython(
+            stock_at_default_location, migrations.RunPython.noop
+        ),
+    ]
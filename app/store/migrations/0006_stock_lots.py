@@ -0,0 +1,56 @@
+# Generated by Django 5.1.5 on 2026-10-19 20:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def lots_for_expiring_stock(apps, schema_editor):
+    # Stock of items with an expiring date becomes one lot per location.
+    LocationStock = apps.get_model('store', 'LocationStock')
+    StockLot = apps.get_model('store', 'StockLot')
+    StockLot.objects.bulk_create(
+        (
+            StockLot(
+                item_id=item_id, location_id=location_id,
+                expires_at=expires_at, received_quantity=quantity,
+                quantity=quantity,
+            )
+            for item_id, location_id, quantity, expires_at in
+            LocationStock.objects.filter(
+                quantity__gt=0, item__expiring_date__isnull=False
+            ).values_list(
+                'item_id', 'location_id', 'quantity', 'item__expiring_date'
+            ).iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_locations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(blank=True, max_length=64)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('received_quantity', models.PositiveIntegerField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='store.item')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='lots', to='store.location')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('quantity__gt', 0)), fields=['item', 'location', 'expires_at', 'id'], name='stocklot_fefo_idx'), models.Index(condition=models.Q(('quantity__gt', 0)), fields=['expires_at'], name='stocklot_expiry_idx')],
+            },
+        ),
+        migrations.RunPython(
+            lots_for_expiring_stock, migrations.RunPython.noop
+        ),
+    ]
@@ -6,6 +6,12 @@ Contains Django models for handling categories, items, and deliveries.
 This module defines the following classes:
 - Category: Represents a category for items.
 - Item: Represents an item in the inventory.
+- ItemBarcode: A barcode printed on an item.
+- Location: A store or warehouse that holds stock.
+- LocationStock: An item's stock at one location.
+- StockTransfer: A move of stock between two locations.
+- StockLot: A received batch of an item, with its own expiry.
+- ShardedStock, StockSlot: The stock of a hot item, split across rows.
 - Delivery: Represents a delivery of an item to a customer.
 
 Each class provides specific fields and methods for handling related data.
@@ -13,10 +19,18 @@ Each class provides specific fields and methods for handling related data.
 
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
 from django.forms import model_to_dict
 from django_extensions.db.fields import AutoSlugField
 from phonenumber_field.modelfields import PhoneNumberField
 from accounts.models import Vendor
+from InventoryMS.cache import (
+    VersionedManager, VersionedQuerySet, bump_on_commit,
+)
+from .barcodes import normalize_code, validate_barcode
+
+# Items at or below this quantity are reported as low stock.
+LOW_STOCK_THRESHOLD = 20
 
 
 class Category(models.Model):
@@ -26,6 +40,8 @@ class Category(models.Model):
     name = models.CharField(max_length=50)
     slug = AutoSlugField(unique=True, populate_from='name')
 
+    objects = VersionedManager()
+
     def __str__(self):
         """
         String representation of the category.
@@ -36,12 +52,44 @@ class Category(models.Model):
         verbose_name_plural = 'Categories'
 
 
+class ItemQuerySet(VersionedQuerySet):
+    """
+    Item queryset whose bulk writes also expire cached scans (see
+    store.scan), unless they only change stock.
+    """
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        if rows and set(kwargs) != {'quantity'}:
+            bump_on_commit(ItemBarcode)
+        return rows
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        if created:
+            bump_on_commit(ItemBarcode)
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        if rows and set(fields) != {'quantity'}:
+            bump_on_commit(ItemBarcode)
+        return rows
+
+    bulk_update.alters_data = True
+
+
 class Item(models.Model):
     """
     Represents an item in the inventory.
     """
     slug = AutoSlugField(unique=True, populate_from='name')
     name = models.CharField(max_length=50)
+    sku = models.CharField(
+        'SKU', max_length=64, unique=True, null=True, blank=True
+    )
     description = models.TextField(max_length=256)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     quantity = models.IntegerField(default=0)
@@ -49,6 +97,8 @@ class Item(models.Model):
     expiring_date = models.DateTimeField(null=True, blank=True)
     vendor = models.ForeignKey(Vendor, on_delete=models.SET_NULL, null=True)
 
+    objects = VersionedManager.from_queryset(ItemQuerySet)()
+
     def __str__(self):
         """
         String representation of the item.
@@ -67,6 +117,14 @@ class Item(models.Model):
         """
         return reverse('item-detail', kwargs={'slug': self.slug})
 
+    def refresh_from_db(self, *args, **kwargs):
+        """
+        Reloads the item, remembering the reloaded stock as loaded so a
+        later save counts only changes made after it (see store.signals).
+        """
+        super().refresh_from_db(*args, **kwargs)
+        self._stock_quantity = self.__dict__.get('quantity')
+
     def to_json(self):
         product = model_to_dict(self)
         product['id'] = self.id
@@ -79,6 +137,266 @@ class Item(models.Model):
     class Meta:
         ordering = ['name']
         verbose_name_plural = 'Items'
+        indexes = [
+            models.Index(fields=['name'], name='item_name_idx'),
+            models.Index(
+                fields=['quantity'],
+                name='item_low_stock_idx',
+                condition=models.Q(quantity__lte=LOW_STOCK_THRESHOLD),
+            ),
+        ]
+
+
+class ItemBarcode(models.Model):
+    """
+    A barcode printed on an item. An item can carry several, such as the
+    unit's EAN-13 and the case's GTIN-14.
+    """
+    item = models.ForeignKey(
+        Item, on_delete=models.CASCADE, related_name='barcodes'
+    )
+    code = models.CharField(
+        max_length=64, unique=True, validators=[validate_barcode]
+    )
+
+    objects = VersionedManager()
+
+    def __str__(self):
+        """
+        String representation of the barcode.
+        """
+        return self.code
+
+    def clean(self):
+        # Before the uniqueness check, which compares stored forms.
+        self.code = normalize_code(self.code)
+
+    def save(self, *args, **kwargs):
+        self.code = normalize_code(self.code)
+        super().save(*args, **kwargs)
+
+
+class Location(models.Model):
+    """
+    A store or warehouse that holds stock.
+    """
+    STORE = 'S'
+    WAREHOUSE = 'W'
+    KIND_CHOICES = [(STORE, 'Store'), (WAREHOUSE, 'Warehouse')]
+
+    name = models.CharField(max_length=50)
+    slug = AutoSlugField(unique=True, populate_from='name')
+    kind = models.CharField(max_length=1, choices=KIND_CHOICES, default=STORE)
+    # Takes the stock of sales and purchases that name no location, and
+    # direct edits of Item.quantity.
+    is_default = models.BooleanField(default=False)
+
+    objects = VersionedManager()
+
+    def __str__(self):
+        """
+        String representation of the location.
+        """
+        return self.name
+
+    class Meta:
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['is_default'],
+                condition=models.Q(is_default=True),
+                name='location_single_default',
+            ),
+        ]
+
+
+class LocationStock(models.Model):
+    """
+    An item's stock at one location. ``Item.quantity`` is the sum over
+    all locations, kept up to date by store.locations.
+    """
+    item = models.ForeignKey(
+        Item, on_delete=models.CASCADE, related_name='location_stock'
+    )
+    # Covered by the (location, item) constraint declared in Meta.
+    location = models.ForeignKey(
+        Location, on_delete=models.PROTECT, related_name='stock',
+        db_index=False
+    )
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Location stock'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['location', 'item'],
+                name='locationstock_location_item_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['location', 'quantity'],
+                name='locationstock_low_stock_idx',
+                condition=models.Q(quantity__lte=LOW_STOCK_THRESHOLD),
+            ),
+        ]
+
+    def __str__(self):
+        """
+        String representation of the location stock.
+        """
+        return f"Item ID: {self.item_id} | Location ID: {self.location_id} | Qty: {self.quantity}"
+
+
+class StockTransfer(models.Model):
+    """
+    A move of an item's stock from one location to another.
+    """
+    item = models.ForeignKey(
+        Item, on_delete=models.CASCADE, related_name='transfers'
+    )
+    # Both covered by the (location, date) indexes declared in Meta.
+    source = models.ForeignKey(
+        Location, on_delete=models.PROTECT, related_name='transfers_out',
+        db_index=False
+    )
+    destination = models.ForeignKey(
+        Location, on_delete=models.PROTECT, related_name='transfers_in',
+        db_index=False
+    )
+    quantity = models.PositiveIntegerField()
+    date = models.DateTimeField(default=timezone.now)
+    note = models.CharField(max_length=200, blank=True)
+
+    objects = VersionedManager()
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.CheckConstraint(
+                condition=~models.Q(source=models.F('destination')),
+                name='stocktransfer_distinct_locations',
+            ),
+            models.CheckConstraint(
+                condition=models.Q(quantity__gt=0),
+                name='stocktransfer_quantity_positive',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['source', 'date'],
+                         name='transfer_source_date_idx'),
+            models.Index(fields=['destination', 'date'],
+                         name='transfer_destination_date_idx'),
+        ]
+
+    def __str__(self):
+        """
+        String representation of the stock transfer.
+        """
+        return (
+            f"{self.quantity} x {self.item} from {self.source} "
+            f"to {self.destination}"
+        )
+
+
+class StockLot(models.Model):
+    """
+    A batch of an item received at a location, with its own expiry.
+    Checkouts take stock from the lots first expiring first (see
+    store.lots); stock outside any lot, such as stock from before lots,
+    is sold last.
+    """
+    item = models.ForeignKey(
+        Item, on_delete=models.CASCADE, related_name='lots'
+    )
+    location = models.ForeignKey(
+        Location, on_delete=models.PROTECT, related_name='lots'
+    )
+    # The supplier's batch number, when known.
+    code = models.CharField(max_length=64, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    received_at = models.DateTimeField(default=timezone.now)
+    received_quantity = models.PositiveIntegerField()
+    # What is left of the lot.
+    quantity = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            # First expiry first out: the lots of an item left at a
+            # location, in the order checkouts take from them.
+            models.Index(
+                fields=['item', 'location', 'expires_at', 'id'],
+                name='stocklot_fefo_idx',
+                condition=models.Q(quantity__gt=0),
+            ),
+            models.Index(
+                fields=['expires_at'],
+                name='stocklot_expiry_idx',
+                condition=models.Q(quantity__gt=0),
+            ),
+        ]
+
+    def __str__(self):
+        """
+        String representation of the stock lot.
+        """
+        return (
+            f"{self.item.name} lot {self.code or self.pk}: "
+            f"{self.quantity} left, expires {self.expires_at or 'never'}"
+        )
+
+
+class ShardedStock(models.Model):
+    """
+    Marks an item whose stock is split across ``slots`` StockSlot rows,
+    so that concurrent checkouts do not all wait on its row (see
+    store.stock).
+    """
+    item = models.OneToOneField(
+        Item, on_delete=models.CASCADE, primary_key=True,
+        related_name='sharded_stock'
+    )
+    slots = models.PositiveSmallIntegerField(default=8)
+    # The stock spread over the slots at the last fold; what the slots
+    # hold less is what checkouts took since.
+    folded_quantity = models.IntegerField(default=0)
+    folded_at = models.DateTimeField(null=True, blank=True)
+
+    objects = VersionedManager()
+
+    def __str__(self):
+        """
+        String representation of the sharded stock.
+        """
+        return f"{self.item.name} ({self.slots} slots)"
+
+
+class StockSlot(models.Model):
+    """
+    One share of a sharded item's stock.
+    """
+    item = models.ForeignKey(
+        Item, on_delete=models.CASCADE, related_name='stock_slots'
+    )
+    slot = models.PositiveSmallIntegerField()
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['item', 'slot'], name='stockslot_item_slot_unique'
+            ),
+            models.CheckConstraint(
+                condition=models.Q(quantity__gte=0),
+                name='stockslot_quantity_non_negative',
+            ),
+        ]
+
+    def __str__(self):
+        """
+        String representation of the stock slot.
+        """
+        return f"Item ID: {self.item_id} | Slot: {self.slot} | Qty: {self.quantity}"
 
 
 class Delivery(models.Model):
@@ -96,6 +414,8 @@ class Delivery(models.Model):
         default=False, verbose_name='Is Delivered'
     )
 
+    objects = VersionedManager()
+
     def __str__(self):
         """
         String representation of the delivery.
@@ -104,3 +424,12 @@ class Delivery(models.Model):
             f"Delivery of {self.item} to {self.customer_name} "
             f"at {self.location} on {self.date}"
         )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['date'],
+                name='delivery_pending_date_idx',
+                condition=models.Q(is_delivered=False),
+            ),
+        ]
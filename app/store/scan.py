@@ -0,0 +1,53 @@
+"""
+Module: store.scan
+
+Resolving scanned barcodes and SKUs to items at the till.
+
+A scan is one lookup on a unique index, behind an LRU cache in each
+process. Cache entries are keyed by the scan version (see store.signals),
+which moves when barcodes, categories or an item's sale details change,
+saved one by one or written in bulk, but not when only its stock does, so
+checkouts do not flush the cache.
+
+The versions come from the default cache, so a write in one process only
+expires the other processes' entries when that cache is shared. With a
+process-local cache every scan goes to the database.
+"""
+
+from functools import lru_cache
+
+from InventoryMS.cache import cache_is_shared, model_versions
+from .barcodes import normalize_code
+from .models import Category, Item, ItemBarcode
+
+# Codes each process remembers.
+SCAN_CACHE_SIZE = 4096
+
+
+def _find(code):
+    barcode = ItemBarcode.objects.select_related('item__category') \
+        .filter(code=normalize_code(code)).first()
+    if barcode:
+        return barcode.item.to_json()
+    item = Item.objects.select_related('category').filter(sku=code).first()
+    return item.to_json() if item else None
+
+
+@lru_cache(maxsize=SCAN_CACHE_SIZE)
+def _lookup(code, versions):
+    return _find(code)
+
+
+def scan(code):
+    """
+    Returns the sale payload (``Item.to_json()``) of the item with this
+    barcode or SKU, or None.
+    """
+    code = code.strip()
+    if not code:
+        return None
+    if not cache_is_shared():
+        return _find(code)
+    payload = _lookup(code, tuple(model_versions(ItemBarcode, Category)))
+    # Callers get their own copy; the cached one is shared.
+    return dict(payload) if payload else None
@@ -0,0 +1,71 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from InventoryMS.cache import bump_on_commit
+from .locations import add_to_location, default_location_id
+from .lots import take_lots
+from .models import Item, ItemBarcode
+
+# Item fields a scan returns; stock is not one of them.
+SCAN_FIELDS = [
+    field.attname for field in Item._meta.concrete_fields
+    if field.name != 'quantity'
+]
+
+
+def _scan_values(instance):
+    return tuple(instance.__dict__.get(name) for name in SCAN_FIELDS)
+
+
+@receiver(post_init, sender=Item)
+def remember_scan_values(sender, instance, **kwargs):
+    """
+    Signal to remember an item's scanned fields as loaded, to tell whether
+    a save changed them.
+    """
+    instance._scan_values = _scan_values(instance)
+    instance._stock_quantity = instance.__dict__.get('quantity')
+
+
+@receiver(post_save, sender=Item)
+def record_direct_stock_change(sender, instance, created, raw=False,
+                               update_fields=None, **kwargs):
+    """
+    Signal to count a direct change of an item's quantity, such as an
+    edit, as stock received at or taken from the default location (see
+    store.locations). Stock taken comes out of the lots there first
+    expiry first.
+    """
+    if raw or 'quantity' not in instance.__dict__ or (
+        update_fields is not None and 'quantity' not in update_fields
+    ):
+        return
+    previous = 0 if created else instance._stock_quantity or 0
+    instance._stock_quantity = instance.quantity
+    if created or instance.quantity != previous:
+        location_id = default_location_id()
+        add_to_location(instance.pk, location_id,
+                        instance.quantity - previous)
+        if instance.quantity < previous:
+            take_lots(instance.pk, location_id,
+                      previous - instance.quantity)
+
+
+@receiver(post_save, sender=Item)
+def bump_scan_version(sender, instance, created, **kwargs):
+    """
+    Signal to expire cached scans when an item's scanned fields change.
+    The barcode version serves as the scan version.
+    """
+    values = _scan_values(instance)
+    if created or values != instance._scan_values:
+        bump_on_commit(ItemBarcode)
+    instance._scan_values = values
+
+
+@receiver(post_delete, sender=Item)
+def bump_scan_version_on_delete(sender, instance, **kwargs):
+    """
+    Signal to expire cached scans of a deleted item.
+    """
+    bump_on_commit(ItemBarcode)
@@ -0,0 +1,167 @@
+"""
+Module: store.stock
+
+Sharded stock counters for hot items.
+
+Every checkout updates the row of each item it sells, and holds that row
+locked until it commits. During a promotion most checkouts sell the same
+few items, so the tills queue up on those rows one at a time.
+
+For an item flagged as sharded, the stock is split across ``slots``
+StockSlot rows instead. A checkout takes its quantity from one slot,
+picked at random, with a conditional update that never takes a slot
+below zero, so up to ``slots`` checkouts of the item proceed at once.
+Only when no single slot holds enough does it lock them all and take
+across them.
+
+The slots hold the item's stock at the default location (see
+store.locations); sales at other locations use their rows as usual.
+``Item.quantity`` and the default location's row of a sharded item are
+refreshed by ``fold``, which a periodic job runs every minute: it takes
+what the slots lost since the previous fold out of the row and the total,
+then spreads the row's stock evenly over the slots again. Only then do
+the units sold come out of the item's lots (see store.lots). Purchases,
+edits and offline sales made meanwhile still go to the row, so they are
+counted in. Lists, alerts, live updates and transfers out of the default
+location see sharded stock as of the last fold.
+"""
+
+import random
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .locations import add_to_location, default_location_id, set_total
+from .lots import take_lots
+from .models import Item, LocationStock, ShardedStock, StockSlot
+
+
+def sharded_items(item_ids):
+    """
+    Returns {item id: slot count} for those of ``item_ids`` that are
+    sharded. Read from the database inside the caller's transaction rather
+    than cached, so a checkout sees a shard or unshard made by any process
+    as soon as it commits.
+    """
+    return dict(
+        ShardedStock.objects.filter(item_id__in=item_ids)
+        .values_list('item_id', 'slots')
+    )
+
+
+def take(item_id, quantity, slots):
+    """
+    Takes ``quantity`` out of a sharded item's slots, inside the current
+    transaction. Returns False, taking nothing, when there is not that
+    much stock left.
+    """
+    start = random.randrange(slots)
+    for offset in range(slots):
+        if StockSlot.objects.filter(
+            item_id=item_id, slot=(start + offset) % slots,
+            quantity__gte=quantity,
+        ).update(quantity=F('quantity') - quantity):
+            return True
+
+    # No slot holds enough on its own: take across all of them.
+    rows = list(
+        StockSlot.objects.select_for_update()
+        .filter(item_id=item_id).order_by('slot')
+    )
+    if sum(row.quantity for row in rows) < quantity:
+        return False
+    for row in rows:
+        taken = min(row.quantity, quantity)
+        row.quantity -= taken
+        quantity -= taken
+    StockSlot.objects.bulk_update(rows, ['quantity'])
+    return True
+
+
+def _spread(rows, total):
+    share, extra = divmod(total, len(rows))
+    for position, row in enumerate(rows):
+        row.quantity = share + (1 if position < extra else 0)
+
+
+def fold(item_id, slots=None):
+    """
+    Saves what checkouts took out of a sharded item's slots to its stock
+    at the default location and its total, and spreads that stock evenly
+    over the slots again, resized to ``slots`` when given. Returns the
+    item's total stock.
+    """
+    with transaction.atomic():
+        counter = ShardedStock.objects.select_for_update().get(
+            item_id=item_id
+        )
+        item = Item.objects.select_for_update().get(pk=item_id)
+        location_id = default_location_id()
+        add_to_location(item_id, location_id, 0)
+        row = LocationStock.objects.select_for_update().get(
+            item_id=item_id, location_id=location_id
+        )
+        rows = list(
+            StockSlot.objects.select_for_update()
+            .filter(item_id=item_id).order_by('slot')
+        )
+        sold = counter.folded_quantity - sum(slot.quantity for slot in rows)
+        stock = max(0, row.quantity - sold)
+        take_lots(item_id, location_id, row.quantity - stock)
+
+        slots = slots or counter.slots
+        if len(rows) == slots:
+            _spread(rows, stock)
+            StockSlot.objects.bulk_update(rows, ['quantity'])
+        else:
+            StockSlot.objects.filter(item_id=item_id).delete()
+            rows = [StockSlot(item_id=item_id, slot=slot)
+                    for slot in range(slots)]
+            _spread(rows, stock)
+            StockSlot.objects.bulk_create(rows)
+
+        if row.quantity != stock:
+            set_total(item, item.quantity - (row.quantity - stock))
+            item.save(update_fields=['quantity'])
+            row.quantity = stock
+            row.save(update_fields=['quantity'])
+        counter.slots = slots
+        counter.folded_quantity = stock
+        counter.folded_at = timezone.now()
+        counter.save()
+    return item.quantity
+
+
+def fold_all():
+    """
+    Folds every sharded item. Returns the number folded.
+    """
+    item_ids = list(ShardedStock.objects.values_list('item_id', flat=True))
+    for item_id in item_ids:
+        fold(item_id)
+    return len(item_ids)
+
+
+def shard(item_id, slots):
+    """
+    Splits an item's stock across ``slots`` rows, or resizes an already
+    sharded item's.
+    """
+    with transaction.atomic():
+        # Nothing is in the slots of an item not sharded yet.
+        ShardedStock.objects.get_or_create(
+            item_id=item_id, defaults={'slots': slots}
+        )
+        return fold(item_id, slots)
+
+
+def unshard(item_id):
+    """
+    Moves a sharded item's stock back to its default location row.
+    """
+    with transaction.atomic():
+        total = fold(item_id)
+        StockSlot.objects.filter(item_id=item_id).delete()
+        ShardedStock.objects.filter(item_id=item_id).delete()
+    return total
@@ -0,0 +1,86 @@
+"""
+Module: store.tasks
+
+Background tasks and periodic jobs of the store app, run by
+``manage.py runworker``.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.utils import timezone
+
+from tasks.registry import task
+from tasks.scheduler import periodic
+from .lots import expiring_lots
+from .stock import fold_all
+
+logger = logging.getLogger(__name__)
+
+# How far ahead the expiry scan looks, in days.
+EXPIRY_WARNING_DAYS = 7
+
+
+@task(unique=True, retry_delay=300)
+def low_stock_alert():
+    """
+    Emails the list of items running low, at most once an hour (see
+    store.views.LOW_STOCK_ALERT_INTERVAL).
+    """
+    # Imported here so that loading tasks does not load the views.
+    from .views import notify_low_quantity_items
+    notify_low_quantity_items()
+
+
+@periodic('0 8-20 * * *')
+def low_stock_digest():
+    """
+    Queues the low-stock email every hour of the shop day.
+    """
+    low_stock_alert.delay()
+
+
+@periodic('15 6 * * *')
+def expiring_items_scan():
+    """
+    Logs the stock lots that have expired or expire within
+    ``EXPIRY_WARNING_DAYS`` days and still have stock, and returns how
+    many there are. Reads the partial expiry index on lots with stock
+    left rather than scanning the items.
+    """
+    now = timezone.now()
+    lots = list(expiring_lots(now + timedelta(days=EXPIRY_WARNING_DAYS)))
+    expired = [_describe(lot) for lot in lots if lot.expires_at <= now]
+    expiring = [_describe(lot) for lot in lots if lot.expires_at > now]
+    if expired:
+        logger.warning('Expired stock: %s', ', '.join(expired))
+    if expiring:
+        logger.warning('Stock expiring within %d days: %s',
+                       EXPIRY_WARNING_DAYS, ', '.join(expiring))
+    return {'expired': len(expired), 'expiring': len(expiring)}
+
+
+def _describe(lot):
+    return (
+        f'{lot.quantity} x {lot.item.name} at {lot.location.name} '
+        f'({lot.expires_at:%Y-%m-%d})'
+    )
+
+
+@periodic('*/5 * * * *', lease=300)
+def warm_dashboard_cache():
+    """
+    Recomputes the dashboard's cached widgets so that page views find
+    them fresh.
+    """
+    from .views import warm_dashboard_widgets
+    return warm_dashboard_widgets()
+
+
+@periodic('* * * * *', lease=60)
+def fold_stock_slots():
+    """
+    Saves the stock of sharded items, spread over their slots, to their
+    rows and evens the slots out again.
+    """
+    return {'folded': fold_all()}
@@ -1,3 +1,581 @@
-from django.test import TestCase
+import shutil
+import sys
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Customer, Vendor
+from outbox.models import OutboxEvent
+from outbox.tasks import compact_outbox
+from transactions.models import DailyItemSales, Purchase, Sale, SaleDetail
+from .dataset import DatasetGenerator
+from .locations import (
+    default_location_id, low_stock_at, rebuild_totals, transfer,
+)
+from .models import (
+    Category, Delivery, Item, ItemBarcode, Location, LocationStock,
+    ShardedStock, StockLot, StockSlot, StockTransfer,
+)
+from .scan import _lookup, scan
+from .stock import fold, shard, unshard
+from .tasks import expiring_items_scan, fold_stock_slots
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Base class asserting that a page issues the same number of queries
+    however many rows it displays.
+    """
+    row_counts = (10, 1000)
+
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='staff')
+        self.client.force_login(self.user)
+
+    def assertQueryBudget(self, url, queries, create_rows):
+        """
+        Grows the table to each size in ``row_counts`` and checks the page
+        at ``url`` issues exactly ``queries`` queries.
+        """
+        created = 0
+        for rows in self.row_counts:
+            with self.subTest(rows=rows):
+                create_rows(rows - created)
+                created = rows
+                with self.assertNumQueries(queries):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+
+class StoreQueryBudgetTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Groceries')
+        self.vendor = Vendor.objects.create(name='Acme')
+
+    def create_items(self, count):
+        start = Item.objects.count()
+        return Item.objects.bulk_create(
+            Item(
+                name=f'Item {start + i}',
+                description='',
+                category=self.category,
+                vendor=self.vendor,
+                quantity=50,
+            )
+            for i in range(count)
+        )
+
+    def create_deliveries(self, count):
+        items = self.create_items(count)
+        Delivery.objects.bulk_create(
+            Delivery(item=item, customer_name='Jane', date='2025-01-01T00:00Z')
+            for item in items
+        )
+
+    def test_product_list(self):
+        self.assertQueryBudget(
+            reverse('productslist'), 5, self.create_items
+        )
+
+    def test_product_list_export(self):
+        self.assertQueryBudget(
+            reverse('productslist') + '?_export=csv', 4, self.create_items
+        )
+
+    def test_item_search(self):
+        self.assertQueryBudget(
+            reverse('item_search_list_view') + '?q=Item', 5,
+            self.create_items
+        )
+
+    def test_delivery_list(self):
+        self.assertQueryBudget(
+            reverse('deliveries'), 4, self.create_deliveries
+        )
+
+
+class DatasetGeneratorTests(TestCase):
+    sizes = dict(
+        categories=3, vendors=4, items=30, customers=10, sales=200, lines=3,
+        purchases=20, deliveries=10, invoices=5, bills=5,
+    )
+
+    def generate(self):
+        return DatasetGenerator(seed=7, days=30, end_date=date(2026, 1, 31),
+                                batch_size=64).generate(**self.sizes)
+
+    def snapshot(self):
+        return list(SaleDetail.objects.order_by('id').values_list(
+            'sale__date_added', 'item__name', 'quantity', 'total_detail',
+        ))
+
+    def test_counts_and_rollup(self):
+        counts = self.generate()
+        self.assertEqual(Item.objects.count(), 30)
+        self.assertEqual(Sale.objects.count(), 200)
+        self.assertEqual(SaleDetail.objects.count(), counts['sale lines'])
+        self.assertEqual(
+            sum(DailyItemSales.objects.values_list('quantity', flat=True)),
+            sum(SaleDetail.objects.values_list('quantity', flat=True)),
+        )
+        sale = Sale.objects.create(customer=Customer.objects.first())
+        self.assertEqual(sale.id, 201)
+
+    def test_same_seed_same_rows(self):
+        self.generate()
+        first = self.snapshot()
+        for model in (SaleDetail, Sale, DailyItemSales, Item):
+            model.objects.all().delete()
+        self.generate()
+        self.assertEqual(
+            self.snapshot(), first
+        )
+
+
+class StartupBudgetTests(SimpleTestCase):
+    def test_no_heavy_imports_at_startup(self):
+        """
+        Booting a worker must not import NLP, plotting or Excel libraries.
+        Timing budgets are left generous here; CI runs the command with the
+        real ones.
+        """
+        call_command(
+            'startup_benchmark', max_startup_ms=60000, max_rss_mb=4096,
+            stdout=StringIO()
+        )
+
+
+class CatalogSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cashier', password='pass')
+        self.client.force_login(self.user)
+        self.food = Category.objects.create(name='Food')
+        self.rice = Item.objects.create(name='Rice', description='',
+                                        category=self.food, price=2,
+                                        quantity=30)
+        self.salt = Item.objects.create(name='Salt', description='',
+                                        category=self.food, price=1,
+                                        quantity=10)
+
+    def sync(self, since=None, headers=None, **params):
+        if since is not None:
+            params['since'] = since
+        return self.client.get(reverse('catalog-sync'), params,
+                               headers=headers)
+
+    def test_snapshot_then_deltas(self):
+        full = self.sync().json()
+        self.assertEqual(full['mode'], 'full')
+        self.assertEqual(full['fields'],
+                         ['id', 'name', 'category', 'price', 'quantity'])
+        self.assertEqual(full['items'], [
+            [self.rice.pk, 'Rice', 'Food', 2.0, 30],
+            [self.salt.pk, 'Salt', 'Food', 1.0, 10],
+        ])
+
+        unchanged = self.sync(full['version']).json()
+        self.assertEqual(
+            (unchanged['mode'], unchanged['items'], unchanged['deleted']),
+            ('delta', [], []),
+        )
+        self.assertEqual(unchanged['version'], full['version'])
+
+        self.rice.price = 3
+        self.rice.save()
+        salt_id = self.salt.pk
+        self.salt.delete()
+        delta = self.sync(full['version']).json()
+        self.assertEqual(delta['items'], [[self.rice.pk, 'Rice', 'Food',
+                                           3.0, 30]])
+        self.assertEqual(delta['deleted'], [salt_id])
+
+        self.food.name = 'Groceries'
+        self.food.save()
+        delta = self.sync(delta['version']).json()
+        self.assertEqual(delta['items'], [[self.rice.pk, 'Rice',
+                                           'Groceries', 3.0, 30]])
+
+    def test_delta_queries_do_not_grow_with_the_catalog(self):
+        version = self.sync().json()['version']
+        Item.objects.bulk_create(
+            Item(name=f'Bulk {number}', description='', category=self.food)
+            for number in range(200)
+        )
+        self.rice.quantity = 29
+        self.rice.save()
+        with self.assertNumQueries(5):
+            delta = self.sync(version).json()
+        self.assertEqual(len(delta['items']), 1)
+
+    @override_settings(EVENTS_COMPACT_AFTER=0, EVENTS_RETENTION=3600)
+    def test_expired_versions_get_a_snapshot(self):
+        version = self.sync().json()['version']
+        self.rice.save()
+        OutboxEvent.objects.update(
+            created_at=timezone.now() - timedelta(hours=2)
+        )
+        compact_outbox()
+        response = self.sync(version).json()
+        self.assertEqual(response['mode'], 'full')
+        self.assertEqual(len(response['items']), 2)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.sync('soon').status_code, 400)
+        with mock.patch.dict(sys.modules, {'msgpack': None}):
+            self.assertEqual(self.sync(format='msgpack').status_code, 406)
+            # Clients that merely accept MessagePack get JSON.
+            response = self.sync(headers={'Accept': 'application/msgpack'})
+            self.assertEqual(response['Content-Type'], 'application/json')
+        self.client.logout()
+        self.assertEqual(self.sync().status_code, 302)
+
+
+class ScanTests(TestCase):
+    def setUp(self):
+        # Scans are only memoized over a cache every process shares.
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        shared = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory,
+        }})
+        shared.enable()
+        self.addCleanup(shared.disable)
+        _lookup.cache_clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item = Item.objects.create(
+                name='Cola', description='', sku='COLA-330', price=1.5,
+                quantity=40, category=Category.objects.create(name='Drinks'),
+            )
+            # A UPC-A label.
+            ItemBarcode.objects.create(item=self.item, code='036000291452')
+
+    def test_codes_resolve_to_the_sale_payload(self):
+        # The same product's EAN-13 and the SKU resolve too.
+        for code in ('036000291452', '0036000291452', ' COLA-330 '):
+            payload = scan(code)
+            self.assertEqual((payload['id'], payload['name'], payload['price'],
+                              payload['quantity']),
+                             (self.item.pk, 'Cola', 1.5, 1))
+        self.assertIsNone(scan('12345'))
+        self.assertEqual(ItemBarcode.objects.get().code, '00036000291452')
+
+    def test_invalid_gtins_are_rejected(self):
+        barcode = ItemBarcode(item=self.item, code='036000291453')
+        with self.assertRaises(ValidationError):
+            barcode.full_clean()
+        duplicate = ItemBarcode(item=self.item, code='0036000291452')
+        with self.assertRaises(ValidationError):
+            duplicate.full_clean()
+
+    def test_repeat_scans_skip_the_database_until_the_item_changes(self):
+        scan('036000291452')
+        with self.assertNumQueries(0):
+            scan('036000291452')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.quantity = 39
+            self.item.save()
+        with self.assertNumQueries(0):
+            scan('036000291452')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.price = 2
+            self.item.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(scan('036000291452')['price'], 2)
+
+    def test_process_local_caches_scan_the_database_every_time(self):
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }}):
+            scan('036000291452')
+            with self.assertNumQueries(1):
+                scan('036000291452')
+
+    def test_bulk_writes_expire_scans_unless_only_stock_changes(self):
+        items = Item.objects.filter(pk=self.item.pk)
+        scan('COLA-330')
+        with self.captureOnCommitCallbacks(execute=True):
+            items.update(quantity=F('quantity') - 1)
+            Item.objects.bulk_update(list(items), ['quantity'])
+        with self.assertNumQueries(0):
+            scan('COLA-330')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            items.update(price=3)
+        self.assertEqual(scan('COLA-330')['price'], 3)
+
+        item = items.get()
+        item.name = 'Cola Zero'
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.bulk_update([item], ['name'])
+        self.assertEqual(scan('COLA-330')['name'], 'Cola Zero')
+
+    def test_endpoint(self):
+        self.client.force_login(User.objects.create_user('till', password='x'))
+        response = self.client.get(reverse('item-scan', args=['COLA-330']))
+        self.assertEqual(response.json()['name'], 'Cola')
+        response = self.client.get(reverse('item-scan', args=['nothing']))
+        self.assertEqual(response.status_code, 404)
+
+
+class ShardedStockTests(TestCase):
+    def setUp(self):
+        from transactions.services import create_sale
+        self.create_sale = create_sale
+        self.customer = Customer.objects.create(first_name='Ada',
+                                                last_name='L')
+        self.item = Item.objects.create(
+            name='Promo', description='', quantity=10, price=1,
+            category=Category.objects.create(name='Deals'),
+        )
+
+    def sell(self, *quantities):
+        return self.create_sale({'customer': self.customer}, [
+            {'id': self.item.pk, 'price': 1, 'quantity': quantity,
+             'total_item': quantity}
+            for quantity in quantities
+        ])
+
+    def slots(self):
+        return list(StockSlot.objects.filter(item=self.item)
+                    .order_by('slot').values_list('quantity', flat=True))
+
+    def test_sales_take_from_the_slots(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            shard(self.item.pk, 4)
+        self.assertEqual(self.slots(), [3, 3, 2, 2])
+
+        self.sell(2)
+        self.assertEqual(sum(self.slots()), 8)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 10)
+
+        # More than any one slot holds.
+        self.sell(3, 2)
+        self.assertEqual(sum(self.slots()), 3)
+        with self.assertRaises(ValueError):
+            self.sell(4)
+        self.assertEqual(sum(self.slots()), 3)
+
+        self.assertEqual(fold_stock_slots(), {'folded': 1})
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 3)
+        self.assertEqual(self.slots(), [1, 1, 1, 0])
+
+    def test_writes_to_the_row_count_at_the_next_fold(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            shard(self.item.pk, 4)
+        self.sell(4)
+        # A purchase or an edit adds to the row.
+        self.item.quantity += 5
+        self.item.save()
+        self.assertEqual(fold(self.item.pk), 11)
+        self.assertEqual(unshard(self.item.pk), 11)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 11)
+        self.assertFalse(StockSlot.objects.exists())
+
+    def test_checkouts_see_unshards_from_other_processes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            shard(self.item.pk, 4)
+        self.sell(1)
+        # Another process's commit, with no cache invalidation to see here.
+        unshard(self.item.pk)
+        self.sell(2)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 7)
+
+    def test_lines_of_one_item_share_its_stock(self):
+        with self.assertRaises(ValueError):
+            self.sell(6, 6)
+        self.sell(6, 4)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 0)
+
+
+class LocationStockTests(TestCase):
+    def setUp(self):
+        from transactions.services import create_sale
+        self.create_sale = create_sale
+        self.customer = Customer.objects.create(first_name='Ada',
+                                                last_name='L')
+        self.main = Location.objects.get(pk=default_location_id())
+        self.warehouse = Location.objects.create(name='Warehouse',
+                                                 kind=Location.WAREHOUSE)
+        self.item = Item.objects.create(
+            name='Flour', description='', quantity=10, price=1,
+            category=Category.objects.create(name='Baking'),
+        )
+
+    def stock(self):
+        self.item.refresh_from_db()
+        rows = dict(LocationStock.objects.filter(item=self.item)
+                    .values_list('location__name', 'quantity'))
+        return self.item.quantity, rows
+
+    def sell(self, quantity, location=None):
+        return self.create_sale(
+            {'customer': self.customer,
+             'location_id': location.pk if location else None},
+            [{'id': self.item.pk, 'price': 1, 'quantity': quantity,
+              'total_item': quantity}],
+        )
+
+    def test_direct_writes_go_to_the_default_location(self):
+        self.assertEqual(self.stock(), (10, {'Main store': 10}))
+        self.item.quantity = 15
+        self.item.save()
+        self.assertEqual(self.stock(), (15, {'Main store': 15}))
+
+    def test_purchases_sales_and_transfers_keep_the_total(self):
+        Purchase.objects.create(
+            item=self.item, vendor=Vendor.objects.create(name='Mill'),
+            quantity=20, price=1, location=self.warehouse,
+        )
+        self.assertEqual(self.stock(),
+                         (30, {'Main store': 10, 'Warehouse': 20}))
+
+        sale = self.sell(4, self.warehouse)
+        self.assertEqual(sale.location, self.warehouse)
+        self.assertEqual(self.sell(1).location, self.main)
+        self.assertEqual(self.stock(),
+                         (25, {'Main store': 9, 'Warehouse': 16}))
+        # Enough in total, not at the location.
+        with self.assertRaises(ValueError):
+            self.sell(10)
+
+        moved = transfer(self.item.pk, self.warehouse.pk, self.main.pk, 6,
+                         note='Restock')
+        self.assertEqual(StockTransfer.objects.get(), moved)
+        self.assertEqual(self.stock(),
+                         (25, {'Main store': 15, 'Warehouse': 10}))
+        with self.assertRaises(ValueError):
+            transfer(self.item.pk, self.warehouse.pk, self.main.pk, 11)
+        with self.assertRaises(Location.DoesNotExist):
+            self.create_sale({'customer': self.customer, 'location_id': 0},
+                             [])
+
+    def test_low_stock_by_location(self):
+        transfer(self.item.pk, self.main.pk, self.warehouse.pk, 10)
+        self.assertEqual(
+            [row.item for row in low_stock_at(self.main.pk)], [self.item]
+        )
+
+    def test_rebuild_totals(self):
+        Item.objects.filter(pk=self.item.pk).update(quantity=99)
+        self.assertEqual(rebuild_totals(), 1)
+        self.assertEqual(self.stock(), (10, {'Main store': 10}))
+
+    def test_sharded_items_sell_from_slots_at_the_default_location(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            shard(self.item.pk, 2)
+        transfer(self.item.pk, self.main.pk, self.warehouse.pk, 4)
+        self.sell(3)
+        self.sell(2, self.warehouse)
+        self.assertEqual(self.stock(),
+                         (8, {'Main store': 6, 'Warehouse': 2}))
+        fold(self.item.pk)
+        self.assertEqual(self.stock(),
+                         (5, {'Main store': 3, 'Warehouse': 2}))
+        self.assertEqual(sum(StockSlot.objects.values_list('quantity',
+                                                           flat=True)), 3)
+
+
+class StockLotTests(TestCase):
+    def setUp(self):
+        from transactions.services import create_sale, sync_sales
+        self.create_sale = create_sale
+        self.sync_sales = sync_sales
+        self.customer = Customer.objects.create(first_name='Ada',
+                                                last_name='L')
+        self.vendor = Vendor.objects.create(name='Dairy Co')
+        # Two units from before lots, which sell last.
+        self.item = Item.objects.create(
+            name='Yogurt', description='', quantity=2, price=1,
+            category=Category.objects.create(name='Dairy'),
+        )
+        self.now = timezone.now()
+        self.late = self.receive(5, days=20, lot_number='B-late')
+        self.soon = self.receive(3, days=3, lot_number='B-soon')
+
+    def receive(self, quantity, days, **fields):
+        purchase = Purchase.objects.create(
+            item=self.item, vendor=self.vendor, quantity=quantity, price=1,
+            expiry_date=self.now + timedelta(days=days), **fields,
+        )
+        return purchase.lot
+
+    def left(self):
+        return [
+            (lot.code, lot.quantity) for lot in
+            StockLot.objects.filter(item=self.item).order_by('expires_at')
+        ]
+
+    def test_purchases_are_received_as_lots(self):
+        self.assertEqual(self.left(), [('B-soon', 3), ('B-late', 5)])
+        self.assertEqual(self.late.received_quantity, 5)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 10)
+
+    def test_sales_take_the_first_expiring_lots(self):
+        sale = self.create_sale({'customer': self.customer}, [
+            {'id': self.item.pk, 'price': 1, 'quantity': 2,
+             'total_item': 2},
+            {'id': self.item.pk, 'price': 1, 'quantity': 2,
+             'total_item': 2},
+        ])
+        first, second = sale.saledetail_set.order_by('pk')
+        self.assertEqual(list(first.lots.values_list('lot__code', 'quantity')),
+                         [('B-soon', 2)])
+        self.assertEqual(
+            list(second.lots.order_by('pk')
+                 .values_list('lot__code', 'quantity')),
+            [('B-soon', 1), ('B-late', 1)],
+        )
+        self.assertEqual(self.left(), [('B-soon', 0), ('B-late', 4)])
+
+        # Lots run out before untracked stock does.
+        [result] = self.sync_sales([{
+            'client_id': 'a', 'timestamp': self.now.isoformat(),
+            'customer': self.customer.pk, 'sub_total': 6,
+            'grand_total': 6, 'amount_paid': 6, 'amount_change': 0,
+            'items': [{'id': self.item.pk, 'price': 1, 'quantity': 6,
+                       'total_item': 6}],
+        }])
+        self.assertEqual(result['status'], 'created')
+        self.assertEqual(self.left(), [('B-soon', 0), ('B-late', 0)])
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 0)
+
+    def test_transfers_and_write_offs_take_the_first_expiring_lots(self):
+        kiosk = Location.objects.create(name='Kiosk')
+        transfer(self.item.pk, default_location_id(), kiosk.pk, 4)
+        moved = StockLot.objects.filter(location=kiosk).order_by('expires_at')
+        self.assertEqual([(lot.code, lot.quantity) for lot in moved],
+                         [('B-soon', 3), ('B-late', 1)])
+        self.assertEqual(moved[0].expires_at, self.soon.expires_at)
+
+        self.item.refresh_from_db()
+        self.item.quantity -= 2
+        self.item.save()
+        self.assertEqual(
+            StockLot.objects.get(location_id=default_location_id(),
+                                 code='B-late').quantity, 2,
+        )
+
+    def test_expiry_scan(self):
+        self.receive(1, days=-1)
+        self.assertEqual(expiring_items_scan(),
+                         {'expired': 1, 'expiring': 1})
@@ -18,6 +18,8 @@ from .views import (
     DeliveryUpdateView,
     DeliveryDeleteView,
     get_items_ajax_view,
+    catalog_sync_view,
+    scan_item_view,
     CategoryListView,
     CategoryDetailView,
     CategoryCreateView,
@@ -98,6 +100,20 @@ urlpatterns = [
         name='get_items'
     ),
 
+    # Barcode and SKU scans
+    path(
+        'scan/<str:code>/',
+        scan_item_view,
+        name='item-scan'
+    ),
+
+    # Point-of-sale catalog
+    path(
+        'catalog/sync/',
+        catalog_sync_view,
+        name='catalog-sync'
+    ),
+
     # Category URLs
     path(
         'categories/',
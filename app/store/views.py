@@ -13,19 +13,16 @@ and querying functionalities.
 # Standard library imports
 import base64
 import io
-import spacy
-from transformers import pipeline
-from collections import Counter, defaultdict
+import logging
+from collections import Counter
 import operator
-from functools import reduce
-from statistics import LinearRegression
-from turtle import pd
+from functools import lru_cache, reduce
 
 # Django core imports
 from django.shortcuts import render
 from django.urls import reverse, reverse_lazy
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET, require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Q, Count, Sum
 
@@ -42,17 +39,43 @@ from django.views.generic.edit import FormMixin
 # Third-party packages
 from django_tables2 import SingleTableView
 import django_tables2 as tables
-from django_tables2.export.views import ExportMixin
-from wordcloud import WordCloud
 
 # Local app imports
+from InventoryMS.cache import cached, single_flight
+from monitoring.metrics import Gauge, Histogram
+from monitoring.mixins import TimedExportMixin
 from accounts.models import Customer, Profile, Vendor
-from bills.views import send_email_alert
-from transactions.models import Sale, SaleDetail
-from .models import Category, Item, Delivery
+from bills.views import ALERT_EMAILS, ALERT_EMAIL_SECONDS
+from transactions.models import DailyItemSales, Sale, SaleDetail
+from outbox.feed import parse_cursor
+from tasks.models import Throttle
+from .catalog import changes, snapshot
+from .scan import scan
+from .models import LOW_STOCK_THRESHOLD, Category, Item, Delivery
 from .forms import ItemForm, CategoryForm, DeliveryForm
 from .tables import ItemTable
 
+logger = logging.getLogger(__name__)
+
+DASHBOARD_SECONDS = Histogram(
+    'inventory_dashboard_seconds', 'Time to render the dashboard, in seconds.'
+)
+DASHBOARD_WIDGET_SECONDS = Histogram(
+    'inventory_dashboard_widget_seconds',
+    'Time to recompute a cached dashboard widget, in seconds.',
+    ['widget'],
+)
+LOW_STOCK_ITEMS = Gauge(
+    'inventory_low_stock_items',
+    'Items at or below the low-stock threshold.',
+    lambda: Item.objects.filter(quantity__lte=LOW_STOCK_THRESHOLD).count(),
+)
+
+# Seconds between low-stock emails. A little under the hour of the hourly
+# digest (store.tasks.low_stock_digest), so that a digest run a few
+# seconds early is not throttled by the previous one.
+LOW_STOCK_ALERT_INTERVAL = 55 * 60
+
 # For SMTP Mail Server for Notify users
 import os
 import smtplib
@@ -60,17 +83,13 @@ import time
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
-from django.db.models.signals import post_migrate
-from django.dispatch import receiver
 from .models import Item
 
 
 
 @login_required
+@DASHBOARD_SECONDS.time()
 def dashboard(request):
-    send_email_alert()
-    print("Running low-quantity check on startup...")
-    notify_low_quantity_items()
     profiles = Profile.objects.all()
     Category.objects.annotate(nitem=Count("item"))
     items = Item.objects.all()
@@ -83,11 +102,9 @@ def dashboard(request):
     profiles_count = profiles.count()
 
     # Prepare data for charts
-    category_counts = Category.objects.annotate(
-        item_count=Count("item")
-    ).values("name", "item_count")
-    categories = [cat["name"] for cat in category_counts]
-    category_counts = [cat["item_count"] for cat in category_counts]
+    category_stats = single_flight(
+        'dashboard:categories', _category_stats, models_=[Category, Item]
+    )
 
     sale_dates = (
         Sale.objects.values("date_added__date")
@@ -98,8 +115,7 @@ def dashboard(request):
         date["date_added__date"].strftime("%Y-%m-%d") for date in sale_dates
     ]
     sale_dates_values = [float(date["total_sales"]) for date in sale_dates]
-    low_stock_threshold = 20  # threshold for low stock
-    low_stock_items = Item.objects.filter(quantity__lte=low_stock_threshold)
+    low_stock_items = Item.objects.filter(quantity__lte=LOW_STOCK_THRESHOLD)
     low_stock_items_names = [item.name for item in low_stock_items]
     low_stock_items_counts = [item.quantity for item in low_stock_items]
     duplicate_items = (
@@ -130,20 +146,6 @@ def dashboard(request):
         'title': 'Customer Loyalty Points Distribution',
         'subtitle': 'Loyalty points per customer'
     }
-    category_data = Category.objects.annotate(
-        total_price=Sum("item__price"),
-        total_quantity=Sum("item__quantity")
-    ).values("name", "total_price", "total_quantity")
-    categories_names = [data["name"] for data in category_data]
-    total_prices = [data["total_price"] for data in category_data]
-    total_quantities = [data["total_quantity"] for data in category_data]
-    category_data = Category.objects.annotate(
-        total_price=Sum("item__price"),
-        total_quantity=Sum("item__quantity")
-    ).values("name", "total_price", "total_quantity")
-    categories_names = [data["name"] for data in category_data]
-    total_prices = [data["total_price"] for data in category_data]
-    total_quantities = [data["total_quantity"] for data in category_data]
     tips = []
     tips_labels = []
     tips_importance = []
@@ -241,56 +243,41 @@ def dashboard(request):
     ]
     tips_importance = [80, 70, 90, 80, 100, 70, 90, 60, 80, 90]
     sales_trend_data = (
-        SaleDetail.objects.filter(item__in=items_in_sales)
-        .values("item__name", "sale__date_added__date")
+        DailyItemSales.objects.filter(quantity__gt=0)
+        .values("item__name", "date")
         .annotate(total_quantity=Sum("quantity"))
-        .order_by("sale__date_added__date")
+        .order_by("date")
     )
     sales_trend_labels = [
-        entry["sale__date_added__date"].strftime("%Y-%m-%d") for entry in sales_trend_data
+        entry["date"].strftime("%Y-%m-%d") for entry in sales_trend_data
     ]
     sales_trend_values = [entry["total_quantity"] for entry in sales_trend_data]
     items_in_sales = Item.objects.filter(
         id__in=SaleDetail.objects.values('item').distinct()
     )
-    sale_details = SaleDetail.objects.all()
-    product_sales = defaultdict(list)
-    for sale in sale_details:
-        product_sales[sale.item.name].append(sale.quantity)
+    product_sales = (
+        DailyItemSales.objects.values("item__name")
+        .annotate(total_sales=Sum("quantity"))
+        .filter(total_sales__gt=0)
+        .order_by()
+    )
     predicted_sales = []
-    for product_name, quantities in product_sales.items():
-        total_sales = sum(quantities)
+    for product in product_sales:
+        total_sales = product["total_sales"]
         predictions = [total_sales + i for i in range(2, 5)]
         predicted_sales.append({
-            "product_name": product_name,
+            "product_name": product["item__name"],
             "current_sales": total_sales,
             "future_sales": predictions,
         })
-    nlp = spacy.load("en_core_web_sm")
-    summarizer = pipeline("summarization")
-    sale_details = SaleDetail.objects.all()
-    item_names = [sale.item.name for sale in sale_details]
-    name_analysis = []
-    for name in item_names:
-        doc = nlp(name)
-        name_analysis.append({
-            "name": name,
-            "tokens": [token.text for token in doc],
-            "pos_tags": [token.pos_ for token in doc],
-            "entities": [(ent.text, ent.label_) for ent in doc.ents],
-        })
-    long_names = [name for name in item_names if len(name) > 20]
-    summarized_names = summarizer(". ".join(long_names), max_length=50, min_length=10, do_sample=False)
-    name_embeddings = [
-        {"name": name, "embedding": [token.vector for token in nlp(name)]} for name in item_names
-    ]
-    product_names = [sale.item.name for sale in SaleDetail.objects.all()]
-    word_frequencies = Counter(product_names)
-    wordcloud = WordCloud(width=800, height=400, background_color="white").generate_from_frequencies(word_frequencies)
-    image_io = io.BytesIO()
-    wordcloud.to_image().save(image_io, format='PNG')
-    image_io.seek(0)
-    wordcloud_image_data = base64.b64encode(image_io.getvalue()).decode('utf-8')
+    name_analysis, summarized_names, name_embeddings = single_flight(
+        'dashboard:name-insights', _item_name_insights,
+        models_=[SaleDetail, Item]
+    )
+    wordcloud_image_data = single_flight(
+        'dashboard:wordcloud', _wordcloud_image_data,
+        models_=[SaleDetail, Item]
+    )
     context = {
         "items": items,
         "profiles": profiles,
@@ -302,17 +289,17 @@ def dashboard(request):
         "pending_delivery_count": pending_delivery_count,
         "sales": Sale.objects.all(),
         "customer_loyalty_data": customer_loyalty_data,
-        "categories": categories,
-        "category_counts": category_counts,
+        "categories": category_stats["categories"],
+        "category_counts": category_stats["category_counts"],
         "sale_dates_labels": sale_dates_labels,
         "sale_dates_values": sale_dates_values,
         "low_stock_items_names": low_stock_items_names,
         "low_stock_items_counts": low_stock_items_counts,
         "duplicate_products": first_duplicate_products,  # Add filtered duplicates to context
         "items_not_sold": items_not_sold,  # Add less sold items to the context
-        "categories_names": categories_names,
-        "total_prices": total_prices,
-        "total_quantities": total_quantities,
+        "categories_names": category_stats["categories_names"],
+        "total_prices": category_stats["total_prices"],
+        "total_quantities": category_stats["total_quantities"],
         "tips": tips,  # Add tips to context
         "tips_labels": tips_labels,
         "tips_importance": tips_importance,
@@ -329,7 +316,99 @@ def dashboard(request):
     }
     return render(request, "store/dashboard.html", context)
 
-class ProductListView(LoginRequiredMixin, ExportMixin, tables.SingleTableView):
+@DASHBOARD_WIDGET_SECONDS.time(widget='categories')
+def _category_stats():
+    category_counts = Category.objects.annotate(
+        item_count=Count("item")
+    ).values("name", "item_count")
+    category_data = Category.objects.annotate(
+        total_price=Sum("item__price"),
+        total_quantity=Sum("item__quantity")
+    ).values("name", "total_price", "total_quantity")
+    return {
+        "categories": [cat["name"] for cat in category_counts],
+        "category_counts": [cat["item_count"] for cat in category_counts],
+        "categories_names": [data["name"] for data in category_data],
+        "total_prices": [data["total_price"] for data in category_data],
+        "total_quantities": [data["total_quantity"] for data in category_data],
+    }
+
+
+@lru_cache(maxsize=None)
+def _nlp_models():
+    # spaCy and transformers take seconds and hundreds of MB to import, so
+    # only the dashboard pays for them, once per process.
+    import spacy
+    from transformers import pipeline
+
+    return spacy.load("en_core_web_sm"), pipeline("summarization")
+
+
+def warm_nlp_models():
+    """
+    Loads the dashboard's NLP models ahead of the first request. Called from
+    the gunicorn master so forked workers share them copy-on-write.
+    """
+    _nlp_models()
+
+
+def warm_dashboard_widgets():
+    """
+    Refreshes the dashboard's cached widgets, with the same keys the
+    dashboard reads. Run by the ``warm_dashboard_cache`` periodic job.
+    Returns the names of the widgets warmed.
+    """
+    single_flight(
+        'dashboard:categories', _category_stats, models_=[Category, Item]
+    )
+    single_flight(
+        'dashboard:name-insights', _item_name_insights,
+        models_=[SaleDetail, Item]
+    )
+    single_flight(
+        'dashboard:wordcloud', _wordcloud_image_data,
+        models_=[SaleDetail, Item]
+    )
+    return ['categories', 'name-insights', 'wordcloud']
+
+
+@DASHBOARD_WIDGET_SECONDS.time(widget='name-insights')
+def _item_name_insights():
+    nlp, summarizer = _nlp_models()
+    item_names = list(
+        SaleDetail.objects.values_list("item__name", flat=True)
+    )
+    name_analysis = []
+    for name in item_names:
+        doc = nlp(name)
+        name_analysis.append({
+            "name": name,
+            "tokens": [token.text for token in doc],
+            "pos_tags": [token.pos_ for token in doc],
+            "entities": [(ent.text, ent.label_) for ent in doc.ents],
+        })
+    long_names = [name for name in item_names if len(name) > 20]
+    summarized_names = summarizer(". ".join(long_names), max_length=50, min_length=10, do_sample=False)
+    name_embeddings = [
+        {"name": name, "embedding": [token.vector for token in nlp(name)]} for name in item_names
+    ]
+    return name_analysis, summarized_names, name_embeddings
+
+
+@DASHBOARD_WIDGET_SECONDS.time(widget='wordcloud')
+def _wordcloud_image_data():
+    from wordcloud import WordCloud
+
+    product_names = SaleDetail.objects.values_list("item__name", flat=True)
+    word_frequencies = Counter(product_names)
+    wordcloud = WordCloud(width=800, height=400, background_color="white").generate_from_frequencies(word_frequencies)
+    image_io = io.BytesIO()
+    wordcloud.to_image().save(image_io, format='PNG')
+    image_io.seek(0)
+    return base64.b64encode(image_io.getvalue()).decode('utf-8')
+
+
+class ProductListView(LoginRequiredMixin, TimedExportMixin, tables.SingleTableView):
     """
     View class to display a list of products.
 
@@ -342,6 +421,7 @@ class ProductListView(LoginRequiredMixin, ExportMixin, tables.SingleTableView):
     """
 
     model = Item
+    queryset = Item.objects.select_related("category", "vendor")
     table_class = ItemTable
     template_name = "store/productslist.html"
     context_object_name = "items"
@@ -383,6 +463,7 @@ class ProductDetailView(LoginRequiredMixin, FormMixin, DetailView):
     """
 
     model = Item
+    queryset = Item.objects.select_related("category", "vendor")
     template_name = "store/productdetail.html"
 
     def get_success_url(self):
@@ -458,7 +539,7 @@ class ProductDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
 
 
 class DeliveryListView(
-    LoginRequiredMixin, ExportMixin, tables.SingleTableView
+    LoginRequiredMixin, TimedExportMixin, tables.SingleTableView
 ):
     """
     View class to display a list of deliveries.
@@ -471,6 +552,7 @@ class DeliveryListView(
     """
 
     model = Delivery
+    queryset = Delivery.objects.select_related("item__category")
     pagination = 10
     template_name = "store/deliveries.html"
     context_object_name = "deliveries"
@@ -615,25 +697,24 @@ class CategoryDeleteView(LoginRequiredMixin, DeleteView):
 def is_ajax(request):
     return request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest'
 
-# Store the last email timestamp in memory
-LAST_EMAIL_TIMESTAMP = None
-
+@ALERT_EMAIL_SECONDS.time(alert='low_stock')
 def notify_low_quantity_items():
     """
     Notify about items with low quantity (less than 15).
-    Sends email only if the last email was sent more than 60 minutes ago.
+    Sends email only if the last email was sent more than
+    LOW_STOCK_ALERT_INTERVAL seconds ago, by any process.
     """
-    global LAST_EMAIL_TIMESTAMP  # Use global to access and update the timestamp
-
-    current_time = time.time()
-    if LAST_EMAIL_TIMESTAMP:
-        if current_time - LAST_EMAIL_TIMESTAMP < 3600:  # 60 minutes
-            print("Email was sent less than an hour ago. Skipping notification.")
-            return
+    if not Throttle.acquire('low_stock_alert', LOW_STOCK_ALERT_INTERVAL):
+        logger.debug("Email was sent less than %s seconds ago. Skipping notification.",
+                     LOW_STOCK_ALERT_INTERVAL)
+        ALERT_EMAILS.inc(alert='low_stock', result='throttled')
+        return
 
     low_quantity_items = Item.objects.filter(quantity__lt=15)
     if not low_quantity_items.exists():
-        print("No items with low quantity found.")
+        logger.debug("No items with low quantity found.")
+        ALERT_EMAILS.inc(alert='low_stock', result='nothing_to_send')
+        Throttle.release('low_stock_alert')
         return
 
     # Email configuration
@@ -691,6 +772,7 @@ def notify_low_quantity_items():
     </html>
     """
 
+    sent = False
     try:
         # Create SMTP connection
         with smtplib.SMTP(smtp_server, smtp_port) as server:
@@ -715,23 +797,24 @@ def notify_low_quantity_items():
 
             # Send the email
             server.sendmail(sender_email, recipient_email, msg.as_string())
-            print("Email sent successfully.")
-
-            # Update the in-memory timestamp
-            LAST_EMAIL_TIMESTAMP = current_time
+            logger.info("Email sent successfully.")
+            ALERT_EMAILS.inc(alert='low_stock', result='sent')
+            sent = True
 
     except smtplib.SMTPException as e:
-        print(f"Error sending email: {e}")
+        logger.error("Error sending email: %s", e)
+        ALERT_EMAILS.inc(alert='low_stock', result='failed')
+        # Fail the task so that it is retried.
+        raise
+    finally:
+        if not sent:
+            # Let the next attempt send it.
+            Throttle.release('low_stock_alert')
 
+def _search_items_json(term):
+    items = Item.objects.filter(name__icontains=term).select_related('category')
+    return [item.to_json() for item in items[:10]]
 
-# Automatically run notify_low_quantity_items() on startup
-@receiver(post_migrate)
-def check_low_quantity(sender, **kwargs):
-    """
-    Signal to automatically check for low-quantity items after migrations.
-    """
-    print("Running low-quantity check...")
-    notify_low_quantity_items()
 
 @csrf_exempt
 @require_POST
@@ -740,13 +823,68 @@ def get_items_ajax_view(request):
     if is_ajax(request):
         try:
             term = request.POST.get("term", "")
-            data = []
-
-            items = Item.objects.filter(name__icontains=term)
-            for item in items[:10]:
-                data.append(item.to_json())
+            data = cached(
+                'get-items', [Item, Category],
+                lambda: _search_items_json(term), term
+            )
 
             return JsonResponse(data, safe=False)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     return JsonResponse({'error': 'Not an AJAX request'}, status=400)
+
+
+@require_GET
+@login_required
+def scan_item_view(request, code):
+    """
+    Returns the sale payload of the item with a scanned barcode or SKU,
+    in the shape ``get_items`` returns, or 404 for an unknown code.
+    """
+    item = scan(code)
+    if item is None:
+        return JsonResponse({'error': 'Unknown code.'}, status=404)
+    return JsonResponse(item)
+
+
+MSGPACK_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+@require_GET
+@login_required
+def catalog_sync_view(request):
+    """
+    Returns the item catalog for point-of-sale clients::
+
+        GET /catalog/sync/                  full snapshot
+        GET /catalog/sync/?since=<version>  changes since a version
+
+    Items are rows of ``fields``; ``deleted`` lists removed item ids.
+    Clients keep ``version`` for their next call. When the changes since
+    a version were compacted away, the answer is a full snapshot
+    (``mode`` is ``full``) and replaces the client's catalog.
+
+    Sends MessagePack instead of JSON when asked for with ``Accept:
+    application/msgpack`` or ``?format=msgpack`` and the msgpack package
+    is installed.
+    """
+    since = request.GET.get('since', '')
+    try:
+        data = changes(parse_cursor(since)) if since else snapshot()
+    except ValueError:
+        return JsonResponse({'error': 'Invalid version.'}, status=400)
+
+    accept = request.headers.get('Accept', '')
+    if request.GET.get('format') == 'msgpack' or \
+            any(media_type in accept for media_type in MSGPACK_TYPES):
+        try:
+            import msgpack
+        except ImportError:
+            if request.GET.get('format') == 'msgpack':
+                return JsonResponse(
+                    {'error': 'MessagePack is not available.'}, status=406
+                )
+        else:
+            return HttpResponse(msgpack.packb(data),
+                                content_type='application/msgpack')
+    return JsonResponse(data, json_dumps_params={'separators': (',', ':')})
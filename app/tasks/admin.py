@@ -0,0 +1,51 @@
+from django.contrib import admin
+
+from .models import ScheduledJob, Task, Throttle
+
+
+class TaskAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for background tasks.
+    """
+    list_display = (
+        'name', 'status', 'attempts', 'max_attempts', 'run_after',
+        'started_at', 'finished_at',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    readonly_fields = ('locked_by', 'locked_until', 'result', 'error')
+    ordering = ('-created_at',)
+
+
+admin.site.register(Task, TaskAdmin)
+
+
+class ScheduledJobAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for periodic job schedules.
+    """
+    list_display = (
+        'name', 'schedule', 'next_run_at', 'last_status', 'last_duration',
+        'last_finished_at', 'runs',
+    )
+    list_filter = ('last_status',)
+    readonly_fields = (
+        'locked_by', 'locked_until', 'last_result', 'last_error',
+    )
+    ordering = ('name',)
+
+
+admin.site.register(ScheduledJob, ScheduledJobAdmin)
+
+
+class ThrottleAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for throttled actions; deleting one lets the
+    action run again right away.
+    """
+    list_display = ('name', 'last_run_at')
+    readonly_fields = ('name', 'last_run_at')
+    ordering = ('name',)
+
+
+admin.site.register(Throttle, ThrottleAdmin)
@@ -0,0 +1,74 @@
+"""
+Management command: jobs
+
+Lists the periodic jobs (see tasks.scheduler) with their schedule, next
+run and the outcome and duration of their last run, or runs one now.
+
+A job run here takes the same lease as the scheduler, so it never runs
+while a worker is already running it.
+
+Usage:
+    python manage.py jobs
+    python manage.py jobs run store.tasks.warm_dashboard_cache
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tasks.models import SUCCEEDED, ScheduledJob
+from tasks.scheduler import JOBS, acquire, run_job, sync_jobs
+
+
+class Command(BaseCommand):
+    help = 'List the periodic jobs, or run one now.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', nargs='?', default='list',
+                            choices=['list', 'run'])
+        parser.add_argument('job', nargs='?',
+                            help='Name of the job to run.')
+
+    def handle(self, *args, **options):
+        sync_jobs()
+        if options['action'] == 'list':
+            self.list_jobs()
+            return
+
+        job = JOBS.get(options['job'])
+        if job is None:
+            raise CommandError(
+                f"Unknown job {options['job']!r}. "
+                f"Jobs: {', '.join(sorted(JOBS))}"
+            )
+        owner = f'manage.py jobs run ({timezone.now():%Y-%m-%d %H:%M:%S})'
+        if not acquire(job, owner, force=True):
+            row = ScheduledJob.objects.get(name=job.name)
+            raise CommandError(
+                f'{job.name} is already running on {row.locked_by}.'
+            )
+        row = run_job(job, owner)
+        if row.last_status != SUCCEEDED:
+            raise CommandError(f'{job.name} failed:\n{row.last_error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{job.name} finished in {row.last_duration:.2f}s: '
+            f'{row.last_result}'
+        ))
+
+    def list_jobs(self):
+        rows = ScheduledJob.objects.filter(name__in=JOBS).order_by('name')
+        for row in rows:
+            last = 'never run'
+            if row.last_status:
+                last = (
+                    f'{row.last_status} in {row.last_duration:.2f}s at '
+                    f'{timezone.localtime(row.last_finished_at):%Y-%m-%d %H:%M}'
+                )
+            running = ''
+            if row.locked_until and row.locked_until > timezone.now():
+                running = f'  running on {row.locked_by}'
+            self.stdout.write(
+                f'{row.name}\n'
+                f'    {row.schedule:<16} next '
+                f'{timezone.localtime(row.next_run_at):%Y-%m-%d %H:%M}, '
+                f'last {last}{running}'
+            )
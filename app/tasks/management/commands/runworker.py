@@ -0,0 +1,112 @@
+"""
+Management command: runworker
+
+Runs queued background tasks (see tasks.registry) until stopped with
+SIGINT or SIGTERM, after which running tasks are allowed to finish.
+
+Each process runs --threads tasks at a time; --processes starts several
+worker processes for CPU-bound tasks. Run as many workers, on as many
+machines, as needed: tasks are claimed through the database, so each one
+runs once.
+
+Each process also runs the periodic job scheduler (see tasks.scheduler)
+unless --no-scheduler is given; leases keep every job to one run per slot.
+
+Metrics are shared with the web processes through METRICS_DIR; each
+process folds its values into the archive when it stops.
+
+Usage:
+    python manage.py runworker
+    python manage.py runworker --threads 8 --processes 2
+    python manage.py runworker --burst
+"""
+
+import multiprocessing
+import os
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from monitoring.metrics import REGISTRY, mark_process_dead
+from tasks.scheduler import Scheduler
+from tasks.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run background tasks from the database queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int,
+                            default=settings.TASKS_WORKER_THREADS,
+                            help='Tasks run at once by each process.')
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--poll-interval', type=float,
+                            default=settings.TASKS_POLL_INTERVAL,
+                            help='Seconds between checks of an empty queue.')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no task is due. Implies '
+                                 '--no-scheduler.')
+        parser.add_argument('--no-scheduler', action='store_true',
+                            help='Do not run periodic jobs.')
+
+    def handle(self, *args, **options):
+        worker_options = {
+            'threads': options['threads'],
+            'poll_interval': options['poll_interval'],
+            'burst': options['burst'],
+        }
+        schedule = not (options['burst'] or options['no_scheduler'])
+        if options['processes'] <= 1:
+            _run_worker(worker_options, schedule)
+            return
+
+        # Children must not share the parent's database connections.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        children = [
+            context.Process(
+                target=_run_worker, args=(worker_options, schedule)
+            )
+            for _ in range(options['processes'])
+        ]
+        for child in children:
+            child.start()
+
+        def forward(signum, frame):
+            for child in children:
+                if child.is_alive():
+                    child.terminate()
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for child in children:
+            child.join()
+        self.stdout.write(self.style.SUCCESS('All workers stopped.'))
+
+
+def _run_worker(options, schedule):
+    worker = Worker(**options)
+    scheduler = Scheduler(settings.TASKS_SCHEDULER_INTERVAL) \
+        if schedule else None
+
+    def stop(signum, frame):
+        worker.stop()
+        if scheduler is not None:
+            scheduler.stop()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    if scheduler is not None:
+        thread = threading.Thread(target=scheduler.run, name='scheduler')
+        thread.start()
+    try:
+        worker.run()
+        if scheduler is not None:
+            thread.join()
+    finally:
+        # Like gunicorn's worker_exit and child_exit hooks.
+        REGISTRY.flush()
+        mark_process_dead(os.getpid())
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.5 on 2026-10-19 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0002_scheduledjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Throttle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('last_run_at', models.DateTimeField()),
+            ],
+        ),
+    ]
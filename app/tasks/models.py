@@ -0,0 +1,183 @@
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+STATUS_CHOICES = [
+    (QUEUED, 'Queued'),
+    (RUNNING, 'Running'),
+    (SUCCEEDED, 'Succeeded'),
+    (FAILED, 'Failed'),
+]
+
+
+class TaskQuerySet(models.QuerySet):
+    def due(self, now=None):
+        """
+        Tasks a worker may take: queued ones whose time has come, and
+        running ones whose worker let the visibility timeout expire.
+        """
+        now = now or timezone.now()
+        return self.filter(
+            Q(status=QUEUED, run_after__lte=now)
+            | Q(status=RUNNING, locked_until__lt=now)
+        )
+
+    def claim(self, worker, limit, timeouts):
+        """
+        Marks up to ``limit`` due tasks as running for ``worker`` and
+        returns them. ``timeouts`` maps a task name to its visibility
+        timeout in seconds.
+
+        On PostgreSQL the candidates are selected with
+        ``FOR UPDATE SKIP LOCKED`` so concurrent workers never wait on each
+        other. SQLite has no row locks; there every claim is a
+        compare-and-set update that only succeeds if the task is still in
+        the state it was read in, so two workers can never both take it.
+        """
+        now = timezone.now()
+        claimed = []
+        with transaction.atomic():
+            candidates = list(
+                self.due(now)
+                .order_by('-priority', 'run_after', 'id')
+                .select_for_update(skip_locked=True)[:limit]
+            )
+            for task in candidates:
+                unchanged = self.filter(
+                    pk=task.pk, status=task.status, attempts=task.attempts
+                )
+                if task.attempts >= task.max_attempts:
+                    # Its last attempt outlived the visibility timeout.
+                    unchanged.update(
+                        status=FAILED, finished_at=now, locked_until=None,
+                        error='Visibility timeout expired on the last '
+                              'attempt.',
+                    )
+                    continue
+                locked_until = now + timedelta(
+                    seconds=timeouts.get(task.name, 300)
+                )
+                if unchanged.update(
+                    status=RUNNING, attempts=F('attempts') + 1,
+                    locked_by=worker, locked_until=locked_until,
+                    started_at=now,
+                ):
+                    task.status = RUNNING
+                    task.attempts += 1
+                    task.locked_by = worker
+                    task.locked_until = locked_until
+                    task.started_at = now
+                    claimed.append(task)
+        return claimed
+
+    def finished_before(self, moment):
+        return self.filter(
+            status__in=[SUCCEEDED, FAILED], finished_at__lt=moment
+        )
+
+
+class Task(models.Model):
+    """
+    A unit of background work: a registered task name and its arguments,
+    and, once run, its result or error.
+    """
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED
+    )
+    priority = models.SmallIntegerField(
+        default=0, help_text='Higher runs first.'
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['status', 'run_after'], name='task_due_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+
+class ScheduledJob(models.Model):
+    """
+    Schedule state of a periodic job (see tasks.scheduler): when it is next
+    due, who holds its lease, and how its last run went.
+    """
+    name = models.CharField(max_length=200, unique=True)
+    schedule = models.CharField(max_length=100)
+    next_run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_finished_at = models.DateTimeField(null=True, blank=True)
+    last_duration = models.FloatField(
+        null=True, blank=True, help_text='Seconds.'
+    )
+    last_status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, blank=True
+    )
+    last_result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    runs = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name} ({self.schedule})'
+
+
+class Throttle(models.Model):
+    """
+    When a rate-limited action, such as an alert email, last ran. Kept in
+    the database so that every web and worker process sees the same
+    throttle.
+    """
+    name = models.CharField(max_length=200, unique=True)
+    last_run_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.name} (last run {self.last_run_at})'
+
+    @classmethod
+    def acquire(cls, name, seconds):
+        """
+        Records ``name`` as run now and returns True, unless it already
+        ran less than ``seconds`` ago in any process. A compare-and-set
+        update, so of two processes asking at once only one gets it.
+        """
+        now = timezone.now()
+        cutoff = now - timedelta(seconds=seconds)
+        cls.objects.get_or_create(name=name, defaults={'last_run_at': cutoff})
+        return bool(
+            cls.objects.filter(name=name, last_run_at__lte=cutoff)
+            .update(last_run_at=now)
+        )
+
+    @classmethod
+    def release(cls, name):
+        """
+        Forgets the last run of ``name``, after it failed, so that a retry
+        is not throttled.
+        """
+        cls.objects.filter(name=name).delete()
@@ -0,0 +1,119 @@
+"""
+Module: tasks.registry
+
+The ``task`` decorator, which registers a function as a background task::
+
+    @task(max_attempts=5, retry_delay=60)
+    def send_receipt(sale_id):
+        ...
+
+    send_receipt.delay(sale.id)   # queued; a runworker process runs it
+    send_receipt(sale.id)         # still callable directly
+
+Arguments must be JSON-serializable, as must the return value to be kept
+as the task's result (anything else is stored as its ``repr``). Define
+tasks in an app's ``tasks.py`` so that workers import them at startup.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from monitoring.metrics import Counter, Gauge, Histogram
+from .models import QUEUED, Task
+
+REGISTRY = {}
+
+# Defined here rather than in tasks.worker so that web processes, which
+# serve /metrics, know them too.
+TASKS = Counter(
+    'tasks_total', 'Background task attempts, by task and result.',
+    ['task', 'result'],
+)
+TASK_SECONDS = Histogram(
+    'task_duration_seconds', 'Time to run a background task, in seconds.',
+    ['task'],
+)
+QUEUE_DEPTH = Gauge(
+    'tasks_queued', 'Background tasks waiting to run.',
+    lambda: Task.objects.filter(status=QUEUED).count(),
+)
+
+
+class TaskFunction:
+    """
+    A registered task. Calling it runs the function in the current
+    process; ``delay``/``enqueue`` queue it for a worker.
+    """
+
+    def __init__(self, func, name, max_attempts, retry_delay, timeout,
+                 priority, unique):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.priority = priority
+        self.unique = unique
+        self.__doc__ = func.__doc__
+        self.__wrapped__ = func
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return self.enqueue(args, kwargs)
+
+    def enqueue(self, args=(), kwargs=None, countdown=0, priority=None):
+        """
+        Queues the task to run ``countdown`` seconds from now and returns
+        its ``Task`` row. For unique tasks an identical task already
+        waiting in the queue is returned instead of adding another.
+
+        With ``TASKS_ALWAYS_EAGER`` the task runs right away and the
+        result is returned instead.
+        """
+        if settings.TASKS_ALWAYS_EAGER:
+            return self(*args, **(kwargs or {}))
+        fields = {'name': self.name, 'args': list(args),
+                  'kwargs': kwargs or {}}
+        if self.unique:
+            waiting = Task.objects.filter(status=QUEUED, **fields).first()
+            if waiting is not None:
+                return waiting
+        return Task.objects.create(
+            **fields,
+            priority=self.priority if priority is None else priority,
+            max_attempts=self.max_attempts,
+            run_after=timezone.now() + timedelta(seconds=countdown),
+        )
+
+    def retry_after(self, attempts):
+        """
+        Seconds to wait before the next attempt: ``retry_delay`` doubled
+        after each failure.
+        """
+        return self.retry_delay * 2 ** max(attempts - 1, 0)
+
+
+def task(func=None, *, name=None, max_attempts=3, retry_delay=30,
+         timeout=300, priority=0, unique=False):
+    """
+    Registers a function as a background task.
+
+    ``timeout`` is the visibility timeout in seconds: a task still running
+    after it is considered lost with its worker and handed to another one.
+    ``unique`` tasks are queued at most once while waiting.
+    """
+    def register(func):
+        task_name = name or f'{func.__module__}.{func.__qualname__}'
+        if task_name in REGISTRY:
+            raise ValueError(f'Duplicate task: {task_name}')
+        REGISTRY[task_name] = TaskFunction(
+            func, task_name, max_attempts, retry_delay, timeout, priority,
+            unique,
+        )
+        return REGISTRY[task_name]
+
+    return register(func) if func is not None else register
@@ -0,0 +1,287 @@
+"""
+Module: tasks.scheduler
+
+Periodic jobs on cron schedules::
+
+    @periodic('30 2 * * *')
+    def compact_daily_sales():
+        ...
+
+Every ``runworker`` process runs a ``Scheduler`` thread. Before running a
+due job a scheduler takes the job's lease, a compare-and-set update on
+its ``ScheduledJob`` row, so however many processes and machines run
+workers, each job runs once per slot. A job that outlives its lease may be
+started again elsewhere, so set ``lease`` above the longest expected run.
+
+Schedules are five cron fields (minute, hour, day of month, month, day of
+week, with ``*``, ``a-b``, ``*/n`` and lists) or ``@hourly``, ``@daily``,
+``@weekly`` or ``@monthly``, evaluated in ``TIME_ZONE``. A run missed
+while no worker was up happens once when one starts, not once per missed
+slot. ``manage.py jobs`` lists the jobs and runs one on demand.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from django.db import DatabaseError, close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from monitoring.metrics import Counter, Histogram
+from .models import FAILED, SUCCEEDED, ScheduledJob
+from .worker import _json_safe
+
+logger = logging.getLogger(__name__)
+
+JOBS = {}
+
+JOB_RUNS = Counter(
+    'scheduled_jobs_total', 'Periodic job runs, by job and result.',
+    ['job', 'result'],
+)
+JOB_SECONDS = Histogram(
+    'scheduled_job_duration_seconds', 'Time to run a periodic job, in seconds.',
+    ['job'],
+)
+
+ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+}
+
+
+def _parse_field(text, low, high):
+    values = set()
+    for part in text.split(','):
+        span, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if span == '*':
+            start, end = low, high
+        elif '-' in span:
+            start, end = (int(bound) for bound in span.split('-', 1))
+        else:
+            start = int(span)
+            end = high if step > 1 else start
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f'Invalid cron field: {text!r}')
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class Cron:
+    """
+    A parsed cron schedule.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        fields = ALIASES.get(expression, expression).split()
+        if len(fields) != 5:
+            raise ValueError(f'Expected five cron fields: {expression!r}')
+        try:
+            self.minutes = _parse_field(fields[0], 0, 59)
+            self.hours = _parse_field(fields[1], 0, 23)
+            self.days = _parse_field(fields[2], 1, 31)
+            self.months = _parse_field(fields[3], 1, 12)
+            # 0 and 7 are both Sunday.
+            self.weekdays = {
+                day % 7 for day in _parse_field(fields[4], 0, 7)
+            }
+        except ValueError as exc:
+            raise ValueError(f'{exc} in {expression!r}') from None
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def __str__(self):
+        return self.expression
+
+    def day_matches(self, moment):
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        # As in cron, a restricted day of month and day of week match
+        # when either does.
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment):
+        """
+        Returns the first time matching the schedule after ``moment``.
+        """
+        local = timezone.localtime(moment).replace(
+            second=0, microsecond=0, tzinfo=None
+        ) + timedelta(minutes=1)
+        limit = local + timedelta(days=5 * 366)
+        while local < limit:
+            if local.month not in self.months:
+                local = datetime(
+                    local.year + local.month // 12, local.month % 12 + 1, 1
+                )
+            elif not self.day_matches(local):
+                local = datetime(local.year, local.month, local.day) \
+                    + timedelta(days=1)
+            elif local.hour not in self.hours:
+                local = local.replace(minute=0) + timedelta(hours=1)
+            elif local.minute not in self.minutes:
+                local += timedelta(minutes=1)
+            else:
+                return timezone.make_aware(local)
+        raise ValueError(f'{self.expression!r} never matches')
+
+
+class PeriodicJob:
+    """
+    A registered periodic job. Calling it runs the function directly.
+    """
+
+    def __init__(self, func, name, cron, lease):
+        self.func = func
+        self.name = name
+        self.cron = cron
+        self.lease = lease
+        self.__doc__ = func.__doc__
+        self.__wrapped__ = func
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+
+def periodic(schedule, *, name=None, lease=600):
+    """
+    Registers a function as a periodic job run on the cron ``schedule``.
+
+    ``lease`` is how many seconds a run may take before the job is
+    considered abandoned and another scheduler may run it.
+    """
+    cron = Cron(schedule)
+
+    def register(func):
+        job_name = name or f'{func.__module__}.{func.__qualname__}'
+        if job_name in JOBS:
+            raise ValueError(f'Duplicate periodic job: {job_name}')
+        JOBS[job_name] = PeriodicJob(func, job_name, cron, lease)
+        return JOBS[job_name]
+
+    return register
+
+
+def sync_jobs(now=None):
+    """
+    Creates the schedule rows of newly registered jobs and reschedules
+    jobs whose schedule changed.
+    """
+    now = now or timezone.now()
+    rows = {row.name: row for row in ScheduledJob.objects.all()}
+    for job in JOBS.values():
+        row = rows.get(job.name)
+        if row is None:
+            ScheduledJob.objects.get_or_create(name=job.name, defaults={
+                'schedule': str(job.cron),
+                'next_run_at': job.cron.next_after(now),
+            })
+        elif row.schedule != str(job.cron):
+            ScheduledJob.objects.filter(pk=row.pk).update(
+                schedule=str(job.cron), next_run_at=job.cron.next_after(now),
+            )
+
+
+def acquire(job, owner, now=None, force=False):
+    """
+    Takes the lease on ``job`` for ``owner`` if the job is due, or at any
+    time with ``force``. Returns whether the lease was taken; it is never
+    taken while another owner holds an unexpired one.
+    """
+    now = now or timezone.now()
+    rows = ScheduledJob.objects.filter(name=job.name).filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    )
+    if not force:
+        rows = rows.filter(next_run_at__lte=now)
+    return bool(rows.update(
+        locked_by=owner, locked_until=now + timedelta(seconds=job.lease),
+        last_started_at=now,
+    ))
+
+
+def run_job(job, owner):
+    """
+    Runs a job whose lease ``owner`` holds, records the outcome and
+    schedules the next run. Returns the new ``ScheduledJob`` state.
+    """
+    started = time.perf_counter()
+    fields = {'last_result': None, 'last_error': ''}
+    try:
+        fields['last_result'] = _json_safe(job.func())
+        fields['last_status'] = SUCCEEDED
+    except Exception:
+        fields['last_error'] = traceback.format_exc()
+        fields['last_status'] = FAILED
+        logger.error('Periodic job %s failed:\n%s', job.name,
+                     fields['last_error'])
+    duration = time.perf_counter() - started
+    JOB_SECONDS.observe(duration, job=job.name)
+    JOB_RUNS.inc(job=job.name, result=fields['last_status'])
+
+    now = timezone.now()
+    ScheduledJob.objects.filter(name=job.name, locked_by=owner).update(
+        **fields, last_duration=duration, last_finished_at=now,
+        next_run_at=job.cron.next_after(now), locked_until=None,
+        runs=F('runs') + 1,
+    )
+    return ScheduledJob.objects.get(name=job.name)
+
+
+class Scheduler:
+    """
+    Runs due periodic jobs, one at a time, every ``interval`` seconds
+    until stopped.
+    """
+
+    def __init__(self, interval=30, name=None):
+        self.interval = interval
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+
+    def stop(self):
+        self.stopping.set()
+
+    def tick(self):
+        """
+        Runs every job that is due and not leased elsewhere. Returns the
+        names of the jobs run.
+        """
+        due = ScheduledJob.objects.filter(
+            name__in=JOBS, next_run_at__lte=timezone.now()
+        ).order_by('next_run_at').values_list('name', flat=True)
+        ran = []
+        for name in list(due):
+            job = JOBS[name]
+            if acquire(job, self.name):
+                run_job(job, self.name)
+                ran.append(name)
+        return ran
+
+    def run(self):
+        logger.info('Scheduler %s started with jobs: %s',
+                    self.name, ', '.join(sorted(JOBS)))
+        synced = False
+        while not self.stopping.is_set():
+            close_old_connections()
+            try:
+                if not synced:
+                    sync_jobs()
+                    synced = True
+                self.tick()
+            except DatabaseError:
+                logger.exception('Scheduler %s could not check its jobs',
+                                 self.name)
+            self.stopping.wait(self.interval)
+        close_old_connections()
+        logger.info('Scheduler %s stopped', self.name)
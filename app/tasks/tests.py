@@ -0,0 +1,320 @@
+import json
+import os
+import smtplib
+import tempfile
+from datetime import datetime, timedelta
+from email.mime.base import MIMEBase
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    FAILED, QUEUED, RUNNING, SUCCEEDED, ScheduledJob, Task, Throttle,
+)
+from .registry import REGISTRY, task
+from .scheduler import JOBS, Cron, Scheduler, acquire, periodic, sync_jobs
+from .worker import Worker
+
+CALLS = []
+
+
+@task(name='tests.add')
+def add(a, b):
+    return a + b
+
+
+@task(name='tests.flaky', max_attempts=2, retry_delay=0)
+def flaky():
+    CALLS.append('flaky')
+    if len(CALLS) == 1:
+        raise RuntimeError('first attempt fails')
+    return 'ok'
+
+
+@task(name='tests.broken', max_attempts=2, retry_delay=0)
+def broken():
+    raise RuntimeError('always fails')
+
+
+@task(name='tests.unique', unique=True)
+def unique():
+    pass
+
+
+@periodic('*/5 * * * *', name='tests.count')
+def count():
+    CALLS.append('count')
+    if len(CALLS) > 1:
+        raise RuntimeError('second run fails')
+    return len(CALLS)
+
+
+class EnqueueTests(TestCase):
+    def test_delay_queues_a_task(self):
+        queued = add.delay(2, b=3)
+        self.assertEqual(queued.status, QUEUED)
+        self.assertEqual((queued.args, queued.kwargs), ([2], {'b': 3}))
+        self.assertEqual(add(2, 3), 5)
+
+    def test_unique_tasks_queued_once(self):
+        self.assertEqual(unique.delay(), unique.delay())
+        self.assertEqual(Task.objects.count(), 1)
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_eager(self):
+        self.assertEqual(add.delay(2, 3), 5)
+        self.assertFalse(Task.objects.exists())
+
+    def test_duplicate_names_rejected(self):
+        with self.assertRaises(ValueError):
+            task(name='tests.add')(lambda: None)
+        self.assertIs(REGISTRY['tests.add'], add)
+
+    def test_claim_reclaims_expired_tasks(self):
+        past = timezone.now() - timedelta(seconds=1)
+        lost = Task.objects.create(name='tests.add', args=[1, 1],
+                                   status=RUNNING, attempts=1,
+                                   locked_by='gone', locked_until=past)
+        exhausted = Task.objects.create(name='tests.add', status=RUNNING,
+                                        attempts=3, locked_until=past)
+        Task.objects.create(name='tests.add', run_after=timezone.now()
+                            + timedelta(hours=1))
+
+        [claimed] = Task.objects.claim('me', 10, {})
+        self.assertEqual(claimed.pk, lost.pk)
+        self.assertEqual((claimed.attempts, claimed.locked_by), (2, 'me'))
+        self.assertEqual(Task.objects.get(pk=exhausted.pk).status, FAILED)
+        self.assertEqual(Task.objects.claim('other', 10, {}), [])
+
+
+class WorkerTests(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def run_worker(self):
+        Worker(threads=2, poll_interval=0.01, burst=True).run()
+
+    def test_runs_tasks_and_stores_results(self):
+        queued = add.delay(2, 3)
+        self.run_worker()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, SUCCEEDED)
+        self.assertEqual(queued.result, 5)
+        self.assertEqual(queued.attempts, 1)
+        self.assertIsNotNone(queued.finished_at)
+
+    def test_retries_then_fails(self):
+        retried = flaky.delay()
+        failed = broken.delay()
+        self.run_worker()
+        retried.refresh_from_db()
+        failed.refresh_from_db()
+        self.assertEqual((retried.status, retried.attempts), (SUCCEEDED, 2))
+        self.assertEqual((failed.status, failed.attempts), (FAILED, 2))
+        self.assertIn('always fails', failed.error)
+
+    def test_runworker_archives_its_metrics_on_exit(self):
+        add.delay(2, 3)
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(METRICS_DIR=directory):
+                call_command('runworker', '--burst', '--threads', '1')
+            self.assertEqual(sorted(os.listdir(directory)),
+                             ['.lock', 'archive.json'])
+            with open(os.path.join(directory, 'archive.json')) as archive:
+                totals = json.load(archive)
+        self.assertIn(['tests.add', 'succeeded'],
+                      [key for key, value in totals['tasks_total']])
+
+    def test_unknown_task_fails(self):
+        unknown = Task.objects.create(name='tests.missing')
+        self.run_worker()
+        unknown.refresh_from_db()
+        self.assertEqual(unknown.status, FAILED)
+        self.assertIn('Unknown task', unknown.error)
+
+
+class CronTests(TestCase):
+    def next_after(self, expression, moment):
+        return Cron(expression).next_after(
+            timezone.make_aware(datetime(*moment))
+        )
+
+    def test_next_after(self):
+        self.assertEqual(self.next_after('*/15 * * * *', (2026, 1, 5, 10, 7)),
+                         timezone.make_aware(datetime(2026, 1, 5, 10, 15)))
+        self.assertEqual(self.next_after('0 8-20 * * *', (2026, 1, 5, 20, 0)),
+                         timezone.make_aware(datetime(2026, 1, 6, 8, 0)))
+        self.assertEqual(self.next_after('@monthly', (2026, 12, 5, 0, 0)),
+                         timezone.make_aware(datetime(2027, 1, 1, 0, 0)))
+        self.assertEqual(self.next_after('0 0 29 2 *', (2026, 1, 1, 0, 0)),
+                         timezone.make_aware(datetime(2028, 2, 29, 0, 0)))
+        # Monday 5 January 2026; Sunday is 0 or 7.
+        self.assertEqual(self.next_after('30 9 * * 7', (2026, 1, 5, 0, 0)),
+                         timezone.make_aware(datetime(2026, 1, 11, 9, 30)))
+        # Day of month or day of week, as in cron.
+        self.assertEqual(self.next_after('0 0 13 * 5', (2026, 1, 5, 0, 0)),
+                         timezone.make_aware(datetime(2026, 1, 9, 0, 0)))
+
+    def test_invalid_expressions(self):
+        for expression in ['* * * *', '60 * * * *', '* * 0 * *', '5-1 * * * *']:
+            with self.assertRaises(ValueError):
+                Cron(expression)
+
+
+class SchedulerTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+        sync_jobs()
+        self.job = JOBS['tests.count']
+        self.make_due()
+
+    def make_due(self):
+        ScheduledJob.objects.filter(name='tests.count').update(
+            next_run_at=timezone.now() - timedelta(minutes=1)
+        )
+
+    def test_runs_due_jobs_and_records_runs(self):
+        self.assertIn('tests.count', Scheduler(name='a').tick())
+        self.assertNotIn('tests.count', Scheduler(name='b').tick())
+        row = ScheduledJob.objects.get(name='tests.count')
+        self.assertEqual((row.last_status, row.last_result, row.runs),
+                         (SUCCEEDED, 1, 1))
+        self.assertIsNotNone(row.last_duration)
+        self.assertIsNone(row.locked_until)
+        self.assertGreater(row.next_run_at, timezone.now())
+
+        self.make_due()
+        Scheduler(name='a').tick()
+        row.refresh_from_db()
+        self.assertEqual((row.last_status, row.runs), (FAILED, 2))
+        self.assertIn('second run fails', row.last_error)
+        self.assertGreater(row.next_run_at, timezone.now())
+
+    def test_lease_is_exclusive(self):
+        self.assertTrue(acquire(self.job, 'a'))
+        self.assertFalse(acquire(self.job, 'b'))
+        self.assertFalse(acquire(self.job, 'b', force=True))
+        self.assertEqual(Scheduler(name='b').tick(), [])
+        later = timezone.now() + timedelta(seconds=self.job.lease + 1)
+        self.assertTrue(acquire(self.job, 'b', now=later))
+        self.assertEqual(CALLS, [])
+
+    def test_jobs_command(self):
+        out = StringIO()
+        call_command('jobs', 'run', 'tests.count', stdout=out)
+        self.assertIn('tests.count finished', out.getvalue())
+        call_command('jobs', stdout=out)
+        self.assertIn('*/5 * * * *', out.getvalue())
+        with self.assertRaisesMessage(CommandError, 'second run fails'):
+            call_command('jobs', 'run', 'tests.count')
+        with self.assertRaisesMessage(CommandError, 'Unknown job'):
+            call_command('jobs', 'run', 'tests.missing')
+
+    def test_changed_schedule_reschedules(self):
+        ScheduledJob.objects.filter(name='tests.count').update(
+            schedule='0 0 1 1 *'
+        )
+        sync_jobs()
+        row = ScheduledJob.objects.get(name='tests.count')
+        self.assertEqual(row.schedule, '*/5 * * * *')
+        self.assertLessEqual(row.next_run_at,
+                             timezone.now() + timedelta(minutes=5))
+
+
+class AlertTriggerTests(TestCase):
+    def test_page_views_send_no_alerts(self):
+        self.client.force_login(User.objects.create_user('staff'))
+        with mock.patch('smtplib.SMTP') as smtp:
+            self.client.get(reverse('bill_list'))
+        smtp.assert_not_called()
+        self.assertFalse(Task.objects.exists())
+
+    def test_digest_jobs_queue_the_alerts(self):
+        JOBS['bills.tasks.pending_bills_digest']()
+        JOBS['store.tasks.low_stock_digest']()
+        self.assertEqual(
+            sorted(Task.objects.values_list('name', flat=True)),
+            ['bills.tasks.pending_bills_alert', 'store.tasks.low_stock_alert'],
+        )
+
+
+class ThrottleTests(TestCase):
+    def test_runs_at_most_once_per_interval(self):
+        self.assertTrue(Throttle.acquire('alert', 3600))
+        self.assertFalse(Throttle.acquire('alert', 3600))
+        self.assertTrue(Throttle.acquire('other alert', 3600))
+
+        Throttle.objects.filter(name='alert').update(
+            last_run_at=timezone.now() - timedelta(hours=2)
+        )
+        self.assertTrue(Throttle.acquire('alert', 3600))
+
+    def test_released_runs_are_not_throttled(self):
+        Throttle.acquire('alert', 3600)
+        Throttle.release('alert')
+        self.assertTrue(Throttle.acquire('alert', 3600))
+
+    def test_alert_emails_are_throttled_across_processes(self):
+        from store.models import Category, Item
+        from store.views import notify_low_quantity_items
+
+        Item.objects.create(name='Rice', description='', quantity=1,
+                            category=Category.objects.create(name='Food'))
+        with mock.patch('store.views.smtplib.SMTP') as smtp, \
+                mock.patch('builtins.open', mock.mock_open(read_data=b'')), \
+                mock.patch('store.views.MIMEImage',
+                           lambda data: MIMEBase('image', 'png')):
+            server = smtp.return_value.__enter__.return_value
+            server.sendmail.side_effect = smtplib.SMTPException
+            with self.assertRaises(smtplib.SMTPException):
+                notify_low_quantity_items()
+            # A failed send leaves the next attempt free to send.
+            self.assertFalse(Throttle.objects.exists())
+
+            server.sendmail.side_effect = None
+            notify_low_quantity_items()
+            notify_low_quantity_items()
+        self.assertEqual(server.sendmail.call_count, 2)
+        self.assertTrue(Throttle.objects.filter(name='low_stock_alert')
+                        .exists())
+
+    def test_failed_alert_emails_fail_the_task(self):
+        from bills.models import Bill
+        from bills.tasks import pending_bills_alert
+
+        Bill.objects.create(institution_name='Mill', payment_details='Cash',
+                            amount=10, status=False)
+        with mock.patch('bills.views.smtplib.SMTP') as smtp, \
+                mock.patch('builtins.open', mock.mock_open(read_data=b'')), \
+                mock.patch('bills.views.MIMEImage',
+                           lambda data: MIMEBase('image', 'png')):
+            smtp.return_value.__enter__.return_value.sendmail.side_effect = \
+                smtplib.SMTPException
+            # Raising is what makes the worker retry it.
+            with self.assertRaises(smtplib.SMTPException):
+                pending_bills_alert()
+        self.assertFalse(Throttle.objects.exists())
+
+    def test_hourly_digest_running_early_still_sends(self):
+        from store.models import Category, Item
+        from store.views import notify_low_quantity_items
+
+        Item.objects.create(name='Rice', description='', quantity=1,
+                            category=Category.objects.create(name='Food'))
+        # The previous digest, a few seconds less than an hour ago.
+        Throttle.objects.create(
+            name='low_stock_alert',
+            last_run_at=timezone.now() - timedelta(minutes=59, seconds=58),
+        )
+        with mock.patch('store.views.smtplib.SMTP') as smtp, \
+                mock.patch('builtins.open', mock.mock_open(read_data=b'')), \
+                mock.patch('store.views.MIMEImage',
+                           lambda data: MIMEBase('image', 'png')):
+            notify_low_quantity_items()
+        smtp.return_value.__enter__.return_value.sendmail.assert_called_once()
@@ -0,0 +1,179 @@
+"""
+Module: tasks.worker
+
+Runs queued tasks with a pool of threads. ``runworker`` starts one
+``Worker`` per process.
+
+The worker claims as many due tasks as it has idle threads, runs them and
+stores each result, or the error and a retry time. A task that fails is
+retried after ``retry_delay`` seconds, doubled after every failure, until
+it has had ``max_attempts`` attempts. While a task runs it is locked for
+its visibility timeout; if the worker dies, another one picks it up once
+the timeout has passed.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, OperationalError, close_old_connections
+from django.utils import timezone
+
+from .models import FAILED, QUEUED, RUNNING, SUCCEEDED, Task
+from .registry import REGISTRY, TASK_SECONDS, TASKS
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before each further try at storing a task's outcome.
+RECORD_RETRIES = (0.1, 0.5, 2.0, None)
+
+
+def execute(task, worker):
+    """
+    Runs a claimed task and records the outcome. Returns the new status.
+    """
+    started = time.perf_counter()
+    registered = REGISTRY.get(task.name)
+    fields = {'locked_until': None, 'finished_at': timezone.now()}
+    try:
+        if registered is None:
+            raise LookupError(f'Unknown task: {task.name}')
+        result = registered.func(*task.args, **task.kwargs)
+    except Exception:
+        fields['error'] = traceback.format_exc()
+        if registered is not None and task.attempts < task.max_attempts:
+            fields['status'] = QUEUED
+            fields['run_after'] = timezone.now() + timedelta(
+                seconds=registered.retry_after(task.attempts)
+            )
+            fields['finished_at'] = None
+            logger.warning('Task %s failed (attempt %d of %d), retrying',
+                           task, task.attempts, task.max_attempts)
+        else:
+            fields['status'] = FAILED
+            logger.error('Task %s failed:\n%s', task, fields['error'])
+    else:
+        fields.update(status=SUCCEEDED, result=_json_safe(result), error='')
+    finally:
+        TASK_SECONDS.observe(time.perf_counter() - started, task=task.name)
+
+    # Only store the outcome if the task is still ours: past its visibility
+    # timeout another worker may have taken it over. Writes can briefly
+    # fail while another connection holds the SQLite write lock; losing the
+    # outcome would run the task again, so retry a few times first.
+    for pause in RECORD_RETRIES:
+        try:
+            Task.objects.filter(
+                pk=task.pk, status=RUNNING, locked_by=worker,
+                attempts=task.attempts,
+            ).update(**fields)
+            break
+        except OperationalError:
+            if pause is None:
+                raise
+            time.sleep(pause)
+    TASKS.inc(task=task.name, result=fields['status'])
+    return fields['status']
+
+
+def _json_safe(value):
+    try:
+        json.dumps(value)
+    except (TypeError, ValueError):
+        return repr(value)
+    return value
+
+
+class Worker:
+    """
+    Claims and runs tasks with ``threads`` threads until stopped.
+
+    With ``burst`` the worker stops as soon as no task is due.
+    """
+
+    def __init__(self, threads=4, poll_interval=1.0, burst=False,
+                 name=None):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.running = 0
+        self.lock = threading.Lock()
+        self.timeouts = {
+            name: registered.timeout for name, registered in REGISTRY.items()
+        }
+        self.last_purge = None
+
+    def stop(self):
+        self.stopping.set()
+
+    def run(self):
+        logger.info('Worker %s started with %d threads and tasks: %s',
+                    self.name, self.threads, ', '.join(sorted(REGISTRY)))
+        with ThreadPoolExecutor(self.threads) as pool:
+            while not self.stopping.is_set():
+                # Drop the connection if it broke or outlived CONN_MAX_AGE,
+                # as Django does at the start of each request.
+                close_old_connections()
+                try:
+                    if self.poll(pool):
+                        continue
+                    if self.burst and not self.running and \
+                            not Task.objects.due().exists():
+                        break
+                except DatabaseError:
+                    # The database restarted or is busy: try again later
+                    # rather than letting the worker die.
+                    logger.exception('Worker %s could not poll the queue',
+                                     self.name)
+                self.stopping.wait(self.poll_interval)
+        close_old_connections()
+        logger.info('Worker %s stopped', self.name)
+
+    def poll(self, pool):
+        """
+        Claims a task for each idle thread and starts it. Returns whether
+        any task was claimed.
+        """
+        self.purge_results()
+        idle = self.threads - self.running
+        claimed = Task.objects.claim(self.name, idle, self.timeouts) \
+            if idle else []
+        for task in claimed:
+            with self.lock:
+                self.running += 1
+            pool.submit(self._run, task)
+        return bool(claimed)
+
+    def _run(self, task):
+        try:
+            execute(task, self.name)
+        except Exception:
+            logger.exception('Could not record the outcome of %s', task)
+        finally:
+            close_old_connections()
+            with self.lock:
+                self.running -= 1
+
+    def purge_results(self):
+        """
+        Deletes finished tasks older than ``TASKS_RESULT_TTL`` seconds,
+        at most once an hour.
+        """
+        if self.last_purge is not None and \
+                time.monotonic() - self.last_purge < 3600:
+            return
+        self.last_purge = time.monotonic()
+        deleted, _ = Task.objects.finished_before(
+            timezone.now() - timedelta(seconds=settings.TASKS_RESULT_TTL)
+        ).delete()
+        if deleted:
+            logger.info('Deleted %d finished tasks', deleted)
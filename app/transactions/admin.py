@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Sale, SaleDetail, Purchase
+from .models import (
+    DailyItemSales, Sale, SaleDetail, SaleDetailLot, Purchase,
+)
 
 
 @admin.register(Sale)
@@ -13,12 +15,13 @@ class SaleAdmin(admin.ModelAdmin):
         'date_added',
         'grand_total',
         'amount_paid',
-        'amount_change'
+        'amount_change',
+        'needs_review'
     )
-    search_fields = ('customer__name', 'id')
-    list_filter = ('date_added', 'customer')
+    search_fields = ('customer__name', 'id', 'client_id')
+    list_filter = ('needs_review', 'date_added', 'customer')
     ordering = ('-date_added',)
-    readonly_fields = ('date_added',)
+    readonly_fields = ('date_added', 'client_id')
     date_hierarchy = 'date_added'
 
     def save_model(self, request, obj, form, change):
@@ -28,6 +31,20 @@ class SaleAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+class SaleDetailLotInline(admin.TabularInline):
+    """
+    Admin interface configuration for the lots a sale line was taken from.
+    """
+    model = SaleDetailLot
+    fields = ('lot', 'quantity')
+    readonly_fields = ('lot', 'quantity')
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(SaleDetail)
 class SaleDetailAdmin(admin.ModelAdmin):
     """
@@ -39,11 +56,13 @@ class SaleDetailAdmin(admin.ModelAdmin):
         'item',
         'price',
         'quantity',
-        'total_detail'
+        'total_detail',
+        'shortfall'
     )
     search_fields = ('sale__id', 'item__name')
     list_filter = ('sale', 'item')
     ordering = ('sale', 'item')
+    inlines = [SaleDetailLotInline]
 
     def save_model(self, request, obj, form, change):
         """
@@ -66,9 +85,11 @@ class PurchaseAdmin(admin.ModelAdmin):
         'quantity',
         'price',
         'total_value',
-        'delivery_status'
+        'delivery_status',
+        'lot_number',
+        'expiry_date'
     )
-    search_fields = ('item__name', 'vendor__name', 'slug')
+    search_fields = ('item__name', 'vendor__name', 'slug', 'lot_number')
     list_filter = ('order_date', 'vendor', 'delivery_status')
     ordering = ('-order_date',)
     readonly_fields = ('total_value',)
@@ -79,3 +100,15 @@ class PurchaseAdmin(admin.ModelAdmin):
         """
         obj.total_value = obj.price * obj.quantity
         super().save_model(request, obj, form, change)
+
+
+@admin.register(DailyItemSales)
+class DailyItemSalesAdmin(admin.ModelAdmin):
+    """
+    Admin interface configuration for the DailyItemSales rollup.
+    """
+    list_display = ('date', 'item', 'quantity', 'revenue', 'sale_count')
+    search_fields = ('item__name',)
+    list_filter = ('date',)
+    ordering = ('-date', 'item')
+    date_hierarchy = 'date'
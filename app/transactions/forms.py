@@ -1,4 +1,6 @@
 from django import forms
+
+from store.forms import ItemChoiceMixin
 from .models import Purchase
 
 
@@ -12,7 +14,7 @@ class BootstrapMixin(forms.ModelForm):
             field.widget.attrs.setdefault('class', 'form-control')
 
 
-class PurchaseForm(BootstrapMixin, forms.ModelForm):
+class PurchaseForm(ItemChoiceMixin, BootstrapMixin, forms.ModelForm):
     """
     A form for creating and updating Purchase instances.
     """
@@ -20,7 +22,8 @@ class PurchaseForm(BootstrapMixin, forms.ModelForm):
         model = Purchase
         fields = [
             'item',  'price', 'description', 'vendor',
-            'quantity', 'delivery_date', 'delivery_status'
+            'quantity', 'delivery_date', 'delivery_status', 'location',
+            'lot_number', 'expiry_date'
         ]
         widgets = {
             'delivery_date': forms.DateInput(
@@ -29,6 +32,12 @@ class PurchaseForm(BootstrapMixin, forms.ModelForm):
                     'type': 'datetime-local'
                 }
             ),
+            'expiry_date': forms.DateInput(
+                attrs={
+                    'class': 'form-control',
+                    'type': 'datetime-local'
+                }
+            ),
             'description': forms.Textarea(
                 attrs={'rows': 1, 'cols': 40}
             ),
@@ -42,3 +51,10 @@ class PurchaseForm(BootstrapMixin, forms.ModelForm):
                 attrs={'class': 'form-control'}
             ),
         }
+        help_texts = {
+            'location': (
+                'Where the goods are received; the default location '
+                'when empty.'
+            ),
+            'expiry_date': "The item's expiring date when empty.",
+        }
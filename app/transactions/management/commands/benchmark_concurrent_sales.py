@@ -0,0 +1,220 @@
+"""
+Management command: benchmark_concurrent_sales
+
+Measures checkout throughput when several tills record sales on the same
+SQLite database at once while other clients keep reading the sales list.
+Every till and reader is a separate process, like gunicorn workers.
+
+The benchmark runs twice on fresh throwaway databases: once with SQLite's
+defaults and once in the performance mode configured in settings (WAL,
+tuned pragmas, BEGIN IMMEDIATE). The configured database is not touched.
+
+Usage:
+    python manage.py benchmark_concurrent_sales
+    python manage.py benchmark_concurrent_sales --tills 8 --sales 200 --readers 2
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from accounts.models import Customer, Vendor
+from store.models import Category, Item
+from transactions.models import Sale
+from transactions.services import create_sale
+
+MODES = (
+    ('default', {'SQLITE_PERFORMANCE_MODE': 'False'}),
+    ('performance', {'SQLITE_PERFORMANCE_MODE': 'True'}),
+)
+
+CATALOG_SIZE = 50
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent sale throughput on SQLite with default settings '
+        'and in performance mode.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tills', type=int, default=8,
+                            help='Processes recording sales.')
+        parser.add_argument('--sales', type=int, default=100,
+                            help='Sales recorded by each till.')
+        parser.add_argument('--lines', type=int, default=3,
+                            help='Lines per sale.')
+        parser.add_argument('--readers', type=int, default=2,
+                            help='Processes reading the sales list meanwhile.')
+        parser.add_argument('--seed', type=int, default=42)
+        # Internal: run a single role against the configured database.
+        parser.add_argument('--role', choices=['seed', 'till', 'reader'],
+                            help=argparse.SUPPRESS)
+        parser.add_argument('--number', type=int, default=0,
+                            help=argparse.SUPPRESS)
+        parser.add_argument('--stop-file', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['role']:
+            if connection.vendor != 'sqlite':
+                raise CommandError('The benchmark needs an SQLite database.')
+            role = {'seed': _seed, 'till': _till, 'reader': _reader}
+            self.stdout.write(json.dumps(role[options['role']](**options)))
+            return
+
+        for mode, env in MODES:
+            with tempfile.TemporaryDirectory() as directory:
+                env = {
+                    **os.environ, **env,
+                    'DATABASE_URL': f'sqlite:///{directory}/bench.sqlite3',
+                }
+                result = self._benchmark(env, Path(directory), options)
+            self._report(mode, result)
+
+    def _benchmark(self, env, directory, options):
+        self._wait(self._manage(env, 'migrate', '--verbosity', '0'))
+        self._result(self._manage(env, '--role', 'seed'))
+
+        stop_file = directory / 'stop'
+        readers = [
+            self._manage(env, '--role', 'reader', '--stop-file', str(stop_file))
+            for _ in range(options['readers'])
+        ]
+        tills = [
+            self._manage(
+                env, '--role', 'till', '--number', str(number),
+                '--sales', str(options['sales']),
+                '--lines', str(options['lines']),
+                '--seed', str(options['seed']),
+            )
+            for number in range(options['tills'])
+        ]
+        till_results = [self._result(till) for till in tills]
+        stop_file.touch()
+        reader_results = [self._result(reader) for reader in readers]
+
+        latencies = sorted(
+            latency for result in till_results
+            for latency in result['latencies']
+        ) or [0]
+        elapsed = (
+            max(result['finished'] for result in till_results)
+            - min(result['started'] for result in till_results)
+        )
+        committed = sum(result['committed'] for result in till_results)
+        return {
+            'sales_per_second': committed / elapsed,
+            'committed': committed,
+            'locked': sum(result['locked'] for result in till_results),
+            'p50_ms': statistics.median(latencies) * 1000,
+            'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000,
+            'reads': sum(result['reads'] for result in reader_results),
+            'read_errors': sum(
+                result['errors'] for result in reader_results
+            ),
+        }
+
+    def _report(self, mode, result):
+        self.stdout.write(self.style.MIGRATE_HEADING(mode))
+        self.stdout.write(
+            f"  {result['sales_per_second']:.1f} sales/s, "
+            f"{result['committed']} committed, "
+            f"{result['locked']} failed with 'database is locked'"
+        )
+        self.stdout.write(
+            f"  sale latency p50 {result['p50_ms']:.1f} ms, "
+            f"p95 {result['p95_ms']:.1f} ms"
+        )
+        self.stdout.write(
+            f"  {result['reads']} list reads, "
+            f"{result['read_errors']} failed"
+        )
+
+    def _manage(self, env, *args):
+        if args[0].startswith('--'):
+            args = ('benchmark_concurrent_sales', *args)
+        return subprocess.Popen(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), *args],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            env=env,
+        )
+
+    def _wait(self, process):
+        stdout, stderr = process.communicate()
+        if process.returncode:
+            raise CommandError(stderr)
+        return stdout
+
+    def _result(self, process):
+        return json.loads(self._wait(process).strip().splitlines()[-1])
+
+
+def _seed(**options):
+    customer = Customer.objects.create(first_name='Bench', last_name='Till')
+    category = Category.objects.create(name='Bench')
+    vendor = Vendor.objects.create(name='Bench')
+    for i in range(CATALOG_SIZE):
+        Item.objects.create(
+            name=f'Bench item {i}', category=category, vendor=vendor,
+            quantity=1_000_000, price=1,
+        )
+    return {'customer': customer.id}
+
+
+def _till(number, sales, lines, seed, **options):
+    rng = random.Random(seed + number)
+    customer = Customer.objects.get()
+    item_ids = list(Item.objects.values_list('id', flat=True))
+    latencies = []
+    locked = 0
+    started = time.time()
+    for _ in range(sales):
+        sale_started = time.perf_counter()
+        try:
+            create_sale(
+                {
+                    'customer': customer, 'sub_total': lines,
+                    'grand_total': lines, 'amount_paid': lines,
+                    'amount_change': 0,
+                },
+                [
+                    {'id': item_id, 'price': 1, 'quantity': 1,
+                     'total_item': 1}
+                    for item_id in rng.sample(item_ids, lines)
+                ],
+            )
+        except OperationalError:
+            locked += 1
+        else:
+            latencies.append(time.perf_counter() - sale_started)
+    return {
+        'started': started, 'finished': time.time(),
+        'committed': len(latencies), 'locked': locked,
+        'latencies': latencies,
+    }
+
+
+def _reader(stop_file, **options):
+    reads = errors = 0
+    while not os.path.exists(stop_file):
+        try:
+            list(
+                Sale.objects.select_related('customer')
+                .order_by('-date_added')[:50]
+            )
+        except OperationalError:
+            errors += 1
+        else:
+            reads += 1
+    return {'reads': reads, 'errors': errors}
@@ -0,0 +1,35 @@
+"""
+Management command: rebuild_daily_sales
+
+Back-fills the DailyItemSales rollup from sale lines.
+
+Usage:
+    python manage.py rebuild_daily_sales
+    python manage.py rebuild_daily_sales --since 2025-01-01 --until 2025-01-31
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from transactions.models import DailyItemSales
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily per-item sales rollup from sale lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', type=date.fromisoformat,
+            help='First day to rebuild (YYYY-MM-DD).'
+        )
+        parser.add_argument(
+            '--until', type=date.fromisoformat,
+            help='Last day to rebuild (YYYY-MM-DD).'
+        )
+
+    def handle(self, *args, **options):
+        rows = DailyItemSales.rebuild(options['since'], options['until'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {rows} daily item sales rows.')
+        )
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-19 14:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_remove_vendor_email'),
+        ('store', '0002_hot_query_indexes'),
+        ('transactions', '0003_alter_purchase_quantity'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='saledetail',
+            name='item',
+            field=models.ForeignKey(db_column='item', db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, to='store.item'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['order_date'], name='purchase_order_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['delivery_status', 'order_date'], name='purchase_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['date_added'], name='sale_date_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='saledetail',
+            index=models.Index(fields=['item', 'sale'], name='saledetail_item_sale_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.5 on 2026-10-19 14:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_item_sales(apps, schema_editor):
+    SaleDetail = apps.get_model('transactions', 'SaleDetail')
+    DailyItemSales = apps.get_model('transactions', 'DailyItemSales')
+    totals = SaleDetail.objects.annotate(
+        date=TruncDate('sale__date_added')
+    ).values('date', 'item').annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum('total_detail'),
+        total_sales=Count('id'),
+    ).order_by()
+    DailyItemSales.objects.bulk_create(
+        (
+            DailyItemSales(
+                date=total['date'],
+                item_id=total['item'],
+                quantity=total['total_quantity'],
+                revenue=total['total_revenue'],
+                sale_count=total['total_sales'],
+            )
+            for total in totals.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_hot_query_indexes'),
+        ('transactions', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyItemSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('sale_count', models.IntegerField(default=0)),
+                ('item', models.ForeignKey(db_column='item', on_delete=django.db.models.deletion.CASCADE, to='store.item')),
+            ],
+            options={
+                'verbose_name': 'Daily Item Sales',
+                'verbose_name_plural': 'Daily Item Sales',
+                'db_table': 'daily_item_sales',
+                'constraints': [models.UniqueConstraint(fields=('date', 'item'), name='daily_item_sales_unique')],
+            },
+        ),
+        migrations.RunPython(
+            backfill_daily_item_sales, migrations.RunPython.noop
+        ),
+    ]
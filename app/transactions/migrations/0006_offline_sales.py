@@ -0,0 +1,39 @@
+# Generated by Django 5.1.5 on 2026-10-19 17:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_remove_vendor_email'),
+        ('transactions', '0005_dailyitemsales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='client_id',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='needs_review',
+            field=models.BooleanField(db_default=False, default=False),
+        ),
+        migrations.AddField(
+            model_name='saledetail',
+            name='shortfall',
+            field=models.PositiveIntegerField(db_default=0, default=0),
+        ),
+        migrations.AlterField(
+            model_name='sale',
+            name='date_added',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Sale Date'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(condition=models.Q(('needs_review', True)), fields=['date_added'], name='sale_review_idx'),
+        ),
+    ]
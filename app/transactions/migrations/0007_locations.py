@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-19 19:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_remove_vendor_email'),
+        ('store', '0005_locations'),
+        ('transactions', '0006_offline_sales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchase',
+            name='location',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='purchases', to='store.location'),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='location',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='sales', to='store.location'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['location', 'order_date'], name='purchase_location_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['location', 'date_added'], name='sale_location_date_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.5 on 2026-10-19 20:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_stock_lots'),
+        ('transactions', '0007_locations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchase',
+            name='expiry_date',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Expiry Date'),
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='lot',
+            field=models.OneToOneField(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='purchase', to='store.stocklot'),
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='lot_number',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Lot Number'),
+        ),
+        migrations.CreateModel(
+            name='SaleDetailLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('detail', models.ForeignKey(db_column='detail', on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='transactions.saledetail')),
+                ('lot', models.ForeignKey(db_column='lot', on_delete=django.db.models.deletion.CASCADE, related_name='sale_lines', to='store.stocklot')),
+            ],
+            options={
+                'verbose_name': 'Sale Detail Lot',
+                'verbose_name_plural': 'Sale Detail Lots',
+                'db_table': 'sale_detail_lots',
+            },
+        ),
+    ]
@@ -1,7 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
 from django_extensions.db.fields import AutoSlugField
 
-from store.models import Item
+from InventoryMS.cache import VersionedManager
+from store.models import Item, Location, StockLot
 from accounts.models import Vendor, Customer
 
 DELIVERY_CHOICES = [("P", "Pending"), ("S", "Successful")]
@@ -12,8 +16,10 @@ class Sale(models.Model):
     Represents a sale transaction involving a customer.
     """
 
+    # Sales synced from an offline till keep the time they were made.
     date_added = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
+        editable=False,
         verbose_name="Sale Date"
     )
     customer = models.ForeignKey(
@@ -47,11 +53,45 @@ class Sale(models.Model):
         decimal_places=2,
         default=0.0
     )
+    # Set by the till for sales captured offline; makes resending safe.
+    client_id = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False
+    )
+    # Set when a synced sale sold more of an item than was in stock.
+    needs_review = models.BooleanField(default=False, db_default=False)
+    # Where the stock came from; sales from before locations have none.
+    # Covered by the (location, date_added) index declared in Meta.
+    location = models.ForeignKey(
+        Location,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="sales",
+        db_index=False
+    )
+
+    objects = VersionedManager()
 
     class Meta:
         db_table = "sales"
         verbose_name = "Sale"
         verbose_name_plural = "Sales"
+        indexes = [
+            models.Index(fields=["date_added"], name="sale_date_added_idx"),
+            models.Index(
+                fields=["date_added"],
+                name="sale_review_idx",
+                condition=models.Q(needs_review=True),
+            ),
+            models.Index(
+                fields=["location", "date_added"],
+                name="sale_location_date_idx",
+            ),
+        ]
 
     def __str__(self):
         """
@@ -81,10 +121,12 @@ class SaleDetail(models.Model):
         db_column="sale",
         related_name="saledetail_set"
     )
+    # Covered by the (item, sale) index declared in Meta.
     item = models.ForeignKey(
         Item,
         on_delete=models.DO_NOTHING,
-        db_column="item"
+        db_column="item",
+        db_index=False
     )
     price = models.DecimalField(
         max_digits=10,
@@ -92,11 +134,18 @@ class SaleDetail(models.Model):
     )
     quantity = models.PositiveIntegerField()
     total_detail = models.DecimalField(max_digits=10, decimal_places=2)
+    # Units sold beyond the stock left, for sales synced from offline.
+    shortfall = models.PositiveIntegerField(default=0, db_default=0)
+
+    objects = VersionedManager()
 
     class Meta:
         db_table = "sale_details"
         verbose_name = "Sale Detail"
         verbose_name_plural = "Sale Details"
+        indexes = [
+            models.Index(fields=["item", "sale"], name="saledetail_item_sale_idx"),
+        ]
 
     def __str__(self):
         """
@@ -109,6 +158,192 @@ class SaleDetail(models.Model):
         )
 
 
+class SaleDetailLot(models.Model):
+    """
+    Units of a sale line taken from one stock lot, first expiry first (see
+    store.lots), so sold units can be traced back to their purchase.
+    """
+
+    detail = models.ForeignKey(
+        SaleDetail,
+        on_delete=models.CASCADE,
+        db_column="detail",
+        related_name="lots"
+    )
+    lot = models.ForeignKey(
+        StockLot,
+        on_delete=models.CASCADE,
+        db_column="lot",
+        related_name="sale_lines"
+    )
+    quantity = models.PositiveIntegerField()
+
+    class Meta:
+        db_table = "sale_detail_lots"
+        verbose_name = "Sale Detail Lot"
+        verbose_name_plural = "Sale Detail Lots"
+
+    def __str__(self):
+        """
+        Returns a string representation of the SaleDetailLot instance.
+        """
+        return (
+            f"Detail ID: {self.detail_id} | "
+            f"Lot ID: {self.lot_id} | "
+            f"Quantity: {self.quantity}"
+        )
+
+
+class DailyItemSales(models.Model):
+    """
+    Per-day, per-item rollup of sale lines.
+
+    Kept up to date by the SaleDetail signals, and by the Sale signals when
+    a sale is re-dated, and rebuildable with the ``rebuild_daily_sales``
+    command. Charts and forecasts read this table
+    instead of re-aggregating every sale line. ``sale_count`` counts sale
+    lines; the sale screen writes one line per item per sale.
+    """
+
+    date = models.DateField()
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        db_column="item"
+    )
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0
+    )
+    sale_count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "daily_item_sales"
+        verbose_name = "Daily Item Sales"
+        verbose_name_plural = "Daily Item Sales"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "item"], name="daily_item_sales_unique"
+            ),
+        ]
+
+    def __str__(self):
+        """
+        Returns a string representation of the DailyItemSales instance.
+        """
+        return f"{self.date} | Item ID: {self.item_id} | Qty: {self.quantity}"
+
+    @classmethod
+    def record(cls, detail, sign=1):
+        """
+        Adds (sign=1) or removes (sign=-1) a sale line from its day's row.
+        """
+        cls._add(
+            timezone.localdate(detail.sale.date_added), detail.item_id,
+            sign * detail.quantity, sign * detail.total_detail, sign,
+        )
+
+    @classmethod
+    def redate(cls, sale, previous_date):
+        """
+        Moves a sale's lines from the day of ``previous_date`` to the day
+        the sale is now dated.
+        """
+        old = timezone.localdate(previous_date)
+        new = timezone.localdate(sale.date_added)
+        if old == new:
+            return
+        totals = sale.saledetail_set.values("item").annotate(
+            total_quantity=Sum("quantity"),
+            total_revenue=Sum("total_detail"),
+            total_sales=Count("id"),
+        ).order_by()
+        for total in totals:
+            quantity, revenue, count = (
+                total["total_quantity"], total["total_revenue"],
+                total["total_sales"],
+            )
+            cls._add(old, total["item"], -quantity, -revenue, -count)
+            cls._add(new, total["item"], quantity, revenue, count)
+
+    @classmethod
+    def _add(cls, date, item_id, quantity, revenue, count):
+        row, _ = cls.objects.get_or_create(date=date, item_id=item_id)
+        cls.objects.filter(pk=row.pk).update(
+            quantity=F("quantity") + quantity,
+            revenue=F("revenue") + revenue,
+            sale_count=F("sale_count") + count,
+        )
+
+    @classmethod
+    def record_many(cls, details):
+        """
+        Adds sale lines written in bulk to their days' rows, with one
+        update per row rather than per line.
+        """
+        totals = {}
+        for detail in details:
+            key = (timezone.localdate(detail.sale.date_added), detail.item_id)
+            quantity, revenue, count = totals.get(key, (0, 0, 0))
+            totals[key] = (
+                quantity + detail.quantity,
+                revenue + detail.total_detail,
+                count + 1,
+            )
+        cls.objects.bulk_create(
+            [cls(date=date, item_id=item_id) for date, item_id in totals],
+            ignore_conflicts=True,
+        )
+        for (date, item_id), (quantity, revenue, count) in totals.items():
+            cls.objects.filter(date=date, item_id=item_id).update(
+                quantity=F("quantity") + quantity,
+                revenue=F("revenue") + revenue,
+                sale_count=F("sale_count") + count,
+            )
+
+    @classmethod
+    def rebuild(cls, since=None, until=None):
+        """
+        Recomputes the rollup from sale lines, optionally limited to an
+        inclusive date range. Returns the number of rows written.
+        """
+        details = SaleDetail.objects.annotate(
+            date=TruncDate("sale__date_added")
+        )
+        rows = cls.objects.all()
+        if since:
+            details = details.filter(date__gte=since)
+            rows = rows.filter(date__gte=since)
+        if until:
+            details = details.filter(date__lte=until)
+            rows = rows.filter(date__lte=until)
+
+        totals = details.values("date", "item").annotate(
+            total_quantity=Sum("quantity"),
+            total_revenue=Sum("total_detail"),
+            total_sales=Count("id"),
+        ).order_by()
+
+        with transaction.atomic():
+            rows.delete()
+            created = cls.objects.bulk_create(
+                (
+                    cls(
+                        date=total["date"],
+                        item_id=total["item"],
+                        quantity=total["total_quantity"],
+                        revenue=total["total_revenue"],
+                        sale_count=total["total_sales"],
+                    )
+                    for total in totals.iterator()
+                ),
+                batch_size=1000,
+            )
+        return len(created)
+
+
 class Purchase(models.Model):
     """
     Represents a purchase of an item,
@@ -139,6 +374,34 @@ class Purchase(models.Model):
         verbose_name="Price per item ",
     )
     total_value = models.DecimalField(max_digits=10, decimal_places=2)
+    # Where the goods are received; the default location when empty.
+    # Covered by the (location, order_date) index declared in Meta.
+    location = models.ForeignKey(
+        Location,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="purchases",
+        db_index=False
+    )
+    # Of the goods received; the item's expiring date when empty.
+    expiry_date = models.DateTimeField(
+        blank=True, null=True, verbose_name="Expiry Date"
+    )
+    lot_number = models.CharField(
+        max_length=64, blank=True, verbose_name="Lot Number"
+    )
+    # The stock lot the goods were received as.
+    lot = models.OneToOneField(
+        StockLot,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="purchase"
+    )
+
+    objects = VersionedManager()
 
     def save(self, *args, **kwargs):
         """
@@ -159,3 +422,14 @@ class Purchase(models.Model):
 
     class Meta:
         ordering = ["order_date"]
+        indexes = [
+            models.Index(fields=["order_date"], name="purchase_order_date_idx"),
+            models.Index(
+                fields=["delivery_status", "order_date"],
+                name="purchase_status_date_idx",
+            ),
+            models.Index(
+                fields=["location", "order_date"],
+                name="purchase_location_date_idx",
+            ),
+        ]
@@ -0,0 +1,426 @@
+"""
+Module: transactions.services
+
+Write paths shared by the views, management commands and APIs that record
+transactions.
+"""
+
+import logging
+from dataclasses import dataclass
+
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from monitoring.metrics import Counter
+
+from accounts.models import Customer
+from store.locations import default_location_id, resolve_location, set_total
+from store.lots import allocate, fefo_lots, lots_for
+from store.models import Item, Location, LocationStock, StockLot
+from store.stock import sharded_items, take
+from .models import DailyItemSales, Sale, SaleDetail, SaleDetailLot
+from .signals import sales_synced
+
+logger = logging.getLogger(__name__)
+
+SALES = Counter('inventory_sales_total', 'Sales recorded.')
+SALES_REVENUE = Counter(
+    'inventory_sales_revenue_total', 'Grand total of the sales recorded.'
+)
+STOCK_CONFLICTS = Counter(
+    'inventory_stock_conflicts_total',
+    'Sales rejected while taking items out of stock.',
+    ['reason'],
+)
+SYNCED_SALES = Counter(
+    'inventory_synced_sales_total',
+    'Sales received from offline tills, by outcome.',
+    ['outcome'],
+)
+
+# Offline sales accepted per sync request.
+SYNC_BATCH_LIMIT = 500
+
+# Outcomes of a synced sale.
+CREATED = 'created'
+DUPLICATE = 'duplicate'
+REJECTED = 'rejected'
+
+
+def create_sale(sale_attributes, items):
+    """
+    Creates a sale with one detail line per entry of ``items`` and takes the
+    sold quantities out of stock, all in one transaction. The stock comes
+    from the location whose id is ``location_id`` in ``sale_attributes``,
+    or the default location without one (see store.locations). Sharded
+    items sold there take theirs out of their stock slots (see
+    store.stock).
+
+    Each entry of ``items`` needs ``id``, ``price``, ``quantity`` and
+    ``total_item``. Raises ValueError for malformed lines or insufficient
+    stock, and Item.DoesNotExist or Location.DoesNotExist for unknown items
+    or locations; nothing is saved then.
+    """
+    try:
+        new_sale = _create_sale(sale_attributes, items)
+    except OperationalError:
+        # SQLite reports lock timeouts this way.
+        STOCK_CONFLICTS.inc(reason='database_locked')
+        raise
+    SALES.inc()
+    SALES_REVENUE.inc(float(new_sale.grand_total))
+    return new_sale
+
+
+def _create_sale(sale_attributes, items):
+    sale_attributes = dict(sale_attributes)
+    with transaction.atomic():
+        location_id, is_default = resolve_location(
+            sale_attributes.pop("location_id", None)
+        )
+        new_sale = Sale.objects.create(location_id=location_id,
+                                       **sale_attributes)
+        logger.info("Sale created: %s", new_sale)
+
+        if not isinstance(items, list):
+            raise ValueError("Items should be a list")
+
+        wanted = {}
+        for item in items:
+            if not all(
+                k in item for k in ["id", "price", "quantity", "total_item"]
+            ):
+                raise ValueError("Item is missing required fields")
+            item_id = int(item["id"])
+            wanted[item_id] = wanted.get(item_id, 0) + int(item["quantity"])
+
+        # Load every item of the sale at once. Rows are locked so that two
+        # checkouts cannot both sell the last units; sharded items take
+        # their stock from slots instead and leave the rows alone.
+        sharded = sharded_items(wanted) if is_default else {}
+        instances = {
+            instance.pk: instance for instance in
+            Item.objects.filter(pk__in=[i for i in wanted if i in sharded])
+        }
+        instances.update(
+            (instance.pk, instance) for instance in
+            Item.objects.select_for_update()
+            .filter(pk__in=[i for i in wanted if i not in sharded])
+            .order_by("pk")
+        )
+        if len(instances) < len(wanted):
+            raise Item.DoesNotExist("Item matching query does not exist.")
+        stock = {
+            row.item_id: row for row in
+            LocationStock.objects.select_for_update()
+            .filter(location_id=location_id,
+                    item_id__in=[i for i in wanted if i not in sharded])
+            .order_by("item_id")
+        }
+
+        # In id order, so that concurrent sales wait for each other
+        # rather than deadlock.
+        for item_id, quantity in sorted(wanted.items()):
+            item_instance = instances[item_id]
+            if item_id in sharded:
+                enough = take(item_id, quantity, sharded[item_id])
+            else:
+                enough = item_id in stock and \
+                    stock[item_id].quantity >= quantity
+            if not enough:
+                STOCK_CONFLICTS.inc(reason='insufficient_stock')
+                raise ValueError(
+                    f"Not enough stock for item: {item_instance.name}"
+                )
+
+        # First expiry first out: one indexed query per item for its lots
+        # at the location, split over its lines in order.
+        lots = {
+            item_id: list(fefo_lots(item_id, location_id))
+            for item_id in sorted(wanted) if item_id not in sharded
+        }
+        taken_lots = []
+        for item in items:
+            detail_attributes = {
+                "sale": new_sale,
+                "item": instances[int(item["id"])],
+                "price": float(item["price"]),
+                "quantity": int(item["quantity"]),
+                "total_detail": float(item["total_item"])
+            }
+            detail = SaleDetail.objects.create(**detail_attributes)
+            logger.info(
+                "Sale detail created: sale %s, item %s, quantity %s",
+                new_sale.pk, detail.item_id, detail.quantity
+            )
+            taken_lots.extend(
+                SaleDetailLot(detail=detail, lot=lot, quantity=taken)
+                for lot, taken in allocate(lots.get(detail.item_id, []),
+                                           detail.quantity)
+            )
+        StockLot.objects.bulk_update(
+            {line.lot.pk: line.lot for line in taken_lots}.values(),
+            ["quantity"],
+        )
+        SaleDetailLot.objects.bulk_create(taken_lots)
+
+        # Reduce the location's stock and the item totals
+        for row in stock.values():
+            row.quantity -= wanted[row.item_id]
+        LocationStock.objects.bulk_update(stock.values(), ["quantity"])
+        for item_id, quantity in sorted(wanted.items()):
+            if item_id not in sharded:
+                item_instance = instances[item_id]
+                set_total(item_instance, item_instance.quantity - quantity)
+                item_instance.save()
+    return new_sale
+
+
+@dataclass
+class OfflineSale:
+    client_id: str
+    timestamp: object
+    attributes: dict
+    lines: list
+
+
+def _parse_offline_sale(entry):
+    client_id = entry.get("client_id")
+    if not isinstance(client_id, str) or not 0 < len(client_id) <= 64:
+        raise ValueError("Missing or invalid client_id")
+    timestamp = parse_datetime(str(entry.get("timestamp", "")))
+    if timestamp is None:
+        raise ValueError("Missing or invalid timestamp")
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    # A till whose clock runs ahead does not get to record future sales.
+    timestamp = min(timestamp, timezone.now())
+
+    if not isinstance(entry.get("items"), list) or not entry["items"]:
+        raise ValueError("Items should be a non-empty list")
+    lines = []
+    for item in entry["items"]:
+        if not all(
+            k in item for k in ["id", "price", "quantity", "total_item"]
+        ):
+            raise ValueError("Item is missing required fields")
+        quantity = int(item["quantity"])
+        if quantity < 1:
+            raise ValueError("Item quantity should be positive")
+        lines.append((int(item["id"]), float(item["price"]), quantity,
+                      float(item["total_item"])))
+
+    attributes = {
+        "customer_id": int(entry["customer"]),
+        "sub_total": float(entry["sub_total"]),
+        "grand_total": float(entry["grand_total"]),
+        "tax_amount": float(entry.get("tax_amount", 0.0)),
+        "tax_percentage": float(entry.get("tax_percentage", 0.0)),
+        "amount_paid": float(entry["amount_paid"]),
+        "amount_change": float(entry["amount_change"]),
+        "location_id": int(entry["location"])
+        if entry.get("location") not in (None, "") else None,
+    }
+    return OfflineSale(client_id, timestamp, attributes, lines)
+
+
+def _outcome(client_id, status, sale=None, shortfalls=None, error=None):
+    return {
+        "client_id": client_id,
+        "status": status,
+        "sale": sale,
+        "flagged": bool(shortfalls),
+        "shortfalls": [
+            {"item": item_id, "quantity": quantity}
+            for item_id, quantity in (shortfalls or {}).items()
+        ],
+        "error": error,
+    }
+
+
+def sync_sales(entries):
+    """
+    Records a batch of sales captured offline and returns one outcome per
+    entry, in the order given.
+
+    Entries take the fields of the sale screen plus a ``client_id`` unique
+    to the sale and the ``timestamp`` it was made at. They are applied in
+    timestamp order. An entry whose ``client_id`` is already recorded is
+    a ``duplicate``, so a till can resend a batch whose response it lost.
+    An entry may name the ``location`` it was sold at, the default
+    location otherwise. The goods have already left the shop, so selling
+    more than is in stock there does not reject a sale: the location's
+    stock drops to zero, the line records the shortfall and the sale is
+    flagged for review. Malformed entries and unknown customers, items or
+    locations reject that entry only.
+
+    The batch is written in bulk, in one transaction, with a fixed number
+    of queries per batch rather than per line. Raises ValueError for a
+    batch that is not a list or is larger than ``SYNC_BATCH_LIMIT``.
+    """
+    if not isinstance(entries, list):
+        raise ValueError("Sales should be a list")
+    if len(entries) > SYNC_BATCH_LIMIT:
+        raise ValueError(f"At most {SYNC_BATCH_LIMIT} sales per batch")
+
+    outcomes = [None] * len(entries)
+    parsed = []
+    for index, entry in enumerate(entries):
+        try:
+            parsed.append((index, _parse_offline_sale(entry)))
+        except (AttributeError, KeyError, TypeError, ValueError) as error:
+            client_id = entry.get("client_id") \
+                if isinstance(entry, dict) else None
+            outcomes[index] = _outcome(client_id, REJECTED, error=str(error))
+
+    try:
+        applied = _apply_offline_sales(parsed)
+    except IntegrityError:
+        # A concurrent sync recorded some of the same client ids first;
+        # they are duplicates now.
+        applied = _apply_offline_sales(parsed)
+    for index, outcome in applied.items():
+        outcomes[index] = outcome
+
+    for outcome in outcomes:
+        status = outcome["status"]
+        SYNCED_SALES.inc(
+            outcome="flagged" if outcome["flagged"] else status
+        )
+    return outcomes
+
+
+def _apply_offline_sales(parsed):
+    outcomes, created, duplicates = {}, {}, {}
+    with transaction.atomic():
+        # Lock the items first, in a fixed order: a concurrent sync of the
+        # same sales waits here, then finds them recorded below.
+        item_ids = {line[0] for _, sale in parsed for line in sale.lines}
+        items = {
+            item.pk: item for item in
+            Item.objects.select_for_update().filter(pk__in=item_ids)
+            .order_by("pk")
+        }
+        loaded = {item_id: item.quantity for item_id, item in items.items()}
+        recorded = dict(Sale.objects.filter(
+            client_id__in=[sale.client_id for _, sale in parsed]
+        ).values_list("client_id", "pk"))
+        customers = set(Customer.objects.filter(
+            pk__in={sale.attributes["customer_id"] for _, sale in parsed}
+        ).values_list("pk", flat=True))
+        default_id = default_location_id()
+        for _, sale in parsed:
+            if sale.attributes["location_id"] is None:
+                sale.attributes["location_id"] = default_id
+        location_ids = {sale.attributes["location_id"] for _, sale in parsed}
+        locations = set(Location.objects.filter(
+            pk__in=location_ids
+        ).values_list("pk", flat=True))
+        stock = {
+            (row.item_id, row.location_id): row for row in
+            LocationStock.objects.select_for_update()
+            .filter(item_id__in=item_ids, location_id__in=location_ids)
+            .order_by("item_id", "location_id")
+        }
+        lots = lots_for({
+            (line[0], sale.attributes["location_id"])
+            for _, sale in parsed for line in sale.lines
+        })
+
+        new_sales, details, taken_lots, changed = {}, [], [], {}
+        for index, entry in sorted(
+            parsed, key=lambda pair: (pair[1].timestamp, pair[0])
+        ):
+            if entry.client_id in recorded or entry.client_id in new_sales:
+                duplicates[index] = entry.client_id
+                continue
+            if entry.attributes["customer_id"] not in customers:
+                outcomes[index] = _outcome(entry.client_id, REJECTED,
+                                           error="Customer does not exist")
+                continue
+            location_id = entry.attributes["location_id"]
+            if location_id not in locations:
+                outcomes[index] = _outcome(entry.client_id, REJECTED,
+                                           error="Location does not exist")
+                continue
+            missing = [line[0] for line in entry.lines
+                       if line[0] not in items]
+            if missing:
+                outcomes[index] = _outcome(
+                    entry.client_id, REJECTED,
+                    error=f"Item does not exist: {missing[0]}",
+                )
+                continue
+
+            sale = Sale(client_id=entry.client_id, date_added=entry.timestamp,
+                        **entry.attributes)
+            shortfalls = {}
+            for item_id, price, quantity, total in entry.lines:
+                item = items[item_id]
+                row = stock.setdefault(
+                    (item_id, location_id),
+                    LocationStock(item_id=item_id, location_id=location_id),
+                )
+                shortfall = max(0, quantity - max(0, row.quantity))
+                if shortfall:
+                    shortfalls[item_id] = \
+                        shortfalls.get(item_id, 0) + shortfall
+                row.quantity -= quantity - shortfall
+                item.quantity -= quantity - shortfall
+                changed[item_id] = item
+                detail = SaleDetail(
+                    sale=sale, item=item, price=price, quantity=quantity,
+                    total_detail=total, shortfall=shortfall,
+                )
+                details.append(detail)
+                taken_lots.extend(
+                    SaleDetailLot(detail=detail, lot=lot, quantity=taken)
+                    for lot, taken in allocate(
+                        lots.get((item_id, location_id), []),
+                        quantity - shortfall,
+                    )
+                )
+            sale.needs_review = bool(shortfalls)
+            new_sales[entry.client_id] = sale
+            created[index] = (sale, shortfalls)
+
+        sales = list(new_sales.values())
+        Sale.objects.bulk_create(sales)
+        SaleDetail.objects.bulk_create(details)
+        StockLot.objects.bulk_update(
+            {line.lot.pk: line.lot for line in taken_lots}.values(),
+            ["quantity"],
+        )
+        SaleDetailLot.objects.bulk_create(taken_lots)
+        LocationStock.objects.bulk_create(
+            [row for row in stock.values() if row.pk is None]
+        )
+        LocationStock.objects.bulk_update(
+            [row for row in stock.values() if row.pk is not None],
+            ["quantity"],
+        )
+        Item.objects.bulk_update(list(changed.values()), ["quantity"])
+        DailyItemSales.record_many(details)
+        sales_synced.send(
+            sender=Sale, sales=sales, details=details,
+            items=list(changed.values()),
+            quantities={
+                item_id: (loaded[item_id], item.quantity)
+                for item_id, item in changed.items()
+            },
+        )
+
+    for index, (sale, shortfalls) in created.items():
+        outcomes[index] = _outcome(sale.client_id, CREATED, sale=sale.pk,
+                                   shortfalls=shortfalls)
+    for index, client_id in duplicates.items():
+        sale = new_sales.get(client_id)
+        outcomes[index] = _outcome(
+            client_id, DUPLICATE,
+            sale=sale.pk if sale else recorded[client_id],
+        )
+    if sales:
+        SALES.inc(len(sales))
+        SALES_REVENUE.inc(sum(float(sale.grand_total) for sale in sales))
+    return outcomes
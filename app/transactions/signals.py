@@ -1,14 +1,87 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
 
-from .models import Purchase
+from store.locations import adjust_stock, default_location_id
+from store.lots import receive_lot
+from .models import DailyItemSales, Purchase, Sale, SaleDetail
+
+# Sent by services.sync_sales, inside its transaction, with the sales, sale
+# lines and items it wrote in bulk, since bulk writes send no post_save, and
+# {item id: (quantity before, quantity after)} for those items.
+sales_synced = Signal()
 
 
 @receiver(post_save, sender=Purchase)
 def update_item_quantity(sender, instance, created, **kwargs):
     """
-    Signal to update item quantity when a purchase is made.
+    Signal to add a purchase to the stock of the location receiving it,
+    as a new lot with the purchase's expiry.
     """
     if created:
-        instance.item.quantity += instance.quantity
-        instance.item.save()
+        instance.item = adjust_stock(
+            instance.item_id, instance.quantity, instance.location_id
+        )
+        if instance.quantity:
+            instance.lot = receive_lot(
+                instance.item_id,
+                instance.location_id or default_location_id(),
+                instance.quantity,
+                expires_at=instance.expiry_date
+                or instance.item.expiring_date,
+                code=instance.lot_number,
+            )
+            Purchase.objects.filter(pk=instance.pk).update(lot=instance.lot)
+
+
+@receiver(pre_save, sender=Sale)
+def remember_sale_date(sender, instance, raw=False, update_fields=None,
+                       **kwargs):
+    """
+    Signal to remember the date an existing sale had before a save that
+    may change it.
+    """
+    instance._previous_date = None
+    if instance.pk and not raw and (
+        update_fields is None or 'date_added' in update_fields
+    ):
+        instance._previous_date = Sale.objects.filter(
+            pk=instance.pk
+        ).values_list('date_added', flat=True).first()
+
+
+@receiver(post_save, sender=Sale)
+def redate_sale_details(sender, instance, created, **kwargs):
+    """
+    Signal to move a re-dated sale's lines to their new day in the daily
+    rollup.
+    """
+    previous = getattr(instance, '_previous_date', None)
+    if not created and previous and previous != instance.date_added:
+        DailyItemSales.redate(instance, previous)
+
+
+@receiver(pre_save, sender=SaleDetail)
+def remove_previous_sale_detail(sender, instance, **kwargs):
+    """
+    Signal to take an edited sale line's old values out of the daily rollup.
+    """
+    if instance.pk:
+        previous = SaleDetail.objects.filter(pk=instance.pk).first()
+        if previous:
+            DailyItemSales.record(previous, sign=-1)
+
+
+@receiver(post_save, sender=SaleDetail)
+def add_sale_detail(sender, instance, **kwargs):
+    """
+    Signal to add a saved sale line to the daily rollup.
+    """
+    DailyItemSales.record(instance)
+
+
+@receiver(pre_delete, sender=SaleDetail)
+def remove_sale_detail(sender, instance, **kwargs):
+    """
+    Signal to take a deleted sale line out of the daily rollup.
+    """
+    DailyItemSales.record(instance, sign=-1)
@@ -0,0 +1,28 @@
+"""
+Module: transactions.tasks
+
+Periodic jobs of the transactions app, run by ``manage.py runworker``.
+"""
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+from tasks.scheduler import periodic
+from .models import DailyItemSales
+
+
+@periodic('30 2 * * *', lease=3600)
+def compact_daily_sales():
+    """
+    Drops daily sales rows emptied by deleted sale lines and rebuilds
+    yesterday and today from the sale lines, repairing any drift left by
+    bulk writes that bypass the signals.
+    """
+    emptied, _ = DailyItemSales.objects.filter(
+        sale_count=0, quantity=0
+    ).delete()
+    rebuilt = DailyItemSales.rebuild(
+        since=timezone.localdate() - timedelta(days=1)
+    )
+    return {'removed': emptied, 'rebuilt': rebuilt}
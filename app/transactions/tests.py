@@ -1,3 +1,294 @@
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Customer, Vendor
+from outbox.models import OutboxEvent
+from store.locations import transfer
+from store.models import Category, Item, Location, LocationStock
+from store.tests import QueryBudgetTestCase
+from .models import DailyItemSales, Purchase, Sale, SaleDetail
+from .services import create_sale, sync_sales
+
+
+class TransactionsQueryBudgetTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name='Groceries')
+        self.item = Item.objects.create(
+            name='Rice', description='', category=category, quantity=50
+        )
+        self.customer = Customer.objects.create(
+            first_name='Jane', last_name='Doe'
+        )
+
+    def create_purchases(self, count):
+        start = Vendor.objects.count()
+        # Purchase slugs come from the vendor, so give each row its own.
+        vendors = Vendor.objects.bulk_create(
+            Vendor(name=f'Vendor {start + i}') for i in range(count)
+        )
+        Purchase.objects.bulk_create(
+            Purchase(item=self.item, vendor=vendor, total_value=0)
+            for vendor in vendors
+        )
+
+    def create_sales(self, count):
+        Sale.objects.bulk_create(
+            Sale(customer=self.customer) for _ in range(count)
+        )
+
+    def test_purchase_list(self):
+        self.assertQueryBudget(
+            reverse('purchaseslist'), 5, self.create_purchases
+        )
+
+    def test_sale_list(self):
+        self.assertQueryBudget(reverse('saleslist'), 5, self.create_sales)
+
+    def test_sale_detail(self):
+        sale = Sale.objects.create(customer=self.customer)
+
+        def create_lines(count):
+            SaleDetail.objects.bulk_create(
+                SaleDetail(
+                    sale=sale, item=self.item, price=1,
+                    quantity=1, total_detail=1
+                )
+                for _ in range(count)
+            )
+
+        self.assertQueryBudget(
+            reverse('sale-detail', args=[sale.pk]), 5, create_lines
+        )
+
+
+class DailyItemSalesTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Groceries')
+        self.rice = Item.objects.create(
+            name='Rice', description='', category=category, quantity=50
+        )
+        self.salt = Item.objects.create(
+            name='Salt', description='', category=category, quantity=50
+        )
+        self.sale = Sale.objects.create(
+            customer=Customer.objects.create(first_name='Jane',
+                                             last_name='Doe'),
+            date_added=datetime(2026, 10, 18, 12, 0, tzinfo=dt_timezone.utc),
+        )
+        self.day = timezone.localdate(self.sale.date_added)
+
+    def line(self, item, quantity):
+        return SaleDetail.objects.create(
+            sale=self.sale, item=item, price=2, quantity=quantity,
+            total_detail=2 * quantity,
+        )
+
+    def rollup(self):
+        return sorted(
+            (row.date, row.item_id, row.quantity, row.revenue,
+             row.sale_count)
+            for row in DailyItemSales.objects.all()
+            if row.sale_count
+        )
+
+    def assertMatchesRebuild(self):
+        maintained = self.rollup()
+        DailyItemSales.rebuild()
+        self.assertEqual(self.rollup(), maintained)
+
+    def test_follows_created_edited_and_deleted_lines(self):
+        first = self.line(self.rice, 3)
+        self.line(self.rice, 1)
+        self.assertEqual(self.rollup(),
+                         [(self.day, self.rice.pk, 4, 8, 2)])
+
+        first.quantity, first.total_detail = 5, 10
+        first.save()
+        self.assertEqual(self.rollup(),
+                         [(self.day, self.rice.pk, 6, 12, 2)])
+
+        first.item = self.salt
+        first.save()
+        self.assertEqual(self.rollup(), [
+            (self.day, self.rice.pk, 1, 2, 1),
+            (self.day, self.salt.pk, 5, 10, 1),
+        ])
+        self.assertMatchesRebuild()
+
+        first.delete()
+        self.assertEqual(self.rollup(),
+                         [(self.day, self.rice.pk, 1, 2, 1)])
+        self.assertMatchesRebuild()
+
+    def test_follows_redated_sales(self):
+        self.line(self.rice, 3)
+        self.line(self.salt, 2)
+        self.sale.date_added += timedelta(days=2)
+        self.sale.save()
+
+        moved = timezone.localdate(self.sale.date_added)
+        self.assertEqual(self.rollup(), [
+            (moved, self.rice.pk, 3, 6, 1),
+            (moved, self.salt.pk, 2, 4, 1),
+        ])
+        self.assertMatchesRebuild()
+
+        # Saves that leave the date alone do not touch the rollup.
+        self.sale.amount_paid = 10
+        self.sale.save(update_fields=['amount_paid'])
+        self.assertMatchesRebuild()
+
+
+class SyncSalesTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Groceries')
+        self.rice = Item.objects.create(
+            name='Rice', description='', category=category, quantity=10
+        )
+        self.salt = Item.objects.create(
+            name='Salt', description='', category=category, quantity=5
+        )
+        self.customer = Customer.objects.create(
+            first_name='Jane', last_name='Doe'
+        )
+        self.start = datetime(2026, 10, 18, 9, 0, tzinfo=dt_timezone.utc)
+
+    def entry(self, client_id, minutes=0, lines=((None, 1),), **changes):
+        lines = [(item or self.rice, quantity) for item, quantity in lines]
+        total = sum(2 * quantity for _, quantity in lines)
+        entry = {
+            'client_id': client_id,
+            'timestamp': (self.start + timedelta(minutes=minutes)).isoformat(),
+            'customer': self.customer.pk,
+            'sub_total': total, 'grand_total': total,
+            'amount_paid': total, 'amount_change': 0,
+            'items': [
+                {'id': item.pk, 'price': 2, 'quantity': quantity,
+                 'total_item': 2 * quantity}
+                for item, quantity in lines
+            ],
+        }
+        entry.update(changes)
+        return entry
+
+    def test_applies_sales_in_timestamp_order(self):
+        results = sync_sales([
+            self.entry('b', minutes=5, lines=[(None, 3), (self.salt, 1)]),
+            self.entry('a', minutes=1, lines=[(None, 2)]),
+        ])
+        self.assertEqual([r['status'] for r in results],
+                         ['created', 'created'])
+        first, second = (Sale.objects.get(pk=results[1]['sale']),
+                         Sale.objects.get(pk=results[0]['sale']))
+        self.assertLess(first.pk, second.pk)
+        self.assertEqual(first.date_added, self.start + timedelta(minutes=1))
+        self.assertEqual(second.saledetail_set.count(), 2)
+
+        self.rice.refresh_from_db()
+        self.assertEqual(self.rice.quantity, 5)
+        rollup = DailyItemSales.objects.get(item=self.rice)
+        self.assertEqual((rollup.date, rollup.quantity, rollup.sale_count),
+                         (timezone.localdate(self.start), 5, 2))
+        self.assertEqual(
+            OutboxEvent.objects.filter(topic='sale_detail').count(), 3
+        )
+
+    def test_resent_sales_are_duplicates(self):
+        [created] = sync_sales([self.entry('a')])
+        results = sync_sales([self.entry('a'), self.entry('b'),
+                              self.entry('b')])
+        self.assertEqual([(r['status'], r['sale']) for r in results], [
+            ('duplicate', created['sale']),
+            ('created', results[1]['sale']),
+            ('duplicate', results[1]['sale']),
+        ])
+        self.assertEqual(Sale.objects.count(), 2)
+        self.rice.refresh_from_db()
+        self.assertEqual(self.rice.quantity, 8)
+
+    def test_oversold_sales_are_flagged_not_rejected(self):
+        [result] = sync_sales([self.entry('a', lines=[(self.salt, 8)])])
+        self.assertEqual((result['status'], result['flagged']),
+                         ('created', True))
+        self.assertEqual(result['shortfalls'],
+                         [{'item': self.salt.pk, 'quantity': 3}])
+        self.salt.refresh_from_db()
+        self.assertEqual(self.salt.quantity, 0)
+        sale = Sale.objects.get(pk=result['sale'])
+        self.assertTrue(sale.needs_review)
+        self.assertEqual(sale.saledetail_set.get().shortfall, 3)
+
+    def test_takes_stock_from_the_location_sold_at(self):
+        shop = Location.objects.create(name='Kiosk')
+        transfer(self.rice.pk, Location.objects.get(is_default=True).pk,
+                 shop.pk, 4)
+        [result] = sync_sales([
+            self.entry('a', lines=[(None, 6), (self.salt, 1)],
+                       location=shop.pk),
+        ])
+        self.assertEqual(result['shortfalls'],
+                         [{'item': self.rice.pk, 'quantity': 2},
+                          {'item': self.salt.pk, 'quantity': 1}])
+        self.assertEqual(Sale.objects.get().location, shop)
+        self.rice.refresh_from_db()
+        self.assertEqual(self.rice.quantity, 6)
+        self.assertEqual(
+            dict(LocationStock.objects.filter(location=shop)
+                 .values_list('item', 'quantity')),
+            {self.rice.pk: 0, self.salt.pk: 0},
+        )
+        [result] = sync_sales([self.entry('b', location=0)])
+        self.assertEqual(result['error'], 'Location does not exist')
+
+    def test_rejects_entries_on_their_own(self):
+        results = sync_sales([
+            self.entry('a', customer=0),
+            self.entry('b', items=[{'id': 0, 'price': 1, 'quantity': 1,
+                                    'total_item': 1}]),
+            self.entry('c', timestamp='yesterday'),
+            'not a sale',
+            self.entry('d'),
+        ])
+        self.assertEqual([r['status'] for r in results],
+                         ['rejected'] * 4 + ['created'])
+        self.assertEqual(results[0]['error'], 'Customer does not exist')
+        self.assertEqual(Sale.objects.get().client_id, 'd')
+
+    def test_checkout_does_not_load_categories(self):
+        entry = self.entry('1', lines=[(None, 1), (self.salt, 1)])
+        with CaptureQueriesContext(connection) as queries:
+            create_sale({'customer': self.customer}, entry['items'])
+        self.assertFalse([query for query in queries
+                          if 'store_category' in query['sql']])
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        def count(first, size):
+            batch = [self.entry(f'{first + n}', lines=[(None, 1),
+                                                       (self.salt, 1)])
+                     for n in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                sync_sales(batch)
+            return len(queries)
+
+        self.assertEqual(count(0, 2), count(100, 20))
 
-# Create your tests here.
+    def test_endpoint(self):
+        url = reverse('sale-sync')
+        self.client.force_login(User.objects.create_user('till', password='x'))
+        response = self.client.post(
+            url, json.dumps({'sales': [self.entry('a')]}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['results'][0]['status'], 'created')
+        response = self.client.post(url, '{"sales": {}}',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 405)
@@ -14,6 +14,7 @@ from .views import (
     SaleDetailView,
     SaleCreateView,
     SaleDeleteView,
+    sync_sales_view,
 
     export_sales_to_excel,
     export_purchases_to_excel,
@@ -46,6 +47,7 @@ urlpatterns = [
     path('sales/', SaleListView.as_view(), name='saleslist'),
     path('sale/<int:pk>/', SaleDetailView.as_view(), name='sale-detail'),
     path('new-sale/', SaleCreateView, name='sale-create'),
+    path('sales/sync/', sync_sales_view, name='sale-sync'),
     path(
          'sale/<slug:slug>/delete/', SaleDeleteView.as_view(),
          name='sale-delete'
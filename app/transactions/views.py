@@ -1,12 +1,13 @@
 # Standard library imports
 import json
 import logging
-from django.db.models import Q
+import time
+from functools import wraps
+from django.db.models import Prefetch, Q
 # Django core imports
 from django.http import JsonResponse, HttpResponse
 from django.urls import reverse
 from django.shortcuts import render
-from django.db import transaction
 from datetime import datetime
 
 # Class-based views
@@ -14,26 +15,37 @@ from django.views.generic import DetailView, ListView
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 
 # Authentication and permissions
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-
-# Third-party packages
-from openpyxl import Workbook
+from django.views.decorators.http import require_POST
 
 # Local app imports
-from store.models import Item
+from monitoring.metrics import Histogram
+from monitoring.mixins import EXPORT_SECONDS
+from store.models import Item, Location
 from accounts.models import Customer
 from .models import Sale, Purchase, SaleDetail
 from .forms import PurchaseForm
+from .services import create_sale, sync_sales
 
 
 logger = logging.getLogger(__name__)
 
+CHECKOUT_SECONDS = Histogram(
+    'inventory_checkout_seconds',
+    'Time to record a sale from the point-of-sale screen, in seconds.',
+    ['status'],
+)
+
 
 def is_ajax(request):
     return request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest'
 
 
+@EXPORT_SECONDS.time(export='sale', format='xlsx')
 def export_sales_to_excel(request):
+    from openpyxl import Workbook
+
     # Create a workbook and select the active worksheet.
     workbook = Workbook()
     worksheet = workbook.active
@@ -81,7 +93,10 @@ def export_sales_to_excel(request):
     return response
 
 
+@EXPORT_SECONDS.time(export='purchase', format='xlsx')
 def export_purchases_to_excel(request):
+    from openpyxl import Workbook
+
     # Create a workbook and select the active worksheet.
     workbook = Workbook()
     worksheet = workbook.active
@@ -140,6 +155,7 @@ class SaleListView(LoginRequiredMixin, ListView):
     """
 
     model = Sale
+    queryset = Sale.objects.select_related("customer")
     template_name = "transactions/sales_list.html"
     context_object_name = "sales"
     paginate_by = 10
@@ -152,13 +168,38 @@ class SaleDetailView(LoginRequiredMixin, DetailView):
     """
 
     model = Sale
+    queryset = Sale.objects.select_related("customer").prefetch_related(
+        Prefetch(
+            "saledetail_set",
+            queryset=SaleDetail.objects.select_related("item")
+        )
+    )
     template_name = "transactions/saledetail.html"
 
 
+def timed_checkout(view):
+    """
+    Records the duration and response status of sale submissions.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return view(request, *args, **kwargs)
+        started = time.perf_counter()
+        response = view(request, *args, **kwargs)
+        CHECKOUT_SECONDS.observe(
+            time.perf_counter() - started, status=response.status_code
+        )
+        return response
+    return wrapper
+
+
+@timed_checkout
 def SaleCreateView(request):
     context = {
         "active_icon": "sales",
-        "customers": [c.to_select2() for c in Customer.objects.all()]
+        "customers": [c.to_select2() for c in Customer.objects.all()],
+        "locations": Location.objects.all(),
     }
 
     if request.method == 'POST':
@@ -186,44 +227,10 @@ def SaleCreateView(request):
                     "tax_percentage": float(data.get("tax_percentage", 0.0)),
                     "amount_paid": float(data["amount_paid"]),
                     "amount_change": float(data["amount_change"]),
+                    "location_id": data.get("location") or None,
                 }
 
-                # Use a transaction to ensure atomicity
-                with transaction.atomic():
-                    # Create the sale
-                    new_sale = Sale.objects.create(**sale_attributes)
-                    logger.info(f"Sale created: {new_sale}")
-
-                    # Create sale details and update item quantities
-                    items = data["items"]
-                    if not isinstance(items, list):
-                        raise ValueError("Items should be a list")
-
-                    for item in items:
-                        if not all(
-                            k in item for k in [
-                                "id", "price", "quantity", "total_item"
-                            ]
-                        ):
-                            raise ValueError("Item is missing required fields")
-
-                        item_instance = Item.objects.get(id=int(item["id"]))
-                        if item_instance.quantity < int(item["quantity"]):
-                            raise ValueError(f"Not enough stock for item: {item_instance.name}")
-
-                        detail_attributes = {
-                            "sale": new_sale,
-                            "item": item_instance,
-                            "price": float(item["price"]),
-                            "quantity": int(item["quantity"]),
-                            "total_detail": float(item["total_item"])
-                        }
-                        SaleDetail.objects.create(**detail_attributes)
-                        logger.info(f"Sale detail created: {detail_attributes}")
-
-                        # Reduce item quantity
-                        item_instance.quantity -= int(item["quantity"])
-                        item_instance.save()
+                create_sale(sale_attributes, data["items"])
 
                 return JsonResponse(
                     {
@@ -249,6 +256,11 @@ def SaleCreateView(request):
                     'status': 'error',
                     'message': 'Item does not exist!'
                     }, status=400)
+            except Location.DoesNotExist:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Location does not exist!'
+                    }, status=400)
             except ValueError as ve:
                 return JsonResponse({
                     'status': 'error',
@@ -272,6 +284,37 @@ def SaleCreateView(request):
     return render(request, "transactions/sale_create.html", context=context)
 
 
+@require_POST
+@login_required
+def sync_sales_view(request):
+    """
+    Records the sales a till captured while offline::
+
+        POST /transactions/sales/sync/
+        {"sales": [{"client_id": "...", "timestamp": "...", ...}, ...]}
+
+    Each sale takes the fields of the sale screen plus ``client_id`` and
+    ``timestamp`` (see services.sync_sales). Answers with one result per
+    sale, in order: ``created`` (``flagged`` when it oversold stock),
+    ``duplicate`` or ``rejected``. Tills drop the sales that were created
+    or duplicates and may resend the whole batch when the answer is lost.
+    """
+    try:
+        data = json.loads(request.body)
+        results = sync_sales(data["sales"])
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Invalid JSON format in request body!'
+            }, status=400)
+    except (KeyError, TypeError, ValueError) as error:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Invalid batch: {error}'
+            }, status=400)
+    return JsonResponse({'status': 'success', 'results': results})
+
+
 class SaleDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     """
     View to delete a sale.
@@ -299,6 +342,7 @@ class PurchaseListView(LoginRequiredMixin, ListView):
     """
 
     model = Purchase
+    queryset = Purchase.objects.select_related("item", "vendor")
     template_name = "transactions/purchases_list.html"
     context_object_name = "purchases"
     paginate_by = 10
@@ -401,6 +445,10 @@ def sale_report(request):
                 Q(customer__last_name__icontains=customer_name)
             )
 
+    # Not cached: the report lists every matching sale, so a cached copy
+    # would hold the whole table per filter. The date index serves it.
+    sales = sales.select_related('customer')
+
     # Pass data to the template
     context = {
         'sales': sales,
@@ -429,6 +477,9 @@ def purchase_report(request):
     if vendor_name:
         purchases = purchases.filter(vendor__name__icontains=vendor_name)
 
+    # Not cached, like the sale report.
+    purchases = purchases.select_related('item', 'vendor')
+
     # Pass data to the template
     context = {
         'purchases': purchases,